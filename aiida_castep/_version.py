@@ -24,9 +24,21 @@ CHANGELOG
   band in at least one kpoint.
 - 1.1.1 Fixed a bug where the kpoints fro castep_bin can be incompatible with the band structure
   calculation
+- 1.2.0 Added optional parsing of the pdos_bin file, enabled with the ``PARSER_OPTIONS``
+  settings key.
+- 1.3.0 Record the number of cycles, final energy gain and cumulative time of each SCF loop.
+- 1.3.1 Record the wall time and SCF cycles of each ionic step, and their statistics.
+- 1.3.2 Record the indices of the kpoints without empty bands as ``no_empty_bands_kpoints``
+  and emit a single summarised warning.
+- 1.4.0 Parse the body of the .castep file with a registry of section parsers.
+  Fixed a bug where the Mulliken charges are not parsed if "Bond" appears before the box.
+- 1.4.1 Added the ``header_verbosity`` option for controlling the headers of the input files.
+- 1.4.2 Added the ``use_input_cache`` option for reusing the rendered input files.
+- 1.4.3 Added the ``pseudo_cache_folder`` option for linking pseudopotentials staged on the remote.
+- 1.5.0 Added ``CastepFarmCalculation`` and its parser for running many calculations in a single job.
 
 """
 
-CALC_PARSER_VERSION = "1.1.1"
+CALC_PARSER_VERSION = "1.5.0"
 PLUGIN_VERSION = "2.0.1"
 __version__ = PLUGIN_VERSION
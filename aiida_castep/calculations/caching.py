@@ -0,0 +1,234 @@
+"""
+Normalised hashing of CastepCalculation for improving the hit rate of AiiDA's caching
+
+Inputs that only differ in ways not affecting the results, for example the case of
+the keywords and the enumerated values or the ``comment`` set from the label, are
+hashed to the same value.
+Note that the input files written to the repository, including the headers with the
+time stamps, are never part of the hash.
+
+The nodes of CastepCalculation are plain ``CalcJobNode``, the normalised hash is
+computed by the caching interface attached by ``use_normalised_hash`` when the
+calculation is launched.
+The calculations stored with the hash of ``CalcJobNode`` can be rehashed using
+``rehash_calculations`` to make them usable as the cache sources.
+"""
+from aiida.common.hashing import make_hash
+from aiida.orm import CalcJobNode, QueryBuilder, StructureData
+from aiida.orm.nodes.process.calculation.calcjob import (
+    CalcJobNodeCaching,
+)
+
+from ..common import INPUT_LINKNAMES
+from .helper import get_helper
+from .tools import canonical_parameters
+from .utils import get_default_run_time
+
+__all__ = [
+    "CastepCalcJobNodeCaching",
+    "get_caching",
+    "use_normalised_hash",
+    "rehash_calculations",
+    "get_cache_report",
+]
+
+# Process types of the calculations using the normalised hash
+NORMALISED_PROCESS_TYPES = (
+    "aiida.calculations:castep.castep",
+    "aiida.calculations:castep.ts",
+)
+
+# Keywords that are excluded from the hash of the input parameters
+HASH_IGNORED_KEYWORDS = ("comment",)
+
+# Options that do not affect the results of the calculation
+HASH_IGNORED_OPTIONS = (
+    "header_verbosity",
+    "use_input_cache",
+    "pseudo_cache_folder",
+    "symlink_usage",
+)
+
+# Keywords of the string type whose values are free text rather than enumerated,
+# e.g. the names of the files, so the case of the values is significant
+HASH_CASE_SENSITIVE_KEYWORDS = (
+    "comment",
+    "continuation",
+    "reuse",
+    "checkpoint",
+    "cml_filename",
+    "elec_dump_file",
+    "elec_restore_file",
+)
+
+
+def fold_enumerated_values(parameters):
+    """
+    Fold the case of the values of the enumerated keywords in normalised parameters
+
+    The enumerated keywords are those of the string type according to the help
+    information, excluding the ones in ``HASH_CASE_SENSITIVE_KEYWORDS``.
+
+    :param parameters: Parameters as returned by ``canonical_parameters``
+    :returns: A dictionary of the parameters with the enumerated values in lower case
+    """
+    index = get_helper().index
+    folded = {}
+    for section, section_dict in parameters.items():
+        folded[section] = {
+            key: value.lower()
+            if isinstance(value, str)
+            and key not in HASH_CASE_SENSITIVE_KEYWORDS
+            and index.get_value_type(key) == "string"
+            else value
+            for key, value in section_dict.items()
+        }
+    return folded
+
+
+class CastepCalcJobNodeCaching(CalcJobNodeCaching):
+    """
+    Caching interface using the normalised input parameters for the hash
+    """
+
+    def get_objects_to_hash(self):
+        """Return the objects to be hashed, with the parameters normalised"""
+        objects = super().get_objects_to_hash()
+        attributes = objects.get("attributes", {})
+        for name in HASH_IGNORED_OPTIONS:
+            attributes.pop(name, None)
+
+        link_label = INPUT_LINKNAMES["parameters"]
+        inputs = objects.get("inputs", {})
+        if link_label in inputs:
+            param_node = (
+                self._node.base.links.get_incoming(link_label_filter=link_label)
+                .one()
+                .node
+            )
+            parameters = canonical_parameters(
+                param_node.get_dict(), ignored=HASH_IGNORED_KEYWORDS
+            )
+            # The run_time derived from the wall-time is the same as not setting it
+            run_time = get_default_run_time(
+                self._node.get_option("max_wallclock_seconds")
+            )
+            param_section = parameters.get("PARAM", {})
+            if run_time is not None and param_section.get("run_time") == run_time:
+                param_section.pop("run_time")
+            inputs[link_label] = make_hash(fold_enumerated_values(parameters))
+        return objects
+
+
+def get_caching(node):
+    """Get the caching interface of a CalcJobNode using the normalised hash"""
+    return CastepCalcJobNodeCaching(node)
+
+
+def use_normalised_hash(node):
+    """
+    Make a CalcJobNode use the normalised hash for the rest of its life in memory
+
+    The node keeps its type, so the nodes of the calculations run with the earlier
+    versions of the plugin can be used as the cache sources once rehashed.
+    """
+    # ``NodeBase.caching`` is a cached property, so set it on the instance
+    vars(node.base)["caching"] = get_caching(node)
+
+
+def rehash_calculations(nodes=None):
+    """
+    Store the normalised hash for the calculations
+
+    This is needed for the calculations stored by the earlier versions of the plugin,
+    or rehashed by ``verdi node rehash``, to be used as the cache sources.
+
+    :param nodes: An iterable of the CalcJobNode to be rehashed, defaults to all
+      CastepCalculation and CastepTSCalculation in the database
+    :returns: The number of the calculations rehashed
+    """
+    if nodes is None:
+        qbd = QueryBuilder()
+        qbd.append(
+            CalcJobNode,
+            filters={"process_type": {"in": list(NORMALISED_PROCESS_TYPES)}},
+        )
+        nodes = (node for (node,) in qbd.iterall())
+    count = 0
+    for node in nodes:
+        get_caching(node).rehash()
+        count += 1
+    return count
+
+
+def _diff_hash_objects(objects, other):
+    """Get the paths of the differences between two sets of the objects to be hashed"""
+    diffs = []
+    for key in sorted(set(objects) | set(other)):
+        value, other_value = objects.get(key), other.get(key)
+        if isinstance(value, dict) and isinstance(other_value, dict):
+            diffs.extend(
+                f"{key}.{path}" for path in _diff_hash_objects(value, other_value)
+            )
+        elif value != other_value:
+            diffs.append(key)
+    return diffs
+
+
+def _get_candidates(node):
+    """Get the calculations sharing the input structure with a calculation"""
+    qbd = QueryBuilder()
+    qbd.append(CalcJobNode, filters={"id": node.pk}, tag="calc")
+    qbd.append(
+        StructureData,
+        with_outgoing="calc",
+        edge_filters={"label": INPUT_LINKNAMES["structure"]},
+        tag="structure",
+        project=[],
+    )
+    qbd.append(
+        CalcJobNode,
+        with_incoming="structure",
+        edge_filters={"label": INPUT_LINKNAMES["structure"]},
+        filters={"id": {"!==": node.pk}},
+        project="*",
+    )
+    return qbd.all(flat=True)
+
+
+def get_cache_report(node):
+    """
+    Report why a calculation was or was not created from the cache
+
+    The calculations sharing the same input structure node are compared with
+    the given calculation, and the entries of the hash that differ are reported.
+
+    :param node: A stored CalcJobNode of CastepCalculation
+    :returns: A dictionary with the hash, the uuid of the cache source, the pks of the
+      calculations with the same hash and the reasons of the misses keyed by the pks
+    """
+    caching = get_caching(node)
+    same_nodes = [
+        other for other in caching.get_all_same_nodes() if other.pk != node.pk
+    ]
+    report = {
+        "hash": caching.get_hash(),
+        "cached_from": caching.get_cache_source(),
+        "hits": [other.pk for other in same_nodes if other.base.caching.is_valid_cache],
+        "misses": {},
+    }
+
+    objects = caching.get_objects_to_hash()
+    for other in _get_candidates(node):
+        if other.pk in report["hits"]:
+            continue
+        reasons = []
+        if other.node_type != node.node_type:
+            reasons.append(f"node type {other.node_type}")
+        if not other.base.caching.is_valid_cache:
+            reasons.append("not a valid cache source")
+        reasons.extend(
+            _diff_hash_objects(objects, get_caching(other).get_objects_to_hash())
+        )
+        report["misses"][other.pk] = reasons
+    return report
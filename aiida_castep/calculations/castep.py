@@ -2,7 +2,6 @@
 Calculations of CASTEP
 """
 
-import re
 import time
 from fnmatch import fnmatch
 from subprocess import call, check_output
@@ -18,15 +17,26 @@ from aiida.orm.nodes.data.base import to_aiida_type
 from aiida_castep._version import CALC_PARSER_VERSION
 
 from ..common import EXIT_CODES_SPEC, INPUT_LINKNAMES, OUTPUT_LINKNAMES
+from ..data.remote_cache import ensure_pseudos_staged
+from .caching import use_normalised_hash
+from .dryrun import batch_dryrun, parse_dryrun_output
 from .inpgen import CastepInputGenerator
 from .tools import (
+    RESTART_SUFFIXES,
     castep_input_summary,
     check_restart,
+    check_restarts,
+    get_checkpoint_filename,
+    get_restart_filename,
     input_param_validator,
     update_parameters,
     use_pseudos_from_family,
 )
-from .utils import get_castep_ion_line
+from .utils import (
+    check_parser_options,
+    get_castep_ion_line,
+    write_input_file,
+)
 
 __version__ = CALC_PARSER_VERSION
 
@@ -39,6 +49,47 @@ ecodes = EXIT_CODES_SPEC
 __all__ = ["CastepCalculation", "submit_test"]
 
 
+# Header lines of the AiiDA user and profile, cached per process
+_PROFILE_HEADER_CACHE = {}
+
+HEADER_VERBOSITY = ("full", "minimal", "none")
+
+
+def _get_profile_header_lines(profile):
+    """
+    Get the header lines about the AiiDA user and profile
+
+    The default user is only looked up once for each profile in the process.
+    """
+    lines = _PROFILE_HEADER_CACHE.get(profile.name)
+    if lines is None:
+        lines = (
+            "# "
+            "# AiiDA User: {}".format(orm.User.objects.get_default().get_full_name()),
+            f"# AiiDA profile: {profile.name}",
+        )
+        _PROFILE_HEADER_CACHE[profile.name] = lines
+    return list(lines)
+
+
+def header_verbosity_validator(value, _):
+    """Validate the verbosity of the header of the input files"""
+    if value not in HEADER_VERBOSITY:
+        return "Invalid header verbosity: {}, must be one of {}".format(
+            value, ", ".join(HEADER_VERBOSITY)
+        )
+    return None
+
+
+def retrieve_checkpoint_validator(value, _):
+    """Validate the type of the checkpoint file to be retrieved"""
+    if value not in RESTART_SUFFIXES:
+        return "Invalid checkpoint type: {}, must be one of {}".format(
+            value, ", ".join(RESTART_SUFFIXES)
+        )
+    return None
+
+
 class CastepCalculation(CalcJob, CastepInputGenerator):
     """
     Class representing a generic CASTEP calculation -
@@ -151,6 +202,50 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
             valid_type=list,
             default=cls._default_retrieve_list,
         )
+        spec.input(
+            "metadata.options.header_verbosity",
+            valid_type=str,
+            default="full",
+            validator=header_verbosity_validator,
+            help=(
+                "Verbosity of the header written to the input files: "
+                "'full' includes the information of the user, profile and the input nodes, "
+                "'minimal' only includes the link names and uuids of the input nodes "
+                "and 'none' disables the header."
+            ),
+        )
+        spec.input(
+            "metadata.options.pseudo_cache_folder",
+            valid_type=str,
+            required=False,
+            help=(
+                "Absolute path of a folder on the remote computer where the file based "
+                "pseudopotentials are staged, see "
+                "`aiida_castep.data.remote_cache.stage_pseudos`. "
+                "If set, the pseudopotentials are symlinked from this folder instead of being uploaded. "
+                "The files missing in the folder are uploaded when the calculation is submitted."
+            ),
+        )
+        spec.input(
+            "metadata.options.retrieve_checkpoint",
+            valid_type=str,
+            required=False,
+            validator=retrieve_checkpoint_validator,
+            help=(
+                "Retrieve the checkpoint file, either 'castep_bin' or 'check', so that "
+                "the calculation can be restarted after the remote folder is purged, "
+                "using the retrieved folder as the parent_checkpoint."
+            ),
+        )
+        spec.input(
+            "metadata.options.use_input_cache",
+            valid_type=bool,
+            default=False,
+            help=(
+                "Reuse the content of the input files rendered previously in the same process "
+                "for identical stored input nodes."
+            ),
+        )
 
         # Begin defining the input nodes
         spec.input(
@@ -178,6 +273,17 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
             help="Use a remote folder as the parent folder. Useful for restarts.",
             required=False,
         )
+        spec.input(
+            inp_ln["parent_checkpoint"],
+            valid_type=(orm.SinglefileData, orm.FolderData),
+            help=(
+                "A local checkpoint file, or a folder containing it such as the retrieved "
+                "folder of the parent calculation. The file referred by the continuation "
+                "or reuse keyword is copied to the parent folder. "
+                "Cannot be used together with the parent_calc_folder."
+            ),
+            required=False,
+        )
         spec.input_namespace(
             "pseudos",
             help=(
@@ -221,6 +327,17 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
         # Define the default inputs, enable CalcJobNode to use .res
         spec.default_output_node = out_ln["results"]
 
+    def _setup_db_record(self):
+        """Set up the node, which is hashed with the normalised inputs when stored"""
+        super()._setup_db_record()
+        use_normalised_hash(self.node)
+
+    def _stage_linked_pseudos(self, nodes):
+        """Upload the pseudopotentials linked from the remote cache folder if missing"""
+        cache_folder = self.inputs.metadata.options.pseudo_cache_folder
+        for path in ensure_pseudos_staged(self, nodes, cache_folder):
+            self.report(f"Staged pseudopotential {path} in the remote cache folder")
+
     def prepare_for_submission(self, folder):
         """
         Routine to be called when create the input files and other stuff
@@ -230,7 +347,10 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
         :param inputdict: a dictionary with the input nodes, as they would
                 be returned by get_inputs_dict (without the Code!)
         """
-        self.prepare_inputs()
+        # Generate the content of the cell and param files
+        self.prepare_inputs(
+            reset=True, use_cache=self.inputs.metadata.options.use_input_cache
+        )
 
         local_copy_list = []
         remote_copy_list = []
@@ -253,10 +373,10 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
         # END OF INITIAL INPUT CHECK #
         ##############################
 
-        # Generate input file
-        self.prepare_inputs(reset=True)
-
-        if self._write_headers is True:
+        verbosity = self.inputs.metadata.options.header_verbosity
+        if self._write_headers is not True:
+            verbosity = "none"
+        if verbosity != "none":
             cell_nodes = []
             for name, inp in self.inputs.items():
                 if name in self._cell_links and inp:
@@ -266,26 +386,31 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
             for name, pseudo in self.inputs.pseudos.items():
                 cell_nodes.append([f"pseudo__{name}", pseudo])
 
-            self.cell_file.header = self._generate_header_lines(cell_nodes)
+            self.cell_file.header = self._generate_header_lines(cell_nodes, verbosity)
 
             param_nodes = []
             for name, inp in self.inputs.items():
                 if name in self._param_links and inp:
                     param_nodes.append([name, inp])
 
-            self.param_file.header = self._generate_header_lines(param_nodes)
+            self.param_file.header = self._generate_header_lines(param_nodes, verbosity)
 
         local_copy_list.extend(self.local_copy_list_to_append)
+        remote_symlink_list.extend(self.remote_symlink_list_to_append)
+        linked_pseudos = self.get_linked_pseudos()
+        if linked_pseudos and not self.inputs.metadata.dry_run:
+            self._stage_linked_pseudos(linked_pseudos)
         seedname = self.inputs.metadata.options.seedname
 
         cell_fn = seedname + ".cell"
         param_fn = seedname + ".param"
 
+        # Stream the content to avoid holding the full text in the memory
         with folder.open(cell_fn, mode="w") as incell:
-            incell.write(self.cell_file.get_string())
+            write_input_file(self.cell_file, incell)
 
         with folder.open(param_fn, mode="w") as inparam:
-            inparam.write(self.param_file.get_string())
+            write_input_file(self.param_file, inparam)
 
         # IMPLEMENT OPERATIONS FOR RESTART
 
@@ -306,6 +431,20 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
                 )
             )
 
+        parent_checkpoint = self.inputs.get(inp_ln["parent_checkpoint"], None)
+        if parent_checkpoint:
+            if parent_calc_folder:
+                raise InputValidationError(
+                    "parent_checkpoint and parent_calc_folder cannot be used together"
+                )
+            parent_folder_name = self.inputs.metadata.options.parent_folder_name
+            fname = get_restart_filename(self.inputs)
+            src = get_checkpoint_filename(parent_checkpoint, fname)
+            folder.get_subfolder(parent_folder_name, create=True)
+            local_copy_list.append(
+                (parent_checkpoint.uuid, src, f"{parent_folder_name}/{fname}")
+            )
+
         calcinfo = CalcInfo()
         calcinfo.uuid = self.uuid
 
@@ -338,6 +477,10 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
         settings_retrieve_list = self.settings_dict.pop("ADDITIONAL_RETRIEVE_LIST", [])
         calcinfo.retrieve_list.extend(settings_retrieve_list)
 
+        checkpoint = self.inputs.metadata.options.get("retrieve_checkpoint")
+        if checkpoint:
+            calcinfo.retrieve_list.append(f"{seedname}.{checkpoint}")
+
         calcinfo.retrieve_temporary_list = []
         calcinfo.retrieve_temporary_list.extend(
             self.settings_dict.pop("ADDITIONAL_RETRIEVE_TEMPORARY_LIST", [])
@@ -359,7 +502,8 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
         calcinfo.retrieve_list += self._default_retrieve_list
 
         # Remove parser options in the setting dictionary
-        # At the moment parser options are not used here
+        # They are read by the parser from the settings node directly
+        check_parser_options(self.settings_dict.pop("PARSER_OPTIONS", {}))
 
         if self.settings_dict:
             raise InputValidationError(
@@ -389,6 +533,21 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
         """Check the existence of restart file is needed"""
         check_restart(builder, verbose)
 
+    @classmethod
+    def check_restarts(cls, builders, verbose=False):
+        """Check the restart files of many builders, see ``tools.check_restarts``"""
+        return check_restarts(builders, verbose)
+
+    @classmethod
+    def batch_dryrun_test(cls, inputs_list, castep_exe="castep.serial", **kwargs):
+        """
+        Do dryrun tests concurrently for a list of builders or inputs.
+        See :py:func:`aiida_castep.calculations.dryrun.batch_dryrun` for details.
+        """
+        return batch_dryrun(
+            inputs_list, castep_exe=castep_exe, calc_class=cls, **kwargs
+        )
+
     @classmethod
     def dryrun_test(cls, inputs, castep_exe="castep.serial", verbose=True):
         """
@@ -435,27 +594,17 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
                 raise InputValidationError("Error found during dryrun")
 
         # Gather information from the dryrun file
-        dryrun_results = {}
         out_file = seedname + ".castep"
         with folder.open(out_file) as fhandle:
-            for line in fhandle:
-                mth = re.match(r"\s*k-Points For SCF Sampling:\s+(\d+)\s*", line)
-                if mth:
-                    dryrun_results["num_kpoints"] = int(mth.group(1))
-                    _print(f"Number of k-points: {mth.group(1)}")
-                    mth = None
-                    continue
-                mth = re.match(
-                    r"\| Approx\. total storage required"
-                    r" per process\s+([0-9.]+)\sMB\s+([0-9.]+)",
-                    line,
+            dryrun_results = parse_dryrun_output(fhandle)
+        if "num_kpoints" in dryrun_results:
+            _print("Number of k-points: {}".format(dryrun_results["num_kpoints"]))
+        if "memory_MB" in dryrun_results:
+            _print(
+                "RAM: {} MB, DISK: {} MB".format(
+                    dryrun_results["memory_MB"], dryrun_results["disk_MB"]
                 )
-                if mth:
-                    dryrun_results["memory_MB"] = float(mth.group(1))
-                    dryrun_results["disk_MB"] = float(mth.group(2))
-                    _print(f"RAM: {mth.group(1)} MB, DISK: {mth.group(2)} MB")
-                    mth = None
-                    continue
+            )
 
         return folder, dryrun_results
 
@@ -490,31 +639,44 @@ class CastepCalculation(CalcJob, CastepInputGenerator):
     def use_pseudos_from_family(inputs, family_name):
         use_pseudos_from_family(inputs, family_name)
 
-    def _generate_header_lines(self, other_nodes=None):
+    def _generate_header_lines(self, other_nodes=None, verbosity="full"):
         """
         Generate header lines to go into param and cell files
         :param other_nodes: A list of pairs of (linkname, node)
+        :param verbosity: Verbosity of the header, 'full' or 'minimal'
 
         """
+        time_str = time.strftime("%H:%M:%S %d/%m/%Y %Z")
+        if other_nodes is None:
+            other_nodes = []
+
+        if verbosity == "minimal":
+            # Only use information available without querying the database
+            lines = [f"##### Generated by aiida_castep {time_str} #####"]
+            lines.extend(f"# {name}: {node.uuid}" for name, node in other_nodes)
+            lines.append("# END OF HEADER")
+            return lines
+
         profile = get_manager().get_profile()
         if not profile:
-            return None
+            return []
 
         wrapper = TextWrapper(initial_indent="# ", subsequent_indent="# ")
-        time_str = time.strftime("%H:%M:%S %d/%m/%Y %Z")
         lines = [
             f"##### Generated by aiida_castep {time_str} #####",
             "#         author: Bonan Zhu (zhubonan@outlook.com)",
-            "# "
-            "# AiiDA User: {}".format(orm.User.objects.get_default().get_full_name()),
-            f"# AiiDA profile: {profile.name}",
-            "# Information of the calculation node",
-            # "# type: {}".format(self.get_name()),
-            # "# pk: {}".format(self.pk),
-            # "# uuid: {}".format(self.uuid),
-            "# label: {}".format(self.inputs.metadata.get("label")),
-            "# description:",
         ]
+        lines.extend(_get_profile_header_lines(profile))
+        lines.extend(
+            [
+                "# Information of the calculation node",
+                # "# type: {}".format(self.get_name()),
+                # "# pk: {}".format(self.pk),
+                # "# uuid: {}".format(self.uuid),
+                "# label: {}".format(self.inputs.metadata.get("label")),
+                "# description:",
+            ]
+        )
 
         description = self.inputs.metadata.get("description")
         if description:
@@ -0,0 +1,169 @@
+"""
+Module for estimating the resources needed using the dryrun mode of CASTEP
+"""
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+
+from aiida.engine import ProcessBuilder
+
+DRYRUN_KPOINTS_RE = re.compile(r"\s*k-Points For SCF Sampling:\s+(\d+)\s*")
+DRYRUN_STORAGE_RE = re.compile(
+    r"\| Approx\. total storage required per process\s+([0-9.]+)\sMB\s+([0-9.]+)"
+)
+DRYRUN_FIELDS = ("num_kpoints", "memory_MB", "disk_MB")
+
+
+def parse_dryrun_output(lines):
+    """
+    Parse the .castep file written by a dryrun
+
+    :param lines: An iterable of the lines of the .castep file
+    :returns: A dictionary of ``num_kpoints``, ``memory_MB`` and ``disk_MB``
+    """
+    results = {}
+    for line in lines:
+        mth = DRYRUN_KPOINTS_RE.match(line)
+        if mth:
+            results["num_kpoints"] = int(mth.group(1))
+            continue
+        mth = DRYRUN_STORAGE_RE.match(line)
+        if mth:
+            results["memory_MB"] = float(mth.group(1))
+            results["disk_MB"] = float(mth.group(2))
+    return results
+
+
+def get_dryrun_results(node):
+    """
+    Get the results of a dryrun submitted as a calculation
+
+    :param node: A CalcJobNode run with the ``--dryrun`` command line argument
+    :returns: A dictionary of ``num_kpoints``, ``memory_MB`` and ``disk_MB``,
+      which is empty if the output file has not been retrieved
+    """
+    from aiida.common import NotExistent
+
+    seedname = node.get_option("seedname")
+    try:
+        retrieved = node.outputs.retrieved
+        with retrieved.base.repository.open(seedname + ".castep") as fhandle:
+            return parse_dryrun_output(fhandle)
+    except (NotExistent, FileNotFoundError):
+        return {}
+
+
+def run_dryrun(folder, seedname, castep_exe="castep.serial", timeout=None):
+    """
+    Run a dryrun in a folder with the input files prepared
+
+    :param folder: Path of the folder with the input files
+    :param seedname: Seedname of the calculation
+    :param castep_exe: The CASTEP executable to be used
+    :param timeout: Timeout in seconds for the dryrun
+
+    :returns: A dictionary of the results with an additional ``error`` field,
+      which is None if the dryrun is successful.
+    """
+    folder = Path(folder)
+    results = dict.fromkeys(DRYRUN_FIELDS)
+    results["error"] = None
+    try:
+        subprocess.run(
+            [castep_exe, "--dryrun", seedname],
+            cwd=str(folder),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=timeout,
+            check=False,
+        )
+    except OSError:
+        results["error"] = f"CASTEP executable '{castep_exe}' is not found"
+        return results
+    except subprocess.TimeoutExpired:
+        results["error"] = f"Dryrun timed out after {timeout} seconds"
+        return results
+
+    # Check if any *err files
+    for path in sorted(folder.iterdir()):
+        if fnmatch(path.name, "*.err"):
+            results["error"] = f"Error found in {path.name}: {path.read_text().strip()}"
+            return results
+
+    out_file = folder / (seedname + ".castep")
+    if not out_file.is_file():
+        results["error"] = f"Output file {out_file.name} is not found"
+        return results
+    with open(out_file) as fhandle:
+        results.update(parse_dryrun_output(fhandle))
+    return results
+
+
+def _get_label(inputs):
+    """Get the label for a builder or a dictionary of inputs"""
+    label = inputs["metadata"].get("label")
+    if not label and "structure" in inputs:
+        label = inputs["structure"].label
+    return label
+
+
+def batch_dryrun(
+    inputs_list,
+    castep_exe="castep.serial",
+    max_workers=None,
+    timeout=None,
+    keep_folders=False,
+    calc_class=None,
+):
+    """
+    Estimate the resources needed for many calculations with the dryrun mode of CASTEP
+
+    The input files are prepared in sequence as dry run submissions,
+    and the dryruns are then run concurrently.
+
+    :param inputs_list: A list of ``ProcessBuilder`` or dictionaries of inputs
+    :param castep_exe: The CASTEP executable to be used
+    :param max_workers: Maximum number of dryruns to run at the same time
+    :param timeout: Timeout in seconds for each dryrun
+    :param keep_folders: Keep the folders of the dryruns, otherwise they are deleted
+    :param calc_class: Class of the calculations for dictionaries of inputs,
+      default to ``CastepCalculation``
+
+    :returns: A list of dictionaries with the ``label``, ``num_kpoints``, ``memory_MB``,
+      ``disk_MB`` and ``error`` of each calculation, and the ``folder`` if ``keep_folders``
+      is True.
+    """
+    from .castep import CastepCalculation, submit_test
+
+    if calc_class is None:
+        calc_class = CastepCalculation
+
+    prepared = []
+    for inputs in inputs_list:
+        if isinstance(inputs, ProcessBuilder):
+            node, folder = submit_test(inputs)
+        else:
+            node, folder = submit_test(calc_class, **inputs)
+        prepared.append((_get_label(inputs), folder, node.get_option("seedname")))
+
+    def _run(item):
+        _, folder, seedname = item
+        return run_dryrun(folder, seedname, castep_exe=castep_exe, timeout=timeout)
+
+    # The work is done by the external processes, so threads are sufficient
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        dryrun_results = list(pool.map(_run, prepared))
+
+    table = []
+    for (label, folder, _), result in zip(prepared, dryrun_results):
+        row = {"label": label}
+        row.update(result)
+        if keep_folders:
+            row["folder"] = folder
+        else:
+            shutil.rmtree(folder, ignore_errors=True)
+        table.append(row)
+    return table
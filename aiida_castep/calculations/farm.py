@@ -0,0 +1,355 @@
+"""
+Task farming calculation packing many small CASTEP runs into a single job
+"""
+import shlex
+from collections.abc import Mapping
+
+import aiida.orm as orm
+from aiida.common import (
+    AttributeDict,
+    CalcInfo,
+    CodeInfo,
+    InputValidationError,
+)
+from aiida.engine import CalcJob
+
+from aiida_castep._version import CALC_PARSER_VERSION
+
+from ..common import EXIT_CODES_SPEC, INPUT_LINKNAMES, OUTPUT_LINKNAMES
+from ..data.remote_cache import ensure_pseudos_staged
+from .castep import CastepCalculation
+from .inpgen import CastepInputGenerator
+from .tools import input_param_validator
+from .utils import check_parser_options, write_input_file
+
+__version__ = CALC_PARSER_VERSION
+
+inp_ln = INPUT_LINKNAMES
+out_ln = OUTPUT_LINKNAMES
+
+__all__ = ["CastepFarmCalculation"]
+
+FARM_DRIVER_NAME = "farm.sh"
+FARM_LOG_NAME = "farm.log"
+
+# Inputs of each run in the farm, in addition to the extra kpoints
+FARM_MEMBER_INPUTS = {
+    inp_ln["structure"]: orm.StructureData,
+    inp_ln["parameters"]: orm.Dict,
+    inp_ln["kpoints"]: orm.KpointsData,
+    inp_ln["settings"]: orm.Dict,
+}
+
+FARM_DRIVER_TEMPLATE = """#!/bin/bash
+# Task farming driver generated by aiida_castep
+# The exit status of each run is recorded in {log_name}
+MAX_CONCURRENT={max_concurrent}
+CASTEP_CMD=({castep_cmd})
+
+run_member() {{
+    (cd "$1" && "${{CASTEP_CMD[@]}}")
+    echo "$1 $?" >> {log_name}
+}}
+
+for member in {members}; do
+    run_member "$member" &
+    while [ "$(jobs -rp | wc -l)" -ge "$MAX_CONCURRENT" ]; do
+        wait -n
+    done
+done
+wait
+"""
+
+
+def farm_members_validator(value, _):
+    """Validate the inputs of the runs in the farm"""
+    if not value:
+        return "At least one run must be defined in the farm"
+    extra_kpoints = {
+        key + "_" + inp_ln["kpoints"] for key in CastepCalculation._extra_kpoints
+    }
+    for label, inputs in value.items():
+        if not isinstance(inputs, Mapping):
+            return f"Inputs of run {label} must be a mapping"
+        for key in (inp_ln["structure"], inp_ln["parameters"], "pseudos"):
+            if key not in inputs:
+                return f"Missing input {key} for run {label}"
+        for key, node in inputs.items():
+            if key == "pseudos":
+                continue
+            if key in extra_kpoints:
+                valid_type = orm.KpointsData
+            elif key in FARM_MEMBER_INPUTS:
+                valid_type = FARM_MEMBER_INPUTS[key]
+            else:
+                return f"Input {key} of run {label} is not supported in a farm"
+            if not isinstance(node, valid_type):
+                return f"Input {key} of run {label} must be a {valid_type.__name__}"
+        msg = input_param_validator(inputs[inp_ln["parameters"]])
+        if msg:
+            return f"Run {label}: {msg}"
+    return None
+
+
+class FarmMemberInputGenerator(CastepInputGenerator):
+    """
+    Generate the inputs for one of the runs in a farm
+    """
+
+    def __init__(self, inputs):
+        """
+        Initialise the object
+
+        :param inputs: An ``AttributeDict`` with the inputs of the run, including
+          the ``code`` and ``metadata``
+        """
+        super().__init__()
+        self.inputs = inputs
+
+    def _prepare_cell_file(self):
+        """Add extra kpoints information to the cell file"""
+        super()._prepare_cell_file()
+        for kpn_name, kpn_settings in CastepCalculation._extra_kpoints.items():
+            extra_kpns = self.inputs.get(kpn_name + "_" + inp_ln["kpoints"])
+            if extra_kpns is not None:
+                self._include_extra_kpoints(extra_kpns, kpn_name, kpn_settings)
+
+
+class CastepFarmCalculation(CalcJob):
+    """
+    Run many independent CASTEP calculations within a single scheduler job.
+
+    Each run has its own sub folder named by its label in the ``members`` input
+    namespace, and the runs are launched by a driver script, at most
+    ``farm_max_concurrent`` of them at the same time.
+    The driver script is run by the ``driver_code``, which should be bash on the
+    same computer, in the same way as the code of a normal calculation.
+    The results of each run are parsed into the ``members.<label>`` output namespace.
+    """
+
+    # The driver script is not launched with MPI, see the farm_withmpi option
+    _DEFAULTS = dict(
+        CastepCalculation._DEFAULTS, parser_name="castep.farm", withmpi=False
+    )
+    _default_retrieve_list = CastepCalculation._default_retrieve_list
+    retrieve_dict = CastepCalculation.retrieve_dict
+
+    @classmethod
+    def define(cls, spec):
+        super().define(spec)
+
+        for key, value in cls._DEFAULTS.items():
+            spec.input("metadata.options." + key, default=value)
+
+        spec.input(
+            "metadata.options.pseudo_cache_folder",
+            valid_type=str,
+            required=False,
+            help=(
+                "Absolute path of a folder on the remote computer where the file based "
+                "pseudopotentials are staged, see "
+                "`aiida_castep.data.remote_cache.stage_pseudos`. "
+                "The files missing in the folder are uploaded when the farm is submitted."
+            ),
+        )
+        spec.input(
+            "metadata.options.farm_max_concurrent",
+            valid_type=int,
+            default=1,
+            help="Maximum number of runs in the farm to be launched at the same time.",
+        )
+        spec.input(
+            "metadata.options.farm_withmpi",
+            valid_type=bool,
+            default=True,
+            help="Launch each of the runs in the farm with MPI.",
+        )
+        spec.input(
+            "metadata.options.farm_mpiprocs_per_run",
+            valid_type=int,
+            required=False,
+            help=(
+                "Number of MPI processes of each run, default to the total number of "
+                "processes divided by farm_max_concurrent."
+            ),
+        )
+        spec.input(
+            "driver_code",
+            valid_type=orm.AbstractCode,
+            help=(
+                "Code for running the driver script, which should be bash on the same "
+                "computer, e.g. an InstalledCode with the /bin/bash executable."
+            ),
+        )
+        spec.input_namespace(
+            "members",
+            dynamic=True,
+            validator=farm_members_validator,
+            help=(
+                "Inputs of the runs to be farmed, keyed by the label of each run. "
+                "Each run takes the structure, parameters, pseudos, kpoints, settings "
+                "and extra kpoints inputs of a CastepCalculation."
+            ),
+        )
+
+        for smsg, (code, msg, inv) in EXIT_CODES_SPEC.items():
+            spec.exit_code(code, smsg, message=msg, invalidates_cache=inv)
+        spec.exit_code(
+            110,
+            "ERROR_FARM_MEMBER_FAILED",
+            message="At least one of the runs in the farm did not finish successfully",
+        )
+
+        spec.output(
+            out_ln["results"],
+            required=True,
+            valid_type=orm.Dict,
+            help="Exit status of each run in the farm.",
+        )
+        spec.output_namespace(
+            "members", dynamic=True, help="Outputs of each run in the farm."
+        )
+        spec.default_output_node = out_ln["results"]
+
+    def _get_member_inputs(self, label):
+        """Get the inputs of a run including the code and metadata"""
+        inputs = AttributeDict(self.inputs.members[label])
+        inputs["code"] = self.inputs.code
+        options = AttributeDict(self.inputs.metadata.options)
+        # The wall time of the job is shared by all the runs
+        options.pop("max_wallclock_seconds", None)
+        inputs["metadata"] = AttributeDict(
+            {
+                "label": label,
+                "computer": self.inputs.metadata.get("computer", None),
+                "options": options,
+            }
+        )
+        return inputs
+
+    def _get_job_resource(self):
+        """Get the job resource object of the scheduler for the job"""
+        computer = self.node.computer
+        scheduler = computer.get_scheduler()
+        resources = dict(self.node.get_option("resources"))
+        scheduler.preprocess_resources(
+            resources, computer.get_default_mpiprocs_per_machine()
+        )
+        return scheduler.create_job_resource(**resources)
+
+    def _get_castep_cmdline(self):
+        """Get the command line for launching each of the runs"""
+        options = self.inputs.metadata.options
+        code = self.inputs.code
+        if not options.farm_withmpi:
+            prepend = code.get_prepend_cmdline_params()
+        else:
+            job_resource = self._get_job_resource()
+            procs_per_run = options.get("farm_mpiprocs_per_run")
+            if procs_per_run is None:
+                procs_per_run = max(
+                    job_resource.get_tot_num_mpiprocs() // options.farm_max_concurrent,
+                    1,
+                )
+            # Substitute the placeholders as the engine does, but for a single run
+            subst_dict = dict(job_resource.items())
+            subst_dict["tot_num_mpiprocs"] = procs_per_run
+            mpi_args = [
+                arg.format(**subst_dict)
+                for arg in self.node.computer.get_mpirun_command()
+            ]
+            prepend = code.get_prepend_cmdline_params(
+                mpi_args, options.get("mpirun_extra_params")
+            )
+        return prepend + code.get_executable_cmdline_params([options.seedname])
+
+    def prepare_for_submission(self, folder):
+        """
+        Write the inputs of each run into its sub folder and the driver script
+        """
+        options = self.inputs.metadata.options
+        seedname = options.seedname
+        labels = sorted(self.inputs.members)
+
+        local_copy_list = []
+        remote_symlink_list = []
+        linked_pseudos = []
+        retrieve_list = [FARM_LOG_NAME]
+
+        for label in labels:
+            generator = FarmMemberInputGenerator(self._get_member_inputs(label))
+            generator.prepare_inputs(reset=True)
+            for key in generator.param_dict["PARAM"]:
+                if str(key).lower() in ["reuse", "continuation"]:
+                    raise InputValidationError(
+                        f"Restarting is not supported for run {label} in a farm"
+                    )
+
+            folder.get_subfolder(label, create=True)
+            with folder.open(f"{label}/{seedname}.cell", mode="w") as incell:
+                write_input_file(generator.cell_file, incell)
+            with folder.open(f"{label}/{seedname}.param", mode="w") as inparam:
+                write_input_file(generator.param_file, inparam)
+
+            # Each run needs its own copy of the file based pseudopotentials
+            for uuid, src, dst in sorted(generator.local_copy_list_to_append):
+                local_copy_list.append((uuid, src, f"{label}/{dst}"))
+            for comp_uuid, src, dst in sorted(generator.remote_symlink_list_to_append):
+                remote_symlink_list.append((comp_uuid, src, f"{label}/{dst}"))
+            linked_pseudos.extend(generator.get_linked_pseudos())
+
+            names = self._get_member_retrieve_names(generator, seedname)
+            retrieve_list.extend((f"{label}/{name}", ".", 2) for name in names)
+            if generator.settings_dict:
+                raise InputValidationError(
+                    "The following keys have been found in the settings input node "
+                    "of run {}, but were not understood: {}".format(
+                        label, ",".join(generator.settings_dict)
+                    )
+                )
+
+        if linked_pseudos and not self.inputs.metadata.dry_run:
+            ensure_pseudos_staged(self, linked_pseudos, options.pseudo_cache_folder)
+
+        with folder.open(FARM_DRIVER_NAME, mode="w") as fhandle:
+            fhandle.write(
+                FARM_DRIVER_TEMPLATE.format(
+                    log_name=FARM_LOG_NAME,
+                    max_concurrent=options.farm_max_concurrent,
+                    castep_cmd=" ".join(
+                        shlex.quote(str(arg)) for arg in self._get_castep_cmdline()
+                    ),
+                    members=" ".join(shlex.quote(label) for label in labels),
+                )
+            )
+
+        calcinfo = CalcInfo()
+        calcinfo.uuid = self.uuid
+        calcinfo.local_copy_list = local_copy_list
+        calcinfo.remote_copy_list = []
+        calcinfo.remote_symlink_list = remote_symlink_list
+        # The runs are launched by the driver script rather than the scheduler plugin,
+        # so that the prepend and append texts are placed around the driver
+        codeinfo = CodeInfo()
+        codeinfo.code_uuid = self.inputs.driver_code.uuid
+        codeinfo.cmdline_params = [FARM_DRIVER_NAME]
+        codeinfo.withmpi = False
+        calcinfo.codes_info = [codeinfo]
+        calcinfo.retrieve_list = retrieve_list
+        return calcinfo
+
+    def _get_member_retrieve_names(self, generator, seedname):
+        """Get the names of the files to be retrieved for a run"""
+        settings = generator.settings_dict
+        names = [seedname + ".castep", seedname + ".bands"]
+        names.extend(settings.pop("ADDITIONAL_RETRIEVE_LIST", []))
+        task = generator.param_file.get("task", "singlepoint")
+        names.extend(
+            seedname + suffix for suffix in self.retrieve_dict.get(task.lower(), [])
+        )
+        if generator.param_file.get("write_cell_structure"):
+            names.append(seedname + "-out.cell")
+        names.extend(self._default_retrieve_list)
+        # Options for the parser are read from the settings node directly
+        check_parser_options(settings.pop("PARSER_OPTIONS", {}))
+        return names
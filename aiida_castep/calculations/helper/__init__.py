@@ -3,10 +3,19 @@ CASTEP HELPER
 Check for errors in input dictionary
 """
 
+import hashlib
+import heapq
 import json
 import logging
 import os
+from collections import OrderedDict
+from collections.abc import Mapping
+from copy import deepcopy
+from difflib import SequenceMatcher
 from glob import glob
+from types import MappingProxyType
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +39,81 @@ incompatible_keys = [
 ]
 
 
+# Process-wide caches - the help information is loaded once for each file and
+# revalidated using the modification times and sizes of the files
+_HELP_INFO_CACHE = {}
+_HELP_INDEX_CACHE = {}
+_SEARCH_CACHE = {}
+_HELPER_REGISTRY = {}
+
+
 class HelperCheckError(RuntimeError):
     pass
 
 
+class LRUCache:
+    """
+    A simple bounded cache discarding the least recently used items
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Get an item and mark it as recently used"""
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def put(self, key, value):
+        """Store an item, discarding the least recently used one if the cache is full"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Clear the cache"""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Outcomes of the checks of the input dictionaries
+_CHECK_DICT_CACHE = LRUCache(maxsize=512)
+
+
+def _is_plain_data(obj):
+    """
+    Check if an object only contains dictionaries with string keys, lists and
+    scalars of the types understood by JSON, which are serialised unambiguously.
+    """
+    if type(obj) in (str, int, float, bool, type(None)):
+        return True
+    if type(obj) is list:
+        return all(_is_plain_data(item) for item in obj)
+    if type(obj) is dict:
+        return all(
+            type(key) is str and _is_plain_data(value) for key, value in obj.items()
+        )
+    return False
+
+
+def get_dict_hash(input_dict):
+    """
+    Return a canonical hash of the content of a dictionary, or None if the dictionary
+    contains anything other than plain data, e.g. numpy arrays, tuples or non-string keys.
+    """
+    if not _is_plain_data(input_dict):
+        return None
+    content = json.dumps(input_dict, sort_keys=True)
+    return hashlib.md5(content.encode()).hexdigest()
+
+
 class CastepHelper:
     """
     A class for helping castep inputs
@@ -43,6 +123,9 @@ class CastepHelper:
         # Instance level parameter for by passing any check at all
         self.BY_PASS = False
         self._HELP_DICT = None
+        self._index = None
+        self._help_path = None
+        self._signature = None
         self.version = version
         # Try to load th helper dictionary
         self.load_helper_dict()
@@ -52,8 +135,11 @@ class CastepHelper:
         Attempts to load a dictionary containing the helper information.
         This dictionary should be generated by the .generate module
         We look for .castep_helpinfo.json in the $HOME directory.
+
+        Only the compact index of the keywords is loaded here, the full dictionary is loaded
+        when the ``help_dict`` is accessed. Both are read-only and shared by all helpers in the process.
         """
-        pairs = find_help_info()
+        pairs = _find_help_info_cached()
         path = None
         for p, v in pairs:
             if v == self.version:
@@ -72,23 +158,39 @@ class CastepHelper:
             except IndexError:
                 print("No CASTEP help info detected")
                 self.BY_PASS = True
-                help_dict = {}
-            else:
-                help_dict = load_json(path)
-        else:
-            help_dict = load_json(path)
-        # Save the help_dict as a class attribute
-        self._HELP_DICT = help_dict
+                self._HELP_DICT = MappingProxyType({})
+                self._index = HelpIndex.from_help_dict({})
+        if path is not None:
+            self._index = load_help_index(path)
+        self._help_path = path
+        self._signature = _get_signature(path, _index_path_or_none(path))
+
+    def is_outdated(self):
+        """
+        Check if the help information may have changed since it was loaded,
+        i.e. the help info or index file has been modified or removed.
+        """
+        return (
+            _get_signature(self._help_path, _index_path_or_none(self._help_path))
+            != self._signature
+        )
 
     @property
     def help_dict(self):
         """A dictionary containing information of the helper"""
+        if self._HELP_DICT is None:
+            self._HELP_DICT = load_help_info(self._help_path)
         return self._HELP_DICT
 
+    @property
+    def index(self):
+        """The compact index of the keywords"""
+        return self._index
+
     @property
     def castep_help_version(self):
         """Version number of CASTEP that the help info is for"""
-        return self.help_dict["_CASTEP_VERSION"]
+        return self.index.version
 
     def save_helper_dict(self, help_dict, file_path):
         """
@@ -134,15 +236,15 @@ class CastepHelper:
             # Check each key
             for key in input_dict[kwtype]:
                 # key maybe be both lower or upper case
-                info = self.help_dict.get(key.lower(), None)
+                key_type = self.index.get_key_type(key.lower())
 
-                if info is None:
+                if key_type is None:
                     invalid_keys.append(key)
                     continue
 
                 # Check if the type is correct
-                if info["key_type"] != kwtype:
-                    wrong_keys.append((key, info["key_type"]))
+                if key_type != kwtype:
+                    wrong_keys.append((key, key_type))
                     continue
 
         return invalid_keys, wrong_keys
@@ -157,19 +259,17 @@ class CastepHelper:
         if self.BY_PASS:
             raise RuntimeError("Cannot construct dictionary - No help info found")
 
-        hinfo = self.help_dict
+        index = self.index
 
         # extract copies of CELL and PARAM fields from the input
         cell_dict = dict(input_dict.get("CELL", {}))
         param_dict = dict(input_dict.get("PARAM", {}))
         not_found = []
         for key in input_dict:
-            key_entry = hinfo.get(key, None)
-
-            if key_entry is None:
+            if key not in index:
                 not_found.append(key)
             else:
-                kwtype = key_entry.get("key_type")
+                kwtype = index.get_key_type(key)
                 if kwtype == "CELL":
                     cell_dict.update({key: input_dict[key]})
                 elif kwtype == "PARAM":
@@ -187,8 +287,55 @@ class CastepHelper:
         :param auto_fix bool: Whether we should fix error automatically
         :param allow_flat: Accept that the input dictionary is flat.
 
+        The outcome is cached using the content of the dictionary and the version of the help information,
+        so checking the same dictionary again is cheap. The warnings of the automatic fixes are emitted
+        again when the cached outcome is used. The input dictionary is never modified.
+
         :returns dict: A structured dictionary
         """
+        dict_hash = get_dict_hash(input_dict)
+        if self.BY_PASS or dict_hash is None:
+            return self._check_dict_uncached(deepcopy(input_dict), auto_fix, allow_flat)
+
+        key = (
+            dict_hash,
+            self.castep_help_version,
+            self._help_path,
+            self._signature,
+            auto_fix,
+            allow_flat,
+        )
+        outcome = _CHECK_DICT_CACHE.get(key)
+        if outcome is None:
+            warnings = []
+            try:
+                result = self._check_dict_uncached(
+                    deepcopy(input_dict), auto_fix, allow_flat, warnings
+                )
+            except HelperCheckError as error:
+                outcome = (False, error.args[0], warnings)
+            else:
+                outcome = (True, result, warnings)
+            _CHECK_DICT_CACHE.put(key, outcome)
+        else:
+            for message in outcome[2]:
+                logger.warning(message)
+
+        success, result, _ = outcome
+        if not success:
+            raise HelperCheckError(result)
+        return deepcopy(result)
+
+    def _check_dict_uncached(
+        self, input_dict, auto_fix=True, allow_flat=False, warnings=None
+    ):
+        """
+        Check input dictionary without caching, see ``check_dict``.
+
+        :param warnings: A list to which the warnings emitted are appended
+        """
+        if warnings is None:
+            warnings = []
         input_dict = input_dict.copy()  # this is a shallow copy
 
         # construct what to be checked
@@ -241,12 +388,12 @@ class CastepHelper:
         if wrong:
             if auto_fix is True:
                 for key, should_be in wrong:
+                    warnings.append(f"Key {key} moved to {should_be}")
+                    logger.warning(warnings[-1])
                     if should_be == "PARAM":
-                        logger.warning(f"Key {key} moved to PARAM")
                         value = input_dict["CELL"].pop(key)
                         input_dict["PARAM"].update({key: value})
                     else:
-                        logger.warning(f"Key {key} moved to CELL")
                         value = input_dict["PARAM"].pop(key)
                         input_dict["CELL"].update({key: value})
             else:
@@ -269,26 +416,165 @@ class CastepHelper:
         """
         Return string for suggestion of the string
         """
-        return _get_suggestion(string, list(self.help_dict.keys()))
+        return _format_suggestion(string, self.index.get_close_matches(string))
 
 
-def _get_suggestion(provided_string, allowed_strings):
+class HelpIndex:
     """
-    Given a string and a list of allowed_strings, it returns a string to print
-    on screen, with sensible text depending on whether no suggestion is found,
-    or one or more than one suggestions are found.
+    Compact index of the keywords of the help information.
 
-    :param provided_string: the string to compare
+    Only the type, value type and level of each keyword are stored as integer codes,
+    which is all that is needed for validating the inputs.
+    The size, modification time and md5 checksum of the help info file are stored for detecting
+    stale index files.
+    """
 
-    :param allowed_strings: a list of valid strings
+    def __init__(self, index_dict):
+        """Instantiate from a dictionary as stored in the index file"""
+        self.version = index_dict.get("_CASTEP_VERSION")
+        self.source_md5 = index_dict.get("source_md5")
+        self.source_size = index_dict.get("source_size")
+        self.source_mtime = index_dict.get("source_mtime")
+        self.key_types = tuple(index_dict["key_types"])
+        self.value_types = tuple(index_dict["value_types"])
+        self.key_levels = tuple(index_dict["key_levels"])
+        self._codes = {key: tuple(codes) for key, codes in index_dict["keys"].items()}
+        self._suggestion_index = None
+
+    def __contains__(self, key):
+        return key in self._codes
+
+    def __len__(self):
+        return len(self._codes)
+
+    def keys(self):
+        """Return a list of the keywords"""
+        return list(self._codes)
+
+    def get_key_type(self, key):
+        """Return the type of the keyword (CELL or PARAM) or None if not found"""
+        codes = self._codes.get(key)
+        return None if codes is None else self.key_types[codes[0]]
+
+    def get_value_type(self, key):
+        """Return the value type of the keyword or None if not found"""
+        codes = self._codes.get(key)
+        return None if codes is None else self.value_types[codes[1]]
+
+    def get_key_level(self, key):
+        """Return the level of the keyword or None if not found"""
+        codes = self._codes.get(key)
+        return None if codes is None else self.key_levels[codes[2]]
+
+    def get_close_matches(self, word, n=3, cutoff=0.6):
+        """Return a list of the keywords similar to the given word"""
+        if self._suggestion_index is None:
+            self._suggestion_index = SuggestionIndex(self.keys())
+        return self._suggestion_index.get_close_matches(word, n, cutoff)
+
+    @classmethod
+    def from_help_dict(cls, help_dict, source_md5=None, source_stat=None):
+        """Build the index from a full dictionary of the help information"""
+        return cls(build_index_dict(help_dict, source_md5, source_stat))
+
+    def matches_stat(self, stat):
+        """Check if the recorded size and modification time match those of a file"""
+        return (
+            self.source_size is not None
+            and self.source_size == stat.st_size
+            and self.source_mtime == stat.st_mtime_ns
+        )
 
-    :return: A string to print on output, to suggest to the user
+    def to_dict(self):
+        """Return the dictionary to be saved as the index file"""
+        return {
+            "_CASTEP_VERSION": self.version,
+            "source_md5": self.source_md5,
+            "source_size": self.source_size,
+            "source_mtime": self.source_mtime,
+            "key_types": list(self.key_types),
+            "value_types": list(self.value_types),
+            "key_levels": list(self.key_levels),
+            "keys": {key: list(codes) for key, codes in self._codes.items()},
+        }
+
+
+class SuggestionIndex:
+    """
+    Index for finding the words that are similar to a given string.
 
-    a possible valid value.
+    The results are the same as ``difflib.get_close_matches``. The length of the longest common
+    subsequence between the string and all words is computed at once, which gives an upper bound
+    of the similarity ratio. The ratio itself is only computed for the few words passing the bound.
     """
-    import difflib
 
-    similar_kws = difflib.get_close_matches(provided_string, allowed_strings)
+    # Bit-parallel computation requires the string to fit in a 64-bit integer
+    MAX_LENGTH = 63
+
+    def __init__(self, words):
+        """Build the index for a list of words"""
+        self.words = list(words)
+        chars = sorted(set("".join(self.words)))
+        # Column zero is reserved for padding
+        self._columns = {char: icol + 1 for icol, char in enumerate(chars)}
+        width = max(map(len, self.words), default=0)
+        self._chars = np.zeros((len(self.words), width), dtype=np.intp)
+        for irow, word in enumerate(self.words):
+            self._chars[irow, : len(word)] = [self._columns[char] for char in word]
+        self._lengths = np.array([len(word) for word in self.words], dtype=float)
+
+    def _lcs_lengths(self, word):
+        """
+        Return the lengths of the longest common subsequences of the word and all words,
+        using the bit-parallel algorithm of Hyyrö.
+        """
+        masks = np.zeros(len(self._columns) + 1, dtype=np.uint64)
+        for ibit, char in enumerate(word):
+            icol = self._columns.get(char)
+            if icol is not None:
+                masks[icol] |= np.uint64(1 << ibit)
+
+        vec = np.full(len(self.words), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for icol in range(self._chars.shape[1]):
+            matched = vec & masks[self._chars[:, icol]]
+            vec = (vec + matched) | (vec - matched)
+        vec &= np.uint64((1 << len(word)) - 1)
+        # Count the zero bits within the length of the word
+        ones = np.unpackbits(vec.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        return len(word) - ones
+
+    def get_close_matches(self, word, n=3, cutoff=0.6):
+        """
+        Return a list of the best matches of the word, see ``difflib.get_close_matches``
+        """
+        if not self.words:
+            return []
+        if len(word) <= self.MAX_LENGTH:
+            # SequenceMatcher finds a common subsequence, so its ratio is bounded by the LCS
+            upper_bound = 2.0 * self._lcs_lengths(word) / (self._lengths + len(word))
+            candidates = np.flatnonzero(upper_bound >= cutoff)
+        else:
+            candidates = range(len(self.words))
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        result = []
+        for irow in candidates:
+            matcher.set_seq1(self.words[irow])
+            if (
+                matcher.real_quick_ratio() >= cutoff
+                and matcher.quick_ratio() >= cutoff
+                and matcher.ratio() >= cutoff
+            ):
+                result.append((matcher.ratio(), self.words[irow]))
+        return [candidate for _, candidate in heapq.nlargest(n, result)]
+
+
+def _format_suggestion(provided_string, similar_kws):
+    """
+    Return the string for suggesting the similar keywords to the provided string
+    """
+    _ = provided_string
     if len(similar_kws) == 1:
         return f"(Maybe you wanted to specify {similar_kws[0]}?)"
     elif len(similar_kws) > 1:
@@ -299,6 +585,24 @@ def _get_suggestion(provided_string, allowed_strings):
         return "(No similar keywords found...)"
 
 
+def _get_suggestion(provided_string, allowed_strings):
+    """
+    Given a string and a list of allowed_strings, it returns a string to print
+    on screen, with sensible text depending on whether no suggestion is found,
+    or one or more than one suggestions are found.
+
+    :param provided_string: the string to compare
+
+    :param allowed_strings: a list of valid strings
+
+    :return: A string to print on output, to suggest to the user
+
+    a possible valid value.
+    """
+    similar_kws = SuggestionIndex(allowed_strings).get_close_matches(provided_string)
+    return _format_suggestion(provided_string, similar_kws)
+
+
 def load_json(path):
     """
     Load a json via file path
@@ -308,20 +612,201 @@ def load_json(path):
     return res
 
 
+def load_help_info(path):
+    """
+    Load the help information from a json file as a read-only mapping.
+
+    The result is cached for each path and reused as long as the file is not modified.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cached = _HELP_INFO_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    help_dict = MappingProxyType(
+        {
+            key: MappingProxyType(value) if isinstance(value, dict) else value
+            for key, value in load_json(path).items()
+        }
+    )
+    _HELP_INFO_CACHE[path] = (mtime, help_dict)
+    return help_dict
+
+
+def get_helper(version=None):
+    """
+    Return the CastepHelper shared in the process for the given version.
+
+    The helper is reloaded if the help information may have changed.
+    """
+    helper = _HELPER_REGISTRY.get(version)
+    if helper is None or helper.is_outdated():
+        helper = CastepHelper(version)
+        _HELPER_REGISTRY[version] = helper
+    return helper
+
+
+def clear_helper_cache():
+    """Clear the cached help information and helpers"""
+    _HELP_INFO_CACHE.clear()
+    _HELP_INDEX_CACHE.clear()
+    _CHECK_DICT_CACHE.clear()
+    _SEARCH_CACHE.clear()
+    _HELPER_REGISTRY.clear()
+
+
 def check_incompatible(dict_in, inc_list):
     """
     Check any conflicting keys in the dictionary
+
+    :returns: The first group in ``inc_list`` with more than one key present or None.
     """
-    for incomp in inc_list:
-        c = 0
-        for k in dict_in:
-            if k in incomp:
-                c += 1
-        if c > 1:
-            return incomp
+    masks = get_incompatible_masks(inc_list)
+    seen = 0
+    conflicts = 0
+    for key in dict_in:
+        mask = masks.get(key, 0)
+        conflicts |= seen & mask
+        seen |= mask
+    if conflicts:
+        # Lowest bit is the first group in the list
+        return inc_list[(conflicts & -conflicts).bit_length() - 1]
     return
 
 
+def get_incompatible_masks(inc_list):
+    """
+    Return a dictionary of the bitsets of the incompatible groups that each key belongs to.
+    Bit ``i`` is set if the key is in the i-th group.
+    """
+    key = tuple(map(tuple, inc_list))
+    masks = _INCOMPATIBLE_MASKS.get(key)
+    if masks is None:
+        masks = {}
+        for igroup, group in enumerate(key):
+            for name in group:
+                masks[name] = masks.get(name, 0) | (1 << igroup)
+        _INCOMPATIBLE_MASKS[key] = masks
+    return masks
+
+
+_INCOMPATIBLE_MASKS = {}
+
+
+def build_index_dict(help_dict, source_md5=None, source_stat=None):
+    """
+    Build the dictionary of the compact index from the full help information
+
+    :param help_dict: The full dictionary of the help information
+    :param source_md5: The md5 checksum of the file of the full help information
+    :param source_stat: The result of ``os.stat`` for the file of the full help information
+    """
+    tables = {"key_type": [], "value_type": [], "key_level": []}
+    keys = {}
+    for key, value in help_dict.items():
+        if not isinstance(value, Mapping):
+            continue
+        codes = []
+        for field, table in tables.items():
+            entry = value.get(field)
+            if entry not in table:
+                table.append(entry)
+            codes.append(table.index(entry))
+        keys[key] = codes
+    return {
+        "_CASTEP_VERSION": help_dict.get("_CASTEP_VERSION"),
+        "source_md5": source_md5,
+        "source_size": None if source_stat is None else source_stat.st_size,
+        "source_mtime": None if source_stat is None else source_stat.st_mtime_ns,
+        "key_types": tables["key_type"],
+        "value_types": tables["value_type"],
+        "key_levels": tables["key_level"],
+        "keys": keys,
+    }
+
+
+def get_file_md5(path):
+    """Return the md5 checksum of a file"""
+    with open(path, "rb") as fhandle:
+        return hashlib.md5(fhandle.read()).hexdigest()
+
+
+def get_index_path(path):
+    """Return the path of the index file for a help info file"""
+    dirname, basename = os.path.split(path)
+    if "castep_help_info_" in basename:
+        basename = basename.replace("castep_help_info_", "castep_help_index_")
+    else:
+        basename = os.path.splitext(basename)[0] + "_index.json"
+    return os.path.join(dirname, basename)
+
+
+def save_help_index(path, help_dict=None):
+    """
+    Save the compact index for a help info file
+
+    :param path: Path of the file of the full help information
+    :param help_dict: The full help information, loaded from the path if not given.
+    :returns: The path of the index file
+    """
+    if help_dict is None:
+        help_dict = load_json(path)
+    index_dict = build_index_dict(help_dict, get_file_md5(path), os.stat(path))
+    index_path = get_index_path(path)
+    with open(index_path, "w") as fhandle:
+        json.dump(index_dict, fhandle)
+    return index_path
+
+
+def load_help_index(path):
+    """
+    Load the compact index for a help info file.
+
+    The index file is used if it is present and consistent with the help info file,
+    otherwise the index is built from the full help information.
+    The help info file is only hashed if its size or modification time differ from
+    those recorded in the index.
+    The result is cached for each path and reused as long as the files are not modified.
+    """
+    index_path = get_index_path(path)
+    signature = _get_signature(path, index_path)
+    cached = _HELP_INDEX_CACHE.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    source_stat = os.stat(path)
+    index = None
+    if os.path.isfile(index_path):
+        index = HelpIndex(load_json(index_path))
+        if not index.matches_stat(source_stat):
+            if index.source_md5 == get_file_md5(path):
+                _refresh_index_stat(index, index_path, source_stat)
+            else:
+                logger.info(f"Index file {index_path} is outdated - ignored")
+                index = None
+    if index is None:
+        index = HelpIndex.from_help_dict(
+            load_help_info(path), get_file_md5(path), source_stat
+        )
+
+    _HELP_INDEX_CACHE[path] = (signature, index)
+    return index
+
+
+def _refresh_index_stat(index, index_path, source_stat):
+    """
+    Record the size and modification time of an unchanged help info file in its index,
+    so it does not need to be hashed again. The index file is left as it is if it cannot be written.
+    """
+    index.source_size = source_stat.st_size
+    index.source_mtime = source_stat.st_mtime_ns
+    try:
+        with open(index_path, "w") as fhandle:
+            json.dump(index.to_dict(), fhandle)
+    except OSError:
+        logger.debug(f"Cannot update index file {index_path}")
+
+
 def find_help_info():
     """
     Return possible paths of helper dict
@@ -337,7 +822,7 @@ def find_help_info():
     paths = glob(default_file_path) + others
     vs = []
     for p in paths:
-        tmp = p.replace(".json", "").split("_")
+        tmp = os.path.basename(p).replace(".json", "").split("_")
         if len(tmp) == 4:
             vs.append(float(tmp[-1]))
         else:
@@ -345,3 +830,44 @@ def find_help_info():
     comb = list(zip(paths, vs))
     comb.sort(key=lambda x: x[1], reverse=True)
     return comb
+
+
+def _get_search_dirs():
+    """Directories to be searched for the help information"""
+    return (module_path, os.getenv("HOME"))
+
+
+def _get_signature(*paths):
+    """
+    Return the modification times and sizes of the given files.
+    Missing files are included as None.
+    """
+    signature = []
+    for fpath in paths:
+        try:
+            stat = os.stat(fpath)
+        except (OSError, TypeError):
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _index_path_or_none(path):
+    """Return the index path for a help info file, or None if there is no file"""
+    return None if path is None else get_index_path(path)
+
+
+def _find_help_info_cached():
+    """
+    Cached version of ``find_help_info``.
+    The search is repeated only if any of the files found has been modified or removed.
+    Files added to the search directories afterwards are picked up after ``clear_helper_cache``.
+    """
+    key = _get_search_dirs()
+    cached = _SEARCH_CACHE.get(key)
+    if cached is None or cached[0] != _get_signature(*(p for p, _ in cached[1])):
+        pairs = find_help_info()
+        cached = (_get_signature(*(p for p, _ in pairs)), pairs)
+        _SEARCH_CACHE[key] = cached
+    return list(cached[1])
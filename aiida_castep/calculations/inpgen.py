@@ -1,18 +1,52 @@
 """
 Module for generating text based CASTEP inputs
 """
+from collections.abc import Mapping
+from copy import deepcopy
+
 import numpy as np
 from aiida.common import InputValidationError, MultipleObjectsError
+from aiida.orm import Data
 from castepinput import Block
 from castepinput.inputs import CellInput, ParamInput
 
+from aiida_castep._version import CALC_PARSER_VERSION, PLUGIN_VERSION
 from aiida_castep.common import INPUT_LINKNAMES as in_ln
 
 from ..data.otfg import OTFGData
-from .utils import _lowercase_dict, _uppercase_dict, get_castep_ion_line
+from ..data.remote_cache import get_remote_pseudo_path
+from .helper import LRUCache
+from .utils import (
+    _lowercase_dict,
+    _uppercase_dict,
+    get_castep_ion_line,
+    get_castep_ion_lines,
+    get_castep_kpoint_lines,
+    get_default_run_time,
+)
 
 # pylint: disable=no-member, too-many-locals, too-many-statements, too-many-branches
 
+# Cache of the rendered inputs keyed by the stored input nodes
+_RENDERED_INPUT_CACHE = LRUCache(maxsize=32)
+
+
+def clear_rendered_input_cache():
+    """Clear the cache of the rendered inputs"""
+    _RENDERED_INPUT_CACHE.clear()
+
+
+def _copy_input_file(input_file):
+    """
+    Copy a CellInput/ParamInput object
+
+    The blocks are shared as they are not modified after being rendered.
+    """
+    new = type(input_file)(input_file)
+    new.header = list(input_file.header)
+    new.units = dict(input_file.units)
+    return new
+
 
 class CastepInputGenerator:
     """
@@ -28,19 +62,153 @@ class CastepInputGenerator:
         self.param_file = ParamInput()
         self.cell_file = CellInput()
         self.local_copy_list_to_append = set()
+        self.remote_symlink_list_to_append = set()
         self.param_dict = {}
         self.settings_dict = {}
 
-    def prepare_inputs(self, reset=True):
+    # Inputs that do not affect the content of the rendered input files
+    _render_cache_exclude = ("code", "metadata", "parent_calc_folder")
+
+    # Options read when rendering and preparing the input files
+    _render_cache_options = (
+        "max_wallclock_seconds",
+        "use_kpoints",
+        "seedname",
+        "pseudo_cache_folder",
+        "symlink_usage",
+        "retrieve_checkpoint",
+        "parent_folder_name",
+    )
+
+    def prepare_inputs(self, reset=True, use_cache=False):
         """
         Prepare the inputs
         :param reset: Rest existing self.param_file and self.cell file
+        :param use_cache: Reuse the inputs rendered previously from the same
+          stored input nodes. Only effective if ``reset`` is True.
+        """
+        cache_key = None
+        if use_cache and reset:
+            cache_key = self._get_render_cache_key()
+            if cache_key is not None:
+                rendered = _RENDERED_INPUT_CACHE.get(cache_key)
+                if rendered is not None:
+                    self._restore_rendered_inputs(rendered)
+                    return
+
+        self._render_inputs(reset)
+        if cache_key is not None:
+            _RENDERED_INPUT_CACHE.put(cache_key, self._get_rendered_inputs())
+
+    def _get_render_cache_key(self):
+        """
+        Get the key for caching the rendered inputs.
+
+        The key is composed of the uuids of the input nodes, the label, the options
+        listed in ``_render_cache_options``, the location of the remote cache of the
+        pseudopotentials and the version of the plugin.
+        Returns None if any of the input nodes is not stored, as their content
+        may still be modified.
+        """
+        nodes = []
+        for name, value in self.inputs.items():
+            if name in self._render_cache_exclude:
+                continue
+            if isinstance(value, Mapping):
+                items = [(f"{name}__{key}", node) for key, node in value.items()]
+            else:
+                items = [(name, value)]
+            for link, node in items:
+                if not isinstance(node, Data) or not node.is_stored:
+                    return None
+                nodes.append((link, node.uuid))
+
+        options = self.inputs.metadata.options
+        return (
+            type(self).__name__,
+            CALC_PARSER_VERSION,
+            PLUGIN_VERSION,
+            self.inputs.metadata.get("label", None),
+            tuple((name, options.get(name)) for name in self._render_cache_options),
+            self._get_pseudo_cache_location(),
+            tuple(sorted(nodes)),
+        )
+
+    def _get_pseudo_cache_location(self):
+        """
+        Get the location of the remote cache folder of the pseudopotentials
+
+        :returns: A tuple of the uuid of the computer and the path of the
+          cache folder, or None if the cache folder is not used
+        """
+        cache_folder = self.inputs.metadata.options.get("pseudo_cache_folder")
+        if not cache_folder:
+            return None
+        computer = self.inputs.metadata.get("computer", None)
+        if computer is None:
+            computer = self.inputs.code.computer
+        if computer is None:
+            raise InputValidationError(
+                "Cannot use the remote pseudopotential cache without knowing the computer"
+            )
+        return computer.uuid, cache_folder
+
+    def get_linked_pseudos(self):
+        """
+        Get the file based pseudopotentials symlinked from the remote cache folder
+
+        :returns: A list of the pseudopotential nodes
+        """
+        cache_location = self._get_pseudo_cache_location()
+        if cache_location is None:
+            return []
+        linked = {src for _, src, _ in self.remote_symlink_list_to_append}
+        return [
+            node
+            for node in self.inputs.pseudos.values()
+            if not isinstance(node, OTFGData)
+            and get_remote_pseudo_path(cache_location[1], node) in linked
+        ]
+
+    def _get_rendered_inputs(self):
+        """Return a copy of the rendered inputs to be cached"""
+        return (
+            _copy_input_file(self.param_file),
+            _copy_input_file(self.cell_file),
+            frozenset(self.local_copy_list_to_append),
+            frozenset(self.remote_symlink_list_to_append),
+            deepcopy(self.param_dict),
+            deepcopy(self.settings_dict),
+        )
+
+    def _restore_rendered_inputs(self, rendered):
+        """Restore the rendered inputs from the cache"""
+        (
+            param_file,
+            cell_file,
+            local_copy_list,
+            remote_symlink_list,
+            param_dict,
+            settings_dict,
+        ) = rendered
+        self.param_file = _copy_input_file(param_file)
+        self.cell_file = _copy_input_file(cell_file)
+        self.local_copy_list_to_append = set(local_copy_list)
+        self.remote_symlink_list_to_append = set(remote_symlink_list)
+        self.param_dict = deepcopy(param_dict)
+        self.settings_dict = deepcopy(settings_dict)
+
+    def _render_inputs(self, reset=True):
+        """
+        Render the content of the param and cell files from the inputs
+        :param reset: Rest existing self.param_file and self.cell file
         """
         if reset:
             self.param_file = ParamInput()
             self.cell_file = CellInput()
 
         self.local_copy_list_to_append = set()
+        self.remote_symlink_list_to_append = set()
         param_dict = self.inputs[in_ln["parameters"]].get_dict()
         settings_node = self.inputs.get("settings", None)
         settings_dict = settings_node.get_dict() if settings_node else {}
@@ -54,15 +222,11 @@ class CastepInputGenerator:
         param_dict["PARAM"]["iprint"] = param_dict["PARAM"].get("iprint", 1)
 
         # Set run_time using define value for this calculation
-        run_time = self.inputs.metadata.options.get("max_wallclock_seconds")
-        if run_time:
-            n_seconds = run_time * 0.95
-            n_seconds = (n_seconds // 60) * 60  # Round down to the nearest minutes
-            # Do not do any thing if calculated time is less than 1 hour
-            if n_seconds < 180:
-                pass
-            elif "run_time" not in param_dict["PARAM"]:
-                param_dict["PARAM"]["run_time"] = int(n_seconds)
+        run_time = get_default_run_time(
+            self.inputs.metadata.options.get("max_wallclock_seconds")
+        )
+        if run_time and "run_time" not in param_dict["PARAM"]:
+            param_dict["PARAM"]["run_time"] = run_time
 
         # Set the default comment using the label of this calculation
         comment_str = self.inputs.metadata.get("label", None)
@@ -89,63 +253,72 @@ class CastepInputGenerator:
         self.cell_file["LATTICE_CART"] = Block(cell_vector_list)
 
         # --------- ATOMIC POSITIONS---------
-        # for kind in self.inputs[in_ln['structure']].kinds:
-        atomic_position_list = []
-        mixture_count = 0
+        structure = self.inputs[in_ln["structure"]]
         # deal with initial spins
         spin_list = self.settings_dict.pop("SPINS", None)
         label_list = self.settings_dict.pop("LABELS", None)
 
-        for i, site in enumerate(self.inputs[in_ln["structure"]].sites):
-            # get  the kind of the site
-            kind = self.inputs[in_ln["structure"]].get_kind(site.kind_name)
-
-            # Position is always needed
-            pos = site.position
-            mixture = False
+        # Resolve the names of each kind once
+        kinds = structure.kinds
+        kind_index = {kind.name: i for i, kind in enumerate(kinds)}
+        kind_names = []
+        kind_is_mixture = []
+        for kind in kinds:
             try:
                 name = kind.symbol
             # If we are dealing with mixed atoms
             except ValueError:
-                name = kind.symbols
-                mixture_count += 1
-                mixture = True
-
+                # If we are dealing with the mixtures,
+                # we also add the kindname as an identifier
+                kind_names.append([ntemp + ":" + kind.name for ntemp in kind.symbols])
+                kind_is_mixture.append(True)
+                continue
             # If the symbol is not the same as the kindname
             # e.g there are inequivalent atoms of the same element
             # We change the name to '<symbol>:<kind.name>'
-            if not mixture:
-                # Only do this if the name(symbol) is not equal to the kindname
-                if name != kind.name:
-                    name = name + ":" + kind.name
-            else:
-                # If we are dealing with the mixtures,
-                # we also add the kindname as an identifier
-                name = [ntemp + ":" + kind.name for ntemp in name]
-
-            if spin_list:
-                spin = spin_list[i]
-            else:
-                spin = None
-
-            # deal with labels
-            if label_list:
-                label = label_list[i]
-            else:
-                label = None
-
-            # Get the line of positions_abs block
-            line = get_castep_ion_line(
-                name,
-                pos,
-                label=label,
-                spin=spin,
-                occupation=kind.weights,
-                mix_num=mixture_count,
+            if name != kind.name:
+                name = name + ":" + kind.name
+            kind_names.append(name)
+            kind_is_mixture.append(False)
+
+        # Work with the raw site attributes to avoid constructing Site objects
+        sites = structure.base.attributes.get("sites", [])
+        site_kinds = np.array(
+            [kind_index[site["kind_name"]] for site in sites], dtype=int
+        )
+        positions = np.array([site["position"] for site in sites], dtype=float)
+        site_names = [kind_names[i] for i in site_kinds.tolist()]
+
+        # Sites with spins, labels or mixtures need to be handled individually
+        special = np.array(kind_is_mixture, dtype=bool)[site_kinds]
+        mixture_counts = np.cumsum(special)
+        if spin_list:
+            special |= np.array([spin is not None for spin in spin_list], dtype=bool)
+        if label_list:
+            special |= np.array([label is not None for label in label_list], dtype=bool)
+
+        if special.any():
+            atomic_position_list = []
+            plain = get_castep_ion_lines(
+                [site_names[i] for i in np.where(~special)[0]], positions[~special]
             )
-
-            # Append the line to the list
-            atomic_position_list.append(line)
+            plain_iter = iter(plain)
+            for i, is_special in enumerate(special.tolist()):
+                if not is_special:
+                    atomic_position_list.append(next(plain_iter))
+                    continue
+                # Get the line of positions_abs block
+                line = get_castep_ion_line(
+                    site_names[i],
+                    positions[i].tolist(),
+                    label=label_list[i] if label_list else None,
+                    spin=spin_list[i] if spin_list else None,
+                    occupation=kinds[site_kinds[i]].weights,
+                    mix_num=int(mixture_counts[i]),
+                )
+                atomic_position_list.append(line)
+        else:
+            atomic_position_list = get_castep_ion_lines(site_names, positions)
 
         # End of the atomic position block
         self.cell_file["POSITIONS_ABS"] = Block(atomic_position_list)
@@ -206,20 +379,14 @@ class CastepInputGenerator:
                 except AttributeError:
                     weights = np.ones(num_kpoints, dtype=float) / num_kpoints
 
-            kpoints_line_list = []
             if has_mesh is True:
                 self.cell_file["kpoints_mp_grid"] = "{} {} {}".format(*mesh)
                 if offset != [0.0, 0.0, 0.0]:
                     self.cell_file["kpoints_mp_offset"] = "{} {} {}".format(*offset)
             else:
-                for kpoint, weight in zip(kpoints_list, weights):
-                    kpoints_line_list.append(
-                        "{:18.10f} {:18.10f} "
-                        "{:18.10f} {:18.10f}".format(
-                            kpoint[0], kpoint[1], kpoint[2], weight
-                        )
-                    )
-                self.cell_file["KPOINTS_LIST"] = Block(kpoints_line_list)
+                self.cell_file["KPOINTS_LIST"] = Block(
+                    get_castep_kpoint_lines(kpoints_list, weights)
+                )
 
         # --------- keywords in cell file---------
         for key, value in self.param_dict["CELL"].items():
@@ -282,17 +449,12 @@ class CastepInputGenerator:
                     *offset
                 )
         else:
-            extra_kpts_lines = []
             if kpn_settings["need_weights"] is True:
-                for kpoint, weight in zip(bs_kpts_list, weights):
-                    extra_kpts_lines.append(
-                        f"{kpoint[0]:18.10f} {kpoint[1]:18.10f} {kpoint[2]:18.10f} {weight:18.14f}"
-                    )
+                extra_kpts_lines = get_castep_kpoint_lines(
+                    bs_kpts_list, weights, weight_format="%18.14f"
+                )
             else:
-                for kpoint in bs_kpts_list:
-                    extra_kpts_lines.append(
-                        f"{kpoint[0]:18.10f} {kpoint[1]:18.10f} {kpoint[2]:18.10f}"
-                    )
+                extra_kpts_lines = get_castep_kpoint_lines(bs_kpts_list)
             bname = f"{kpn_name}_kpoint_list".upper()
             self.cell_file[bname] = Block(extra_kpts_lines)
 
@@ -307,6 +469,8 @@ class CastepInputGenerator:
 
         species_pot_map = {}
         pseudos = self.inputs.pseudos
+        # File based pseudopotentials may be linked from the cache folder on the remote
+        cache_location = self._get_pseudo_cache_location()
         # Make kindname unique
         for kind in self.inputs[in_ln["structure"]].kinds:
             symbols = kind.symbols
@@ -339,10 +503,20 @@ class CastepInputGenerator:
                         species_pot_map[pseudo_name] = "{:5} {}".format(
                             pseudo_name, ps_node.filename
                         )
-                        # Add to the copy list
-                        self.local_copy_list_to_append.add(
-                            (ps_node.uuid, ps_node.filename, ps_node.filename)
-                        )
+                        if cache_location is None:
+                            # Add to the copy list
+                            self.local_copy_list_to_append.add(
+                                (ps_node.uuid, ps_node.filename, ps_node.filename)
+                            )
+                        else:
+                            # Link the file staged in the cache folder
+                            self.remote_symlink_list_to_append.add(
+                                (
+                                    cache_location[0],
+                                    get_remote_pseudo_path(cache_location[1], ps_node),
+                                    ps_node.filename,
+                                )
+                            )
                     except Exception as error:
                         raise InputValidationError(
                             "Unknown node as pseudo: {}. Exception raised: {}".format(
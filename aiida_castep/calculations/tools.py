@@ -1,21 +1,40 @@
 """
 Tools for calculations
 """
+
+import hashlib
+import json
+import re
 import warnings
 
+import numpy as np
 from aiida.common import InputValidationError
 from aiida.common.links import LinkType
 from aiida.engine import CalcJob, ProcessBuilder
-from aiida.orm import CalcJobNode, Dict
+from aiida.orm import CalcJobNode, Dict, SinglefileData
 from aiida.plugins import DataFactory
 from aiida.tools import CalculationTools
 
 from aiida_castep.common import INPUT_LINKNAMES, OUTPUT_LINKNAMES
 
+from .utils import _uppercase_dict
+
 __all__ = [
     "CastepCalcTools",
     "create_restart",
     "castep_input_summary",
+    "check_restarts",
+    "get_restart_artifacts",
+    "get_restart_artifacts_async",
+    "select_restart_suffix",
+    "select_auto_restart_suffix",
+    "get_checkpoint_suffixes",
+    "canonical_parameters",
+    "canonical_inputs",
+    "get_input_fingerprint",
+    "group_by_fingerprint",
+    "find_by_fingerprint",
+    "diff_canonical_inputs",
     "update_parameters",
     "use_pseudos_from_family",
 ]
@@ -25,13 +44,19 @@ class CastepCalcTools(CalculationTools):
     def get_castep_input_summary(self):
         return castep_input_summary(self._node)
 
-    def compare_with(self, the_other_calc, reverse=False):
+    def get_input_fingerprint(self):
+        return get_input_fingerprint(self._node)
+
+    def compare_with(self, the_other_calc, reverse=False, canonical=False):
         """
         Compare with another calculation
         Look for difference in get_castep_input_summary functions
         :params node: pk or uuid or node
         :params reverse: reverse the comparison, by default this node
         is the "new" and the one compared with is "old".
+        :params canonical: Compare only the canonical inputs, see ``canonical_inputs``.
+        The fingerprints are checked first and an empty dictionary is returned if they
+        are the same.
         """
         if isinstance(the_other_calc, (int, str)):
             from aiida.orm import load_node
@@ -40,6 +65,15 @@ class CastepCalcTools(CalculationTools):
         else:
             calc2 = the_other_calc
 
+        if canonical is True:
+            if get_input_fingerprint(self._node) == get_input_fingerprint(calc2):
+                return {}
+            this_inputs = canonical_inputs(self._node)
+            other_inputs = canonical_inputs(calc2)
+            if reverse is True:
+                return diff_canonical_inputs(this_inputs, other_inputs)
+            return diff_canonical_inputs(other_inputs, this_inputs)
+
         from deepdiff import DeepDiff
 
         this_param = castep_input_summary(self._node)
@@ -56,11 +90,28 @@ class CastepCalcTools(CalculationTools):
         ignore_state=False,
         restart_mode="restart",
         use_output_structure=False,
+        use_local_checkpoint=False,
         **kwargs,
     ):
+        """
+        Create a restart of this calculation, see ``create_restart`` for the keyword arguments.
+
+        :param use_local_checkpoint: Restart from the checkpoint file in the retrieved
+          folder, e.g. when the remote folder has been purged. The calculation must have
+          been run with the ``retrieve_checkpoint`` option.
+        """
         if self._node.exit_status != 0 and not ignore_state:
             raise RuntimeError("exit_status is not 0. Set ignore_state to ignore")
 
+        # The restart file is selected from the remote or the retrieved folder of this calculation
+        if restart_mode == "continuation" or kwargs.get("reuse"):
+            if use_local_checkpoint:
+                kwargs["parent_checkpoint"] = self._node.outputs.retrieved
+            else:
+                kwargs["parent_folder"] = self._node.outputs.__getattr__(
+                    "remote_folder"
+                )
+
         builder = create_restart(
             self._node.get_builder_restart(),
             calcjob=self._node,
@@ -76,11 +127,6 @@ class CastepCalcTools(CalculationTools):
                 OUTPUT_LINKNAMES["structure"]
             )
 
-        if restart_mode == "continuation" or kwargs.get("reuse"):
-            builder[
-                INPUT_LINKNAMES["parent_calc_folder"]
-            ] = self._node.outputs.__getattr__("remote_folder")
-
         return builder
 
 
@@ -191,6 +237,234 @@ def castep_input_summary(calc):
     return out_info
 
 
+# Suffixes of the files that can be used for restarting
+RESTART_SUFFIXES = ("castep_bin", "check")
+
+# Tolerance in Angstrom for rounding the cell and positions in the input fingerprint
+FINGERPRINT_TOLERANCE = 1e-5
+# Name of the extra storing the fingerprint, to be changed if the scheme changes
+FINGERPRINT_EXTRA = "castep_input_fingerprint_v1"
+
+
+def _get_calc_inputs(calc):
+    """Get the nested input dictionary of a CalcJobNode, ProcessBuilder or a dictionary"""
+    if isinstance(calc, CalcJobNode):
+        return calc.get_incoming(
+            link_type=(LinkType.INPUT_CALC, LinkType.INPUT_WORK)
+        ).nested()
+    if isinstance(calc, ProcessBuilder):
+        return calc._data
+    return calc
+
+
+def _round_array(values, tolerance):
+    """Round an array to integer multiples of the tolerance"""
+    return np.rint(np.asarray(values, dtype=float) / tolerance).astype(int).tolist()
+
+
+def _canonical_value(value):
+    """Normalise a value of the input parameters, stripping any inline comments"""
+    if isinstance(value, str):
+        value = re.split(r"[!#]", value, maxsplit=1)[0]
+        return " ".join(value.split())
+    if isinstance(value, (list, tuple)):
+        lines = [_canonical_value(item) for item in value]
+        return [line for line in lines if line != ""]
+    if isinstance(value, dict):
+        return {str(key).lower(): _canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def _canonical_kpoints(kpoints, tolerance):
+    """Canonical form of a KpointsData"""
+    try:
+        mesh, offset = kpoints.get_kpoints_mesh()
+        return {"mesh": list(mesh), "offset": _round_array(offset, tolerance)}
+    except AttributeError:
+        pass
+    try:
+        kpts, weights = kpoints.get_kpoints(also_weights=True)
+        weights = _round_array(weights, tolerance)
+    except AttributeError:
+        kpts, weights = kpoints.get_kpoints(), None
+    return {"kpoints": _round_array(kpts, tolerance), "weights": weights}
+
+
+def _canonical_pseudo(pseudo):
+    """Identify a pseudopotential by its OTFG string or the md5 of the file"""
+    from ..data.otfg import OTFGData
+    from ..data.remote_cache import get_pseudo_md5
+
+    if isinstance(pseudo, OTFGData):
+        return "otfg:" + pseudo.entry
+    return "md5:" + get_pseudo_md5(pseudo)
+
+
+def canonical_parameters(param_dict, ignored=("comment",)):
+    """
+    Normalise the input parameters
+
+    The sections are in upper case and the keywords in lower case.
+    Inline comments in the values are removed and the numbers are converted to float.
+
+    :param param_dict: A dictionary with the PARAM and CELL sections
+    :param ignored: Keywords to be excluded
+    :returns: A dictionary of the normalised parameters
+    """
+    parameters = {}
+    for section, section_dict in param_dict.items():
+        parameters[str(section).upper()] = {
+            key: value
+            for key, value in _canonical_value(section_dict).items()
+            if key not in ignored
+        }
+    return parameters
+
+
+def canonical_inputs(calc, tolerance=FINGERPRINT_TOLERANCE):
+    """
+    Get the canonical form of the inputs that determine the results of a calculation
+
+    Keys of the parameters are in lower case, with the ``comment`` keyword and the
+    inline comments removed. The cell and the positions are rounded to ``tolerance``,
+    and the pseudopotentials are identified by their md5 checksums or OTFG strings.
+    The code, computer, resources, labels and the parent folder are not included.
+
+    :param calc: A CalcJobNode or ProcessBuilder or a nested input dictionary
+    :param tolerance: Tolerance in Angstrom for rounding the cell and the positions
+    :returns: A dictionary that can be serialised to JSON
+    """
+    inp_dict = _get_calc_inputs(calc)
+    structure = inp_dict[INPUT_LINKNAMES["structure"]]
+    out = {
+        "parameters": canonical_parameters(
+            inp_dict[INPUT_LINKNAMES["parameters"]].get_dict()
+        ),
+        "structure": {
+            "cell": _round_array(structure.cell, tolerance),
+            "pbc": list(structure.pbc),
+            "kinds": [
+                [kind.name, list(kind.symbols), _round_array(kind.weights, 1e-6)]
+                for kind in structure.kinds
+            ],
+            "sites": [
+                [site.kind_name, _round_array(site.position, tolerance)]
+                for site in structure.sites
+            ],
+        },
+        "kpoints": {},
+        "pseudos": {
+            name: _canonical_pseudo(pseudo)
+            for name, pseudo in sorted(inp_dict.get("pseudos", {}).items())
+        },
+    }
+    for name, value in inp_dict.items():
+        if name.endswith(INPUT_LINKNAMES["kpoints"]) and value is not None:
+            out["kpoints"][name] = _canonical_kpoints(value, tolerance)
+
+    settings = inp_dict.get(INPUT_LINKNAMES["settings"])
+    if settings is not None:
+        settings = _uppercase_dict(settings.get_dict(), "settings")
+        out["settings"] = {
+            key: settings[key]
+            for key in ("SPINS", "LABELS", "CMDLINE")
+            if key in settings
+        }
+    return out
+
+
+def get_input_fingerprint(calc, tolerance=FINGERPRINT_TOLERANCE):
+    """
+    Get the fingerprint of the canonical inputs of a calculation
+
+    Calculations with the same fingerprint have the same physical inputs.
+    For a stored CalcJobNode, the fingerprint with the default tolerance is
+    saved in the ``castep_input_fingerprint_v1`` extra and reused afterwards.
+
+    :param calc: A CalcJobNode or ProcessBuilder or a nested input dictionary
+    :param tolerance: Tolerance in Angstrom for rounding the cell and the positions
+    :returns: A string of the sha256 checksum
+    """
+    cache = (
+        isinstance(calc, CalcJobNode)
+        and calc.is_stored
+        and tolerance == FINGERPRINT_TOLERANCE
+    )
+    if cache:
+        fingerprint = calc.base.extras.get(FINGERPRINT_EXTRA, None)
+        if fingerprint is not None:
+            return fingerprint
+
+    content = json.dumps(canonical_inputs(calc, tolerance), sort_keys=True)
+    fingerprint = hashlib.sha256(content.encode()).hexdigest()
+    if cache:
+        calc.base.extras.set(FINGERPRINT_EXTRA, fingerprint)
+    return fingerprint
+
+
+def group_by_fingerprint(calcs, tolerance=FINGERPRINT_TOLERANCE):
+    """
+    Group the calculations by the fingerprints of their inputs
+
+    :param calcs: An iterable of CalcJobNode, ProcessBuilder or nested input dictionaries
+    :returns: A dictionary of lists of the calculations keyed by the fingerprints
+    """
+    groups = {}
+    for calc in calcs:
+        groups.setdefault(get_input_fingerprint(calc, tolerance), []).append(calc)
+    return groups
+
+
+def find_by_fingerprint(fingerprint, limit=None):
+    """
+    Query the stored calculations with a fingerprint saved in the extras
+
+    :param fingerprint: The fingerprint returned by ``get_input_fingerprint``
+    :returns: A list of CalcJobNode
+    """
+    from aiida.orm import QueryBuilder
+
+    qbd = QueryBuilder()
+    qbd.append(
+        CalcJobNode, filters={f"extras.{FINGERPRINT_EXTRA}": fingerprint}, project="*"
+    )
+    if limit is not None:
+        qbd.limit(limit)
+    return qbd.all(flat=True)
+
+
+def _flatten_dict(in_dict, prefix=""):
+    """Flatten a nested dictionary with dot separated keys"""
+    out = {}
+    for key, value in in_dict.items():
+        key = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            out.update(_flatten_dict(value, key + "."))
+        else:
+            out[key] = value
+    return out
+
+
+def diff_canonical_inputs(old, new):
+    """
+    Compare the canonical inputs of two calculations
+
+    :param old: The canonical inputs returned by ``canonical_inputs``
+    :param new: The canonical inputs to be compared with ``old``
+    :returns: A dictionary of (old, new) values keyed by the dot separated paths of
+      the differing entries. Missing entries are ``None``.
+    """
+    old = _flatten_dict(old)
+    new = _flatten_dict(new)
+    return {
+        key: (old.get(key), new.get(key))
+        for key in sorted(set(old) | set(new))
+        if old.get(key) != new.get(key)
+    }
+
+
 def update_parameters(inputs, force=False, delete=None, **kwargs):
     """
     Convenient function to update the parameters of the calculation.
@@ -234,9 +508,9 @@ def update_parameters(inputs, force=False, delete=None, **kwargs):
         py_dict = True
 
     # Update the dictionary
-    from .helper import CastepHelper, HelperCheckError
+    from .helper import HelperCheckError, get_helper
 
-    helper = CastepHelper()
+    helper = get_helper()
     dict_update, not_found = helper._from_flat_dict(kwargs)
     if not_found:
         suggest = [helper.get_suggestion(i) for i in not_found]
@@ -264,6 +538,191 @@ def update_parameters(inputs, force=False, delete=None, **kwargs):
     return inputs
 
 
+def get_restart_artifacts(remote_data, seedname="aiida"):
+    """
+    Get the restart files existing in a remote folder
+
+    :param remote_data: The ``RemoteData`` of the parent calculation
+    :param seedname: Seed name of the parent calculation
+    :returns: A dictionary of the sizes in bytes keyed by the suffixes of the restart
+      files, e.g. ``{"check": 1024, "castep_bin": 128}``.
+    """
+    import posixpath
+
+    artifacts = {}
+    with remote_data.get_authinfo().get_transport() as transport:
+        path = remote_data.get_remote_path()
+        try:
+            names = transport.listdir(path)
+        except OSError:
+            return artifacts
+        for suffix in RESTART_SUFFIXES:
+            name = f"{seedname}.{suffix}"
+            if name in names:
+                attributes = transport.get_attribute(posixpath.join(path, name))
+                artifacts[suffix] = attributes.st_size
+    return artifacts
+
+
+async def get_restart_artifacts_async(remote_data, transport_queue, seedname="aiida"):
+    """
+    Get the restart files existing in a remote folder using a transport queue
+
+    The transport is requested from the queue, so the event loop, e.g. that of the
+    daemon runner, is not blocked while the folder is inspected.
+
+    :param remote_data: The ``RemoteData`` of the parent calculation
+    :param transport_queue: The ``TransportQueue``, e.g. ``runner.transport``
+    :param seedname: Seed name of the parent calculation
+    :returns: The sizes of the restart files, see ``get_restart_artifacts``
+    """
+    import posixpath
+
+    artifacts = {}
+    authinfo = remote_data.get_authinfo()
+    async with transport_queue.request_transport(authinfo) as request:
+        transport = await request
+        path = remote_data.get_remote_path()
+        try:
+            names = await transport.listdir_async(path)
+        except OSError:
+            return artifacts
+        for suffix in RESTART_SUFFIXES:
+            name = f"{seedname}.{suffix}"
+            if name in names:
+                attributes = await transport.get_attribute_async(
+                    posixpath.join(path, name)
+                )
+                artifacts[suffix] = attributes.st_size
+    return artifacts
+
+
+def _get_transport_errors():
+    """Get the exceptions raised when a remote folder cannot be inspected"""
+    from aiida.common.exceptions import NotExistent
+    from aiida.transports.transport import TransportInternalError
+    from paramiko import SSHException
+
+    return (OSError, NotExistent, TransportInternalError, SSHException)
+
+
+def select_restart_suffix(artifacts, restart_mode):
+    """
+    Select the restart file to be used
+
+    The ``check`` file contains the wavefunctions which are needed for continuations,
+    while the ``castep_bin`` file only contains the density, which is sufficient for
+    reusing. The smallest of the files satisfying the restart mode is selected.
+
+    :param artifacts: The sizes of the restart files returned by ``get_restart_artifacts``
+    :param restart_mode: Either 'continuation' or 'reuse'
+    :returns: The suffix of the selected file, or None if no file can be used
+    """
+    if restart_mode == "continuation":
+        usable = ["check"]
+    elif restart_mode == "reuse":
+        usable = list(RESTART_SUFFIXES)
+    else:
+        raise ValueError(f"Unknown restart mode: {restart_mode}")
+    usable = [suffix for suffix in usable if suffix in artifacts]
+    if not usable:
+        return None
+    return min(usable, key=lambda suffix: artifacts[suffix])
+
+
+def select_auto_restart_suffix(
+    restart_mode,
+    parent_folder=None,
+    parent_checkpoint=None,
+    seedname="aiida",
+    transport_queue=None,
+):
+    """
+    Select the restart file to be used from those available in the parent
+
+    Only the ``check`` file can be used for continuations, so the parent is not
+    inspected in this case. For the files in a local checkpoint the ``castep_bin``
+    file is preferred following the order of ``RESTART_SUFFIXES``, since it does not
+    contain the wavefunctions. The files in a remote folder are selected by their
+    sizes using ``select_restart_suffix``, and the ``check`` file is used if the
+    folder cannot be inspected.
+
+    :param restart_mode: Either 'continuation' or 'reuse'
+    :param parent_folder: The ``RemoteData`` of the parent calculation
+    :param parent_checkpoint: A local checkpoint file or folder
+    :param seedname: Seed name of the parent calculation
+    :param transport_queue: A ``TransportQueue`` to inspect the remote folder with,
+      without blocking the event loop. It can only be used inside the steps of a
+      running process, e.g. ``self.runner.transport`` in a WorkChain.
+    :returns: The suffix of the selected file
+    """
+    suffix = None
+    if restart_mode == "continuation":
+        pass
+    elif parent_checkpoint is not None:
+        suffixes = get_checkpoint_suffixes(parent_checkpoint, seedname)
+        suffix = suffixes[0] if suffixes else None
+    elif parent_folder is not None:
+        try:
+            if transport_queue is None:
+                artifacts = get_restart_artifacts(parent_folder, seedname)
+            else:
+                from plumpy import sync_await
+
+                artifacts = sync_await(
+                    get_restart_artifacts_async(
+                        parent_folder, transport_queue, seedname
+                    )
+                )
+        except _get_transport_errors():
+            # The computer may be unreachable, use the default file instead
+            artifacts = {}
+        suffix = select_restart_suffix(artifacts, restart_mode)
+    return suffix or "check"
+
+
+def get_checkpoint_suffixes(checkpoint, seedname="aiida"):
+    """
+    Get the types of the restart files stored in a local checkpoint node
+
+    :param checkpoint: A ``SinglefileData`` or ``FolderData``
+    :param seedname: Seed name of the parent calculation
+    :returns: A list of the suffixes, in the order of ``RESTART_SUFFIXES``
+    """
+    if isinstance(checkpoint, SinglefileData):
+        names = [f"{seedname}.{checkpoint.filename.rsplit('.', 1)[-1]}"]
+    else:
+        names = checkpoint.base.repository.list_object_names()
+    return [suffix for suffix in RESTART_SUFFIXES if f"{seedname}.{suffix}" in names]
+
+
+def get_checkpoint_filename(checkpoint, fname):
+    """
+    Get the name of the restart file inside a local checkpoint node
+
+    :param checkpoint: A ``SinglefileData`` or ``FolderData``
+    :param fname: Name of the restart file required, e.g. ``aiida.check``
+    :returns: The name of the file in the repository of the node
+    :raises: InputValidationError if the required file is not found
+    """
+    if fname is None:
+        raise InputValidationError(
+            "A parent_checkpoint is given but neither continuation nor reuse is set"
+        )
+    suffix = fname.rsplit(".", 1)[-1]
+    if isinstance(checkpoint, SinglefileData):
+        if checkpoint.filename.rsplit(".", 1)[-1] != suffix:
+            raise InputValidationError(
+                f"The parent_checkpoint {checkpoint.filename} is not a {suffix} file"
+            )
+        return checkpoint.filename
+    if fname not in checkpoint.base.repository.list_object_names():
+        raise InputValidationError(
+            f"Restart file {fname} is not in the parent_checkpoint folder"
+        )
+    return fname
+
+
 def create_restart(
     inputs,
     entry_point="castep.castep",
@@ -274,6 +733,7 @@ def create_restart(
     use_castep_bin=False,
     parent_folder=None,
     reuse=False,
+    parent_checkpoint=None,
 ):
     """
     Function to create a restart for a calculation.
@@ -282,9 +742,12 @@ def create_restart(
     :param param_update: Update the parameters
     :param param_delete: A list of parameters to be deleted
     :param restart_mode: Mode of the restart, 'continuation' or 'restart'
-    :param use_castep_bin: Use hte 'castep_bin' file instead of check
+    :param use_castep_bin: Use hte 'castep_bin' file instead of check. If 'auto', the
+      restart file is selected from those available, see ``select_auto_restart_suffix``.
     :param parent_folder: Remote folder to be used for restart
     :param reuse: Use the reuse mode
+    :param parent_checkpoint: A local checkpoint file or folder to be used for restart
+      instead of the remote folder
     """
     from aiida.engine import ProcessBuilder
     from aiida.plugins import CalculationFactory
@@ -303,12 +766,23 @@ def create_restart(
     delete = []
 
     # Set the restart tag
-    suffix = ".check" if not use_castep_bin else ".castep_bin"
+    seedname = builder.metadata.options.get("seedname", "aiida")
+    if parent_folder is None:
+        parent_folder = builder.get(INPUT_LINKNAMES["parent_calc_folder"])
+    if use_castep_bin == "auto":
+        suffix = "." + select_auto_restart_suffix(
+            restart_mode="continuation" if restart_mode == "continuation" else "reuse",
+            parent_folder=parent_folder if reuse else None,
+            parent_checkpoint=parent_checkpoint,
+            seedname=seedname,
+        )
+    else:
+        suffix = ".check" if not use_castep_bin else ".castep_bin"
     if restart_mode == "continuation":
-        update["continuation"] = "parent/" + builder.metadata.seedname + suffix
+        update["continuation"] = "parent/" + seedname + suffix
         delete.append("reuse")
     elif restart_mode == "restart" and reuse:
-        update["reuse"] = "parent/" + builder.metadata.seedname + suffix
+        update["reuse"] = "parent/" + seedname + suffix
         delete.append("continuation")
     elif restart_mode is None:
         delete.extend(["continuation", "reuse"])
@@ -322,8 +796,11 @@ def create_restart(
 
     new_builder = update_parameters(builder, force=True, delete=delete, **update)
 
-    # Set the parent folder
-    if parent_folder is not None:
+    # Set the parent folder, or the local checkpoint
+    if parent_checkpoint is not None:
+        new_builder[INPUT_LINKNAMES["parent_checkpoint"]] = parent_checkpoint
+        new_builder.pop(INPUT_LINKNAMES["parent_calc_folder"], None)
+    elif parent_folder is not None:
         new_builder[INPUT_LINKNAMES["parent_calc_folder"]] = parent_folder
 
     return new_builder
@@ -335,13 +812,13 @@ def validate_input_param(input_dict, allow_flat=False):
     :param input_dict: A Dict instance or python dict instance
     """
 
-    from .helper import CastepHelper
+    from .helper import get_helper
 
     if isinstance(input_dict, Dict):
         py_dict = input_dict.get_dict()
     else:
         py_dict = input_dict
-    helper = CastepHelper()
+    helper = get_helper()
     helper.check_dict(py_dict, auto_fix=False, allow_flat=allow_flat)
 
 
@@ -370,27 +847,39 @@ def flat_input_param_validator(input_dict, port=None):
         return error.args[0]
 
 
-def check_restart(builder, verbose=False):
+def get_restart_filename(builder):
     """
-    Check the RemoteData reference by the builder is satisfied
-    :returns: True if OK
-    :raises: InputValidationError if error is found
+    Get the name of the restart file required by the builder
+
+    :returns: The name of the file, or None if no restart file is needed
     """
     import os
 
     from .utils import _lowercase_dict
 
-    def _print(inp):
-        if verbose:
-            print(inp)
-
     paramdict = builder[INPUT_LINKNAMES["parameters"]].get_dict()["PARAM"]
     paramdict = _lowercase_dict(paramdict, "paramdict")
     stemp = paramdict.get("reuse", None)
     if not stemp:
         stemp = paramdict.get("continuation", None)
-    if stemp is not None:
-        fname = os.path.split(stemp)[-1]
+    if stemp is None:
+        return None
+    return os.path.split(stemp)[-1]
+
+
+def check_restart(builder, verbose=False):
+    """
+    Check the RemoteData reference by the builder is satisfied
+    :returns: True if OK
+    :raises: InputValidationError if error is found
+    """
+
+    def _print(inp):
+        if verbose:
+            print(inp)
+
+    fname = get_restart_filename(builder)
+    if fname is not None:
         _print(f"This calculation requires a restart file: '{fname}'")
     else:
         # No restart file needed
@@ -413,3 +902,70 @@ def check_restart(builder, verbose=False):
         else:
             _print(f"Check finished, restart file '{fname}' exists.")
             return True
+
+
+def list_remote_folders(remote_folders):
+    """
+    List the content of many remote folders, using a single transport for each computer
+
+    :param remote_folders: An iterable of ``RemoteData``
+    :returns: A dictionary of the lists of file names keyed by the uuids of the ``RemoteData``.
+      The value is None if the folder does not exist.
+    """
+    by_computer = {}
+    for remote_data in remote_folders:
+        folders = by_computer.setdefault(remote_data.computer.uuid, {})
+        folders[remote_data.uuid] = remote_data
+
+    listing = {}
+    for folders in by_computer.values():
+        authinfo = next(iter(folders.values())).get_authinfo()
+        with authinfo.get_transport() as transport:
+            for uuid, remote_data in folders.items():
+                try:
+                    listing[uuid] = transport.listdir(remote_data.get_remote_path())
+                except OSError:
+                    listing[uuid] = None
+    return listing
+
+
+def check_restarts(builders, verbose=False):
+    """
+    Check the restart files of many builders
+
+    The parent folders are grouped by the computer and listed with a single
+    transport for each computer, rather than opening a connection for each builder
+    as ``check_restart`` does.
+
+    :param builders: A list of builders or nested input dictionaries
+    :returns: A list of (passed, message) tuples, one for each builder
+    """
+    required = []
+    remote_folders = []
+    for builder in builders:
+        fname = get_restart_filename(builder)
+        remote_data = builder.get(INPUT_LINKNAMES["parent_calc_folder"])
+        required.append((fname, remote_data))
+        if fname is not None and remote_data:
+            remote_folders.append(remote_data)
+
+    listing = list_remote_folders(remote_folders)
+    results = []
+    for fname, remote_data in required:
+        if fname is None:
+            result = (True, "This calculation does not require a restart file.")
+        elif not remote_data:
+            result = (False, "Restart requires parent_folder to be specified")
+        elif listing[remote_data.uuid] is None:
+            result = (
+                False,
+                f"Remote folder {remote_data.get_remote_path()} is missing",
+            )
+        elif fname not in listing[remote_data.uuid]:
+            result = (False, f"Restart file {fname} is not in the remote folder")
+        else:
+            result = (True, f"Restart file '{fname}' exists.")
+        if verbose:
+            print(result[1])
+        results.append(result)
+    return results
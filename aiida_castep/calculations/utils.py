@@ -2,9 +2,13 @@
 Utility module
 """
 from collections import Counter
+from itertools import islice
 
+import numpy as np
 from aiida.common import InputValidationError
 
+from ..common import PARSER_OPTIONS
+
 
 def get_castep_ion_line(
     name, pos, label=None, spin=None, occupation=None, mix_num=None
@@ -78,6 +82,147 @@ def get_castep_ion_line(
     return line
 
 
+def get_castep_ion_lines(names, positions):
+    """
+    Generate the lines in POSITIONS_ABS or POSITIONS_FRAC block in bulk
+
+    Only plain sites are supported - the layout is the same as that of
+    ``get_castep_ion_line`` without spins, labels and mixtures.
+
+    :param names: A sequence of the names of the sites
+    :param positions: An array of the positions with shape (N, 3)
+
+    :return lines: a list of the lines to be added to the cell file
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    nsites = len(names)
+    if nsites != positions.shape[0]:
+        raise ValueError(
+            "Mismatch between the number of names ({}) and positions ({})".format(
+                nsites, positions.shape[0]
+            )
+        )
+    if nsites == 0:
+        return []
+
+    # Interleave the names and coordinates then format everything in one go
+    values = [None] * (nsites * 4)
+    values[::4] = names
+    pos = positions.T.tolist()
+    values[1::4] = pos[0]
+    values[2::4] = pos[1]
+    values[3::4] = pos[2]
+    text = ("%-18s %18.10f %18.10f %18.10f\n" * nsites) % tuple(values)
+    return text.split("\n")[:-1]
+
+
+def get_castep_kpoint_lines(kpoints, weights=None, weight_format="%18.10f"):
+    """
+    Generate the lines in a k-point list block in bulk
+
+    :param kpoints: An array of the kpoints with shape (nk, 3)
+    :param weights: An array of the weights, optional
+    :param weight_format: The %-style format used for the weights
+
+    :return lines: a list of the lines to be added to the cell file
+    """
+    kpoints = np.asarray(kpoints, dtype=float).reshape(-1, 3)
+    nkpts = kpoints.shape[0]
+    line_format = "%18.10f %18.10f %18.10f"
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float).reshape(-1)
+        if weights.shape[0] != nkpts:
+            raise ValueError(
+                "Mismatch between the number of kpoints ({}) and weights ({})".format(
+                    nkpts, weights.shape[0]
+                )
+            )
+        kpoints = np.concatenate([kpoints, weights[:, None]], axis=1)
+        line_format += " " + weight_format
+    if nkpts == 0:
+        return []
+
+    text = ((line_format + "\n") * nkpts) % tuple(kpoints.ravel().tolist())
+    return text.split("\n")[:-1]
+
+
+def iter_input_lines(input_file):
+    """
+    Iterate over the lines of a CellInput/ParamInput object
+
+    Each entry is rendered on its own by ``get_file_lines`` of castepinput, hence the
+    lines are the same as those of the whole object, while only the lines of one entry,
+    e.g. a single block, are held in the memory at any time.
+
+    :param input_file: A ``CastepInput`` instance
+    """
+    single = type(input_file)()
+    single.header = input_file.header
+    yield from single.get_file_lines()
+
+    single.header = []
+    for key, value in input_file.items():
+        single.clear()
+        single.units = {key: input_file.units[key]} if key in input_file.units else {}
+        single[key] = value
+        yield from single.get_file_lines()
+
+
+def write_input_file(input_file, fhandle, chunk_size=4096):
+    """
+    Write a CellInput/ParamInput object to a file handle
+
+    The content is streamed in chunks of lines, hence the full text of the file
+    is never built in the memory. The output is identical to that of ``get_string``.
+
+    :param input_file: A ``CastepInput`` instance
+    :param fhandle: A file-like object opened for writing text
+    :param chunk_size: Number of lines to be written in each call
+    """
+    lines = iter_input_lines(input_file)
+    chunk = list(islice(lines, chunk_size))
+    if not chunk:
+        return
+    fhandle.write("\n".join(chunk))
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+        fhandle.write("\n")
+        fhandle.write("\n".join(chunk))
+
+
+def check_parser_options(parser_options):
+    """
+    Check the options for the parser given under the PARSER_OPTIONS key of the settings
+
+    :raises: InputValidationError if any option is not understood by the parser
+    """
+    unknown = sorted(set(parser_options) - set(PARSER_OPTIONS))
+    if unknown:
+        raise InputValidationError(
+            "The following PARSER_OPTIONS are not understood: {}. "
+            "Accepted options: {}".format(", ".join(unknown), ", ".join(PARSER_OPTIONS))
+        )
+
+
+def get_default_run_time(max_wallclock_seconds):
+    """
+    Get the run_time set by default from the requested wall-time
+
+    The run_time is 95% of the wall-time rounded down to the nearest minutes,
+    and it is not set if it would be less than 180 seconds.
+
+    :returns: The run_time in seconds or None if it is not set
+    """
+    if not max_wallclock_seconds:
+        return None
+    n_seconds = (max_wallclock_seconds * 0.95 // 60) * 60
+    if n_seconds < 180:
+        return None
+    return int(n_seconds)
+
+
 def _lowercase_dict(in_dict, dict_name):
     """
     Make sure the dictionary's keys are in lower case
@@ -0,0 +1,60 @@
+"""
+Commandline interface for the caching of CastepCalculation
+"""
+import click
+from aiida.cmdline.commands.cmd_data import verdi_data
+
+# pylint: disable=import-outside-toplevel
+
+
+@verdi_data.command("castep-cache-report")
+@click.argument("calculations", nargs=-1, required=True)
+def cache_report_cmd(calculations):
+    """
+    Report the cache hits and misses of the CALCULATIONS.
+
+    The calculations sharing the same input structure are compared, and the
+    entries of the hash that prevent them from being used as the cache are shown.
+    """
+    from aiida.orm import load_node
+    from tabulate import tabulate
+
+    from aiida_castep.calculations.caching import get_cache_report
+
+    for identifier in calculations:
+        node = load_node(identifier)
+        report = get_cache_report(node)
+        click.echo(f"Calculation {node.pk}, hash {report['hash']}")
+        if report["cached_from"]:
+            click.echo(f"  Created from the cache of {report['cached_from']}")
+        if report["hits"]:
+            hits = ", ".join(str(pk) for pk in report["hits"])
+            click.echo(f"  Calculations with the same hash: {hits}")
+        if report["misses"]:
+            table = [
+                [pk, "; ".join(reasons)] for pk, reasons in report["misses"].items()
+            ]
+            click.echo(
+                tabulate(table, headers=["pk", "reasons of the miss"], tablefmt="plain")
+            )
+        elif not report["hits"]:
+            click.echo("  No other calculation of the same input structure found")
+
+
+@verdi_data.command("castep-cache-rehash")
+@click.argument("calculations", nargs=-1)
+def cache_rehash_cmd(calculations):
+    """
+    Store the normalised hash for the CALCULATIONS to be used as the cache sources.
+
+    All CastepCalculation and CastepTSCalculation are rehashed if none is given.
+    This is needed for the calculations run with the earlier versions of the plugin,
+    or rehashed by ``verdi node rehash``.
+    """
+    from aiida.orm import load_node
+
+    from aiida_castep.calculations.caching import rehash_calculations
+
+    nodes = [load_node(identifier) for identifier in calculations] or None
+    count = rehash_calculations(nodes)
+    click.echo(f"Rehashed {count} calculations")
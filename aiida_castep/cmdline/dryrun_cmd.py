@@ -0,0 +1,92 @@
+"""
+Commandline interface for estimating the resources using the dryrun mode of CASTEP
+"""
+import click
+from aiida.cmdline.commands.cmd_data import verdi_data
+
+# pylint: disable=import-outside-toplevel, too-many-arguments
+
+
+@verdi_data.command("castep-dryrun")
+@click.argument("group")
+@click.option(
+    "--parameters",
+    "-p",
+    required=True,
+    help="Identifier of the Dict node of the parameters",
+)
+@click.option("--code", "-c", required=True, help="Label of the CASTEP code")
+@click.option(
+    "--family", "-f", required=True, help="Label of the pseudopotential family"
+)
+@click.option(
+    "--kpoints-spacing",
+    "-k",
+    type=float,
+    default=0.05,
+    show_default=True,
+    help="Kpoint spacing in the unit of 2pi/Angstrom",
+)
+@click.option(
+    "--castep-executable",
+    "-e",
+    default="castep.serial",
+    show_default=True,
+    help="The CASTEP executable for running the dryruns",
+)
+@click.option(
+    "--workers", "-n", type=int, default=None, help="Number of concurrent dryruns"
+)
+def dryrun_cmd(
+    group, parameters, code, family, kpoints_spacing, castep_executable, workers
+):
+    """
+    Estimate the resources needed for the structures in GROUP.
+
+    The dryrun mode of CASTEP is used for computing the number of kpoints,
+    memory and disk usages.
+    """
+    import numpy as np
+    from aiida.orm import (
+        KpointsData,
+        StructureData,
+        load_code,
+        load_group,
+        load_node,
+    )
+    from tabulate import tabulate
+
+    from aiida_castep.calculations.castep import CastepCalculation
+    from aiida_castep.calculations.dryrun import (
+        DRYRUN_FIELDS,
+        batch_dryrun,
+    )
+
+    param_node = load_node(parameters)
+    code_node = load_code(code)
+    builders = []
+    for structure in load_group(group).nodes:
+        if not isinstance(structure, StructureData):
+            continue
+        builder = CastepCalculation.get_builder()
+        builder.structure = structure
+        builder.parameters = param_node
+        builder.code = code_node
+        builder.metadata.label = structure.label or str(structure.pk)
+        builder.metadata.options.resources = {"num_machines": 1}
+        CastepCalculation.use_pseudos_from_family(builder, family)
+        kpoints = KpointsData()
+        kpoints.set_cell_from_structure(structure)
+        kpoints.set_kpoints_mesh_from_density(np.pi * 2 * kpoints_spacing)
+        builder.kpoints = kpoints
+        builders.append(builder)
+
+    if not builders:
+        click.echo(f"No structure found in group {group}.")
+        return
+
+    table = batch_dryrun(builders, castep_exe=castep_executable, max_workers=workers)
+    headers = ["label"] + list(DRYRUN_FIELDS) + ["error"]
+    click.echo(
+        tabulate([[row[key] for key in headers] for row in table], headers=headers)
+    )
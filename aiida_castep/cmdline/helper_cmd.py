@@ -3,6 +3,7 @@ Command line interface for generating CASTEP help information
 """
 
 import sys
+from collections.abc import Mapping
 
 import click
 from aiida.cmdline.commands.cmd_data import verdi_data
@@ -46,7 +47,8 @@ def generate(castep_executable, save_as):
     Generate help information file.
 
     The generated file will be saved as .castep_help_info_<version>.json
-    at the $HOME by default.
+    at the $HOME by default. A compact index of the keywords used for validating
+    the inputs is saved alongside as .castep_help_index_<version>.json.
     """
     import os
     import subprocess as sbp
@@ -121,9 +123,17 @@ def generate(castep_executable, save_as):
 
     import json
 
+    from aiida_castep.calculations.helper import (
+        clear_helper_cache,
+        save_help_index,
+    )
+
     with open(save_as, "w") as json_out:
         json.dump(full_dict, json_out)
     print(f"Help information saved at {save_as}")
+    index_path = save_help_index(save_as, full_dict)
+    print(f"Index of the keywords saved at {index_path}")
+    clear_helper_cache()
 
 
 @helper_cmd.command("show")
@@ -153,7 +163,7 @@ def list_keywords(filter):
         print(f"List of keywords in {ktype} file:\n")
         for key, value in h_dict.items():
 
-            if not isinstance(value, dict):
+            if not isinstance(value, Mapping):
                 continue
             if value["key_type"] == ktype:
                 if filter is None or key.find(filter) != -1:
@@ -190,9 +200,11 @@ def get_helper(*args, **kwargs):
     """
     Get a helper object
     """
-    from aiida_castep.calculations.helper import CastepHelper
+    from aiida_castep.calculations.helper import (
+        get_helper as _get_helper,
+    )
 
-    helper = CastepHelper(*args, **kwargs)
+    helper = _get_helper(*args, **kwargs)
     return helper
 
 
@@ -22,11 +22,15 @@ def output_file(*args):
 
 @click.command("mock-castep")
 @click.argument("seed")
-def mock_castep(seed):
+@click.option("--dryrun", is_flag=True, help="Write a mock dryrun output")
+def mock_castep(seed, dryrun):
     """
     A 'mock' CASTEP code that throws out output files for a given input seed name.
     """
     pwd = Path().absolute()
+    if dryrun:
+        mock_dryrun(seed)
+        return
     mock_output = []
 
     mock_output.append("MOCK PREPEND: START ----------------------\n")
@@ -63,6 +67,47 @@ def mock_castep(seed):
         handler.write("".join(mock_output))
 
 
+def mock_dryrun(seed):
+    """
+    Write a mock output of the dryrun.
+
+    The number of kpoints is taken from the cell file and the storage estimates
+    are proportional to the number of ions and kpoints.
+    """
+    from castepinput import CellInput
+
+    cell_path = Path(f"{seed}.cell")
+    if not cell_path.is_file():
+        Path(f"{seed}.0001.err").write_text(f"{seed}.cell is not found.\n")
+        return
+
+    cell = CellInput.from_file(str(cell_path))
+    num_ions = len(cell.get("positions_abs", cell.get("positions_frac", [])))
+    if "kpoints_list" in cell:
+        num_kpoints = len(cell["kpoints_list"])
+    elif "kpoints_mp_grid" in cell:
+        mesh = cell["kpoints_mp_grid"]
+        if isinstance(mesh, str):
+            mesh = mesh.split()
+        num_kpoints = 1
+        for value in mesh:
+            num_kpoints *= int(value)
+    else:
+        num_kpoints = 1
+    memory = 10.0 + 0.5 * num_ions * num_kpoints
+    disk = 0.1 * num_ions * num_kpoints
+
+    lines = [
+        "MOCK DRYRUN",
+        f"                       k-Points For SCF Sampling:  {num_kpoints:>8}",
+        "+---------------- MEMORY AND SCRATCH DISK ESTIMATES PER PROCESS --------------+",
+        "|                                                     Memory          Disk    |",
+        f"| Approx. total storage required per process   {memory:>9.1f} MB {disk:>9.1f} MB    |",
+        "+-----------------------------------------------------------------------------+",
+    ]
+    Path(f"{seed}.castep").write_text("\n".join(lines) + "\n")
+
+
 def stop_and_return(castep_mock_output):
     """Halts castep.mock, rebuilds the castep_output and returns."""
     # Assemble the
@@ -111,3 +111,34 @@ def listfamilies(element, with_description):
 
     else:
         click.echo("No valid pseudopotential family found.")
+
+
+@pseudos_cmd.command(name="stage-remote")
+@click.argument("family")
+@click.argument("computer")
+@click.argument("cache_folder")
+def stage_remote(family, computer, cache_folder):
+    """
+    Upload the file based pseudopotentials in FAMILY to CACHE_FOLDER on COMPUTER.
+
+    Calculations can then link these files by setting the
+    `metadata.options.pseudo_cache_folder` option to CACHE_FOLDER.
+    """
+    from aiida.cmdline.utils import echo
+    from aiida.orm import Group, SinglefileData, load_computer
+
+    from aiida_castep.data.remote_cache import stage_pseudos
+
+    group = Group.collection.get(label=family)
+    nodes = [node for node in group.nodes if isinstance(node, SinglefileData)]
+    if not nodes:
+        echo.echo_warning(f"No file based pseudopotential found in family {family}.")
+        return
+    uploaded = stage_pseudos(load_computer(computer), nodes, cache_folder)
+    for path in uploaded:
+        echo.echo(f"Uploaded {path}")
+    echo.echo_success(
+        "{} files uploaded, {} already exist in the cache folder.".format(
+            len(uploaded), len(nodes) - len(uploaded)
+        )
+    )
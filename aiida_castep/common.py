@@ -12,6 +12,7 @@ INPUT_LINKNAMES = {
     "pseudo": "pseudo",  # Input pseudopotential, namespace
     "settings": "settings",  # Extra settings for CASTEP
     "parent_calc_folder": "parent_calc_folder",  # Remote folder point to the parent calculation
+    "parent_checkpoint": "parent_checkpoint",  # Local checkpoint file of the parent calculation
     "prod_structure": "product_structure",  # Product structure in transition state search
 }
 
@@ -21,6 +22,12 @@ OUTPUT_LINKNAMES = {
     "trajectory": "output_trajectory",  # Trajectory of md or geometry optimisation
     "bands": "output_bands",  # Bands of the structure
     "array": "output_array",  # Array of values, for example SCF energies
+    "pdos": "output_pdos",  # Orbital weights from the pdos_bin file
+}
+
+# Options accepted under the PARSER_OPTIONS key of the settings and their defaults
+PARSER_OPTIONS = {
+    "parse_pdos_bin": False,  # Parse the orbital weights in the .pdos_bin file
 }
 
 # We define an ordered dictionary of the error codes
@@ -0,0 +1,141 @@
+"""
+Module for sharing file based pseudopotentials on the remote computers
+
+The pseudopotential files are uploaded once to a cache folder on the remote
+computer, and stored as ``<cache_folder>/<md5>/<filename>``. Calculations can
+then symlink them rather than uploading a copy for each job. The files missing
+in the cache folder are uploaded when a calculation using them is submitted.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from aiida.orm import User
+
+
+def get_pseudo_md5(node):
+    """
+    Get the md5 checksum of a file based pseudopotential
+
+    The ``md5`` attribute is used if exists, otherwise the checksum is computed
+    from the content of the file.
+    """
+    md5 = node.base.attributes.get("md5", None)
+    if md5 is None:
+        md5 = hashlib.md5(node.get_content(mode="rb")).hexdigest()
+    return md5
+
+
+def get_remote_pseudo_path(cache_folder, node):
+    """
+    Get the path of a pseudopotential in the remote cache folder
+
+    :param cache_folder: Absolute path of the cache folder on the remote computer
+    :param node: A file based pseudopotential node, e.g. ``UspData`` or ``UpfData``
+
+    :returns: The absolute path of the cached file
+    """
+    return posixpath.join(cache_folder, get_pseudo_md5(node), node.filename)
+
+
+def _get_stage_targets(nodes, cache_folder):
+    """Get the nodes to be staged keyed by their remote paths, without duplicates"""
+    if not posixpath.isabs(cache_folder):
+        raise ValueError(f"The cache folder must be an absolute path: {cache_folder}")
+    return {get_remote_pseudo_path(cache_folder, node): node for node in nodes}
+
+
+def _write_local_copy(node, folder):
+    """Write the content of a pseudopotential to a local folder and return the path"""
+    local_path = os.path.join(folder, node.filename)
+    with open(local_path, "wb") as fhandle:
+        fhandle.write(node.get_content(mode="rb"))
+    return local_path
+
+
+def stage_pseudos(computer, nodes, cache_folder, user=None):
+    """
+    Upload the pseudopotentials to the cache folder on a remote computer
+
+    Files that already exist in the cache folder are not uploaded again.
+
+    :param computer: The ``Computer`` where the cache folder is located
+    :param nodes: An iterable of file based pseudopotential nodes
+    :param cache_folder: Absolute path of the cache folder on the remote computer
+    :param user: The ``User`` for opening the transport, default to the default user
+
+    :returns: A list of the remote paths of the files uploaded
+    """
+    targets = _get_stage_targets(nodes, cache_folder)
+
+    if user is None:
+        user = User.collection.get_default()
+
+    uploaded = []
+    with computer.get_authinfo(user).get_transport() as transport:
+        for remote_path, node in targets.items():
+            if transport.path_exists(remote_path):
+                continue
+            transport.makedirs(posixpath.dirname(remote_path), ignore_existing=True)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                transport.putfile(_write_local_copy(node, tmpdir), remote_path)
+            uploaded.append(remote_path)
+    return uploaded
+
+
+async def stage_pseudos_async(transport_queue, authinfo, nodes, cache_folder):
+    """
+    Upload the pseudopotentials to the cache folder using a transport queue
+
+    The same as ``stage_pseudos``, but the transport is requested from the queue,
+    so that the event loop, e.g. that of the daemon runner, is not blocked.
+
+    :param transport_queue: The ``TransportQueue``, e.g. ``runner.transport``
+    :param authinfo: The ``AuthInfo`` of the remote computer
+    :param nodes: An iterable of file based pseudopotential nodes
+    :param cache_folder: Absolute path of the cache folder on the remote computer
+
+    :returns: A list of the remote paths of the files uploaded
+    """
+    targets = _get_stage_targets(nodes, cache_folder)
+
+    uploaded = []
+    async with transport_queue.request_transport(authinfo) as request:
+        transport = await request
+        for remote_path, node in targets.items():
+            if await transport.path_exists_async(remote_path):
+                continue
+            await transport.makedirs_async(
+                posixpath.dirname(remote_path), ignore_existing=True
+            )
+            with tempfile.TemporaryDirectory() as tmpdir:
+                await transport.putfile_async(
+                    _write_local_copy(node, tmpdir), remote_path
+                )
+            uploaded.append(remote_path)
+    return uploaded
+
+
+def ensure_pseudos_staged(process, nodes, cache_folder):
+    """
+    Upload the pseudopotentials missing in the cache folder for a calculation
+
+    This is called when the calculation is submitted, so that the files linked from
+    the cache folder exist. Inside a running process the transport is requested from
+    the transport queue of its runner, otherwise it is opened directly.
+
+    :param process: The ``CalcJob`` to be submitted
+    :param nodes: An iterable of file based pseudopotential nodes
+    :param cache_folder: Absolute path of the cache folder on the remote computer
+
+    :returns: A list of the remote paths of the files uploaded
+    """
+    from plumpy import has_portal, sync_await
+
+    authinfo = process.node.get_authinfo()
+    if has_portal():
+        return sync_await(
+            stage_pseudos_async(process.runner.transport, authinfo, nodes, cache_folder)
+        )
+    return stage_pseudos(authinfo.computer, nodes, cache_folder, user=authinfo.user)
@@ -14,7 +14,9 @@ from aiida.parsers.parser import Parser
 from aiida_castep._version import CALC_PARSER_VERSION
 from aiida_castep.common import EXIT_CODES_SPEC as calc_exit_code
 from aiida_castep.common import OUTPUT_LINKNAMES as out_ln
+from aiida_castep.common import PARSER_OPTIONS
 from aiida_castep.parsers.castep_bin import CastepbinFile
+from aiida_castep.parsers.pdos_bin import PdosbinFile
 from aiida_castep.parsers.raw_parser import RawParser, units
 from aiida_castep.parsers.utils import (
     add_last_if_exists,
@@ -40,32 +42,41 @@ class RetrievedFileManager:
     Wrapper for supplying an unified file-handler interface for the retrieved content
     """
 
-    def __init__(self, retrieved_node, retrieved_temporary_folder=None):
+    def __init__(self, retrieved_node, retrieved_temporary_folder=None, subfolder=None):
         """
         Instantiate the manager object
+
+        :param subfolder: Only manage the files inside this sub folder
         """
         self.node = retrieved_node
+        self.subfolder = subfolder
         if retrieved_temporary_folder is not None:
             self.tmp_folder = Path(retrieved_temporary_folder)
+            if subfolder is not None:
+                self.tmp_folder = self.tmp_folder / subfolder
             # Store the relative paths as strings
             self.tmp_content_names = list(
                 map(
                     lambda x: str(x.relative_to(self.tmp_folder)),
-                    self.tmp_folder.iterdir(),
+                    self.tmp_folder.iterdir() if self.tmp_folder.is_dir() else [],
                 )
             )
         else:
             self.tmp_folder = None
             self.tmp_content_names = []
 
-        self.perm_content_names = self.node.list_object_names()
+        if subfolder is None or subfolder in self.node.list_object_names():
+            self.perm_content_names = self.node.list_object_names(subfolder)
+        else:
+            self.perm_content_names = []
         self.all_content_names = self.perm_content_names + self.tmp_content_names
 
     @contextmanager
     def open(self, name, mode="r"):
         """Open a file from either the retrieved node or the temporary folder"""
         if name in self.perm_content_names:
-            with self.node.open(name, mode=mode) as handle:
+            path = name if self.subfolder is None else f"{self.subfolder}/{name}"
+            with self.node.open(path, mode=mode) as handle:
                 yield handle
         elif name in self.tmp_content_names:
             with open(self.tmp_folder / name, mode=mode) as handle:
@@ -94,7 +105,28 @@ class CastepParser(Parser):
     geom
     """
 
-    _setting_key = "parser_options"
+    _setting_key = "PARSER_OPTIONS"
+
+    @property
+    def input_settings(self):
+        """The settings of the calculation as a dictionary"""
+        if "settings" in self.node.inputs:
+            return self.node.inputs.settings.get_dict()
+        return {}
+
+    @property
+    def parser_options(self):
+        """
+        Options for the parser passed in the settings node, with the defaults
+        for those not given. Options not understood are ignored with a warning.
+        """
+        options = dict(PARSER_OPTIONS)
+        for key, value in self.input_settings.get(self._setting_key, {}).items():
+            if key in options:
+                options[key] = value
+            else:
+                self.logger.warning(f"Unknown parser option {key} is ignored")
+        return options
 
     @property
     def castep_input_parameters(self):
@@ -106,6 +138,20 @@ class CastepParser(Parser):
         """Task of the calculation"""
         return self.castep_input_parameters["PARAM"].get("task", "singlepoint")
 
+    @property
+    def input_structure(self):
+        """The input structure of the calculation"""
+        return self.node.inputs.structure
+
+    @property
+    def calc_options(self):
+        """The options of the calculation"""
+        return self.node.get_options()
+
+    def get_file_manager(self, retrieved, retrieved_temporary_folder=None):
+        """Get the manager of the retrieved files"""
+        return RetrievedFileManager(retrieved, retrieved_temporary_folder)
+
     def parse(self, **kwargs):
         """
         Receives a dictionary of retrieved nodes.retrieved.
@@ -117,15 +163,14 @@ class CastepParser(Parser):
         except exceptions.NotExistent:
             return self.exit_codes.ERROR_NO_RETRIEVED_FOLDER
 
-        output_folder = RetrievedFileManager(
+        output_folder = self.get_file_manager(
             retrieved, kwargs.get("retrieved_temporary_folder")
         )
 
         warnings = []
         exit_code_1 = None
 
-        # NOTE parser options not used for not
-        parser_opts = {}
+        parse_pdos_bin = self.parser_options["parse_pdos_bin"]
 
         # NOT READILY IN USE
         input_dict = {}
@@ -134,7 +179,7 @@ class CastepParser(Parser):
         filenames = output_folder.list_object_names()
 
         # Get calculation options
-        options = self.node.get_options()
+        options = self.calc_options
         seedname = options["seedname"]
 
         # at least the stdout should exist
@@ -189,7 +234,6 @@ class CastepParser(Parser):
             input_dict=input_dict,
             md_geom_info=out_md_geom_name_content,
             bands_lines=out_bands_content,
-            **parser_opts,
         )
         (
             out_dict,
@@ -232,7 +276,11 @@ class CastepParser(Parser):
             ):
                 self.logger.info("Using castep_bin file for the bands data.")
                 bands_node = bands_from_castepbin(seedname, output_folder)
-                if not self._has_empty_bands(bands_node):
+                num_problems, kpoints, _ = self._find_kpoints_without_empty_bands(
+                    bands_node
+                )
+                if num_problems:
+                    out_dict["no_empty_bands_kpoints"] = kpoints
                     # Set if no other errors
                     out_dict["warnings"].append(
                         "At least one kpoint has no empty bands, energy/forces returned are not reliable."
@@ -243,9 +291,13 @@ class CastepParser(Parser):
                 bands_node = bands_to_bandsdata(**bands_data)
             self.out(out_ln["bands"], bands_node)
 
+        ######## --- PROCESSING PDOS WEIGHTS --- ########
+        if parse_pdos_bin and output_folder.has_file(seedname + ".pdos_bin"):
+            self.out(out_ln["pdos"], pdos_from_pdosbin(seedname, output_folder))
+
         ######## --- PROCESSING MULLIKEN DATA --- ########
         if not err_filenames:
-            input_structure = self.node.inputs.structure
+            input_structure = self.input_structure
             idesort = get_desort_args(input_structure)
             if len(out_dict.get("charges", [])) > 1:
                 new_charges = np.array(out_dict["charges"])[idesort]
@@ -268,13 +320,13 @@ class CastepParser(Parser):
                 if "there is nothing to optimise" in warning:
                     no_optimise = True
             if no_optimise is True:
-                self.out(out_ln["structure"], deepcopy(self.node.inputs.structure))
+                self.out(out_ln["structure"], deepcopy(self.input_structure))
         else:
             structure_node = structure_from_input(
                 cell=cell, positions=positions, symbols=symbols
             )
             # Use the output label as the input label
-            input_structure = self.node.inputs.structure
+            input_structure = self.input_structure
             structure_node = desort_structure(structure_node, input_structure)
             structure_node.label = input_structure.label
             self.out(out_ln["structure"], structure_node)
@@ -286,7 +338,7 @@ class CastepParser(Parser):
 
             # Resorting indices - for recovering the original ordering of the
             # species in the input structure
-            input_structure = self.node.inputs.structure
+            input_structure = self.input_structure
             idesort = get_desort_args(input_structure)
             # If we have .geom file, save as in a trajectory data
             if has_md_geom:
@@ -326,7 +378,7 @@ class CastepParser(Parser):
             # Or may there is nothing to optimise? still save a Trajectory data
             elif no_optimise is True:
                 traj = TrajectoryData()
-                input_structure = self.node.inputs.structure
+                input_structure = self.input_structure
                 traj.set_trajectory(
                     stepids=np.asarray([1]),
                     cells=np.asarray([input_structure.cell]),
@@ -376,9 +428,19 @@ class CastepParser(Parser):
         There should be some empty bands if the calculation is a not a fixed occupation one.
         Otherwise, the final energy and forces are not reliable.
         """
+        return self._find_kpoints_without_empty_bands(bands_data, thresh)[0] == 0
+
+    def _find_kpoints_without_empty_bands(self, bands_data: BandsData, thresh=0.005):
+        """
+        Find the kpoints where the highest band is occupied
+
+        :returns: A tuple of the number of offending (spin, kpoint) pairs, the sorted indices
+          of the offending kpoints and the largest occupation of the highest band.
+          For fixed occupation calculations, no kpoint is returned.
+        """
 
         # Check if occupation is allowed to vary
-        param = self.node.inputs.parameters.get_dict()["PARAM"]
+        param = self.castep_input_parameters["PARAM"]
         # If it is a fixed occupation calculation we do not need to do anything about it....
         fix_occ = (
             param.get("fix_occupancy", False)
@@ -386,26 +448,24 @@ class CastepParser(Parser):
             or param.get("elec_method", "dm").lower() == "none"
         )
         if fix_occ:
-            return True
+            return 0, [], 0.0
 
         _, occ = bands_data.get_bands(also_occupations=True)
-
-        nspin, nkppts, _ = occ.shape
-        problems = []
-        for ispin in range(nspin):
-            for ikpts in range(nkppts):
-                if occ[ispin, ikpts, -1] >= thresh:
-                    problems.append((ispin, ikpts, occ[ispin, ikpts, -1]))
-        if problems:
-            for ispin, ikpts, val in problems:
-                self.logger.warning(
-                    "No empty bands for spin %d, kpoint %d - occ: %.5f",
-                    ispin,
-                    ikpts,
-                    val,
-                )
-            return False
-        return True
+        # Occupations of the highest band with shape (nspin, nkpts)
+        top_occ = np.reshape(occ, (-1,) + occ.shape[-2:])[:, :, -1]
+        problems = top_occ >= thresh
+        count = int(np.count_nonzero(problems))
+        worst = float(top_occ.max())
+        if count == 0:
+            return 0, [], worst
+
+        kpoints = np.flatnonzero(problems.any(axis=0)).tolist()
+        self.logger.warning(
+            "No empty bands for %d kpoint(s) - maximum occupation of the highest band: %.5f",
+            len(kpoints),
+            worst,
+        )
+        return count, kpoints, worst
 
 
 def bands_to_bandsdata(bands_info, kpoints, bands):
@@ -488,3 +548,24 @@ def bands_from_castepbin(seedname, fmanager):
     bands_node.set_attribute("efermi", efermi)
 
     return bands_node
+
+
+def pdos_from_pdosbin(seedname, fmanager):
+    """
+    Acquire the orbital weights from the pdos_bin file and store them in an ArrayData
+
+    The kpoints are sorted according to their original order.
+    The weights are stored with shape (ns, nk, nb, norbitals).
+    """
+    with fmanager.open(seedname + ".pdos_bin", "rb") as handle:
+        binfile = PdosbinFile(fileobj=handle)
+
+    sort_idx = np.argsort(binfile.kpoints_indices)
+    pdos_node = ArrayData()
+    pdos_node.set_array("weights", binfile.weights[:, sort_idx])
+    pdos_node.set_array("kpoints", binfile.kpoints[sort_idx])
+    pdos_node.set_array("num_eigenvalues", binfile.num_eigenvalues)
+    pdos_node.set_array("species", binfile.species)
+    pdos_node.set_array("ion", binfile.ion)
+    pdos_node.set_array("am_channel", binfile.am_channel)
+    return pdos_node
@@ -0,0 +1,103 @@
+"""
+Parser for the task farming calculations
+"""
+from aiida.common import exceptions
+from aiida.orm import Dict
+from aiida.parsers.parser import Parser
+
+from aiida_castep._version import CALC_PARSER_VERSION
+from aiida_castep.calculations.farm import FARM_LOG_NAME
+from aiida_castep.common import OUTPUT_LINKNAMES as out_ln
+from aiida_castep.parsers.castep import (
+    CastepParser,
+    RetrievedFileManager,
+)
+
+__version__ = CALC_PARSER_VERSION
+
+
+class FarmMemberParser(CastepParser):
+    """
+    Parse the outputs of one of the runs in a farm.
+    The inputs of the run are taken from the ``members.<label>`` namespace.
+    """
+
+    def __init__(self, node, label):
+        super().__init__(node)
+        self.label = label
+        self.member_inputs = node.inputs.members[label]
+
+    @property
+    def input_settings(self):
+        """The settings of the run as a dictionary"""
+        if "settings" in self.member_inputs:
+            return self.member_inputs["settings"].get_dict()
+        return {}
+
+    @property
+    def castep_input_parameters(self):
+        """Access the original castep input parameters of the run"""
+        return self.member_inputs["parameters"].get_dict()
+
+    @property
+    def input_structure(self):
+        """The input structure of the run"""
+        return self.member_inputs["structure"]
+
+    @property
+    def calc_options(self):
+        """The options of the run"""
+        options = self.node.get_options()
+        options["output_filename"] = options["seedname"] + ".castep"
+        return options
+
+    def get_file_manager(self, retrieved, retrieved_temporary_folder=None):
+        """Get the manager of the files retrieved from the sub folder of the run"""
+        return RetrievedFileManager(
+            retrieved, retrieved_temporary_folder, subfolder=self.label
+        )
+
+
+class CastepFarmParser(Parser):
+    """
+    Parser for the task farming calculations.
+    Each run is parsed by ``CastepParser`` and the outputs are attached
+    under the ``members.<label>`` namespace.
+    """
+
+    def parse(self, **kwargs):
+        """Parse each of the runs in the farm"""
+        try:
+            retrieved = self.retrieved
+        except exceptions.NotExistent:
+            return self.exit_codes.ERROR_NO_RETRIEVE_FOLDER
+
+        return_codes = {}
+        if FARM_LOG_NAME in retrieved.list_object_names():
+            for line in retrieved.get_object_content(FARM_LOG_NAME).splitlines():
+                tokens = line.split()
+                if len(tokens) == 2:
+                    return_codes[tokens[0]] = int(tokens[1])
+
+        exit_status = {}
+        for label in sorted(self.node.inputs.members):
+            member_parser = FarmMemberParser(self.node, label)
+            exit_code = member_parser.parse(**kwargs)
+            exit_status[label] = exit_code.status
+            for link_label, node in member_parser.outputs.items():
+                self.out(f"members.{label}.{link_label}", node)
+
+        failed = sorted(label for label, status in exit_status.items() if status)
+        self.out(
+            out_ln["results"],
+            Dict(
+                dict={
+                    "exit_status": exit_status,
+                    "return_codes": return_codes,
+                    "failed": failed,
+                }
+            ),
+        )
+        if failed:
+            return self.exit_codes.ERROR_FARM_MEMBER_FAILED
+        return self.exit_codes.CALC_FINISHED
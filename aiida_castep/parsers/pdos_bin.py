@@ -0,0 +1,202 @@
+"""
+Parser interface for CASTEP pdos_bin file
+
+The file holds the weights of the Kohn-Sham states projected onto the atomic orbitals
+and is written when ``pdos_calculate_weights`` is enabled.
+The layout follows the ``pdos_bin.f90`` example in the open-source OptaDos code.
+Rather than reading one Fortran record at a time, the body of the file is mapped onto
+a structured array so that all weights are extracted in a single step.
+"""
+import numpy as np
+
+# Fortran unformatted files written by CASTEP are big-endian with 4-byte record markers
+MARKER = np.dtype(">u4")
+INT = np.dtype(">i4")
+DOUBLE = np.dtype(">f8")
+HEADER = np.dtype("S80")
+
+
+class PdosbinError(RuntimeError):
+    """Error raised when the pdos_bin file cannot be understood"""
+
+
+class PdosbinFile:
+    """
+    Parser for the `pdos_bin` file.
+
+    The file is memory-mapped when a filename is given, otherwise the content of the
+    file object is read into a buffer. Arrays are returned in the internal order of the kpoints,
+    use ``kpoints_indices`` to recover the original order.
+    """
+
+    def __init__(self, fileobj=None, filename=None):
+        """
+        Instantiate from an file object or a filename
+        """
+        self.filename = filename
+        if fileobj is not None:
+            buffer = np.frombuffer(fileobj.read(), dtype=np.uint8)
+        else:
+            buffer = np.memmap(filename, dtype=np.uint8, mode="r")
+
+        self.raw_data = read_pdos_bin(buffer)
+
+    @property
+    def version(self):
+        """Version of the pdos_bin file"""
+        return self.raw_data["fversion"]
+
+    @property
+    def header(self):
+        """Header string of the file"""
+        return self.raw_data["fheader"]
+
+    @property
+    def weights(self):
+        """Return the weights array with shape (ns, nk, nb, norbitals)"""
+        return self.raw_data["pdos_weights"]
+
+    @property
+    def num_eigenvalues(self):
+        """Number of eigenvalues for each spin"""
+        return self.raw_data["num_eigenvalues"]
+
+    @property
+    def kpoints(self):
+        """Return the kpoints array with shape (nk, 3)"""
+        return self.raw_data["kpoints"]
+
+    @property
+    def kpoints_indices(self):
+        """
+        Return the zero-based indices of the kpoints
+
+        Similar to the ``castep_bin`` file, the kpoints may not be written in the order
+        as defined in the cell file, when the calculation is parallelised over the kpoints.
+        """
+        return self.raw_data["kpoints_indices"]
+
+    @property
+    def species(self):
+        """Species index (one-based) of each orbital"""
+        return self.raw_data["species"]
+
+    @property
+    def ion(self):
+        """Index (one-based) of the ion within its species for each orbital"""
+        return self.raw_data["ion"]
+
+    @property
+    def am_channel(self):
+        """Angular momentum channel of each orbital, e.g. 0 for s, 1 for p"""
+        return self.raw_data["am_channel"]
+
+
+def _read_record(buffer, offset, dtype):
+    """
+    Read a single Fortran record from the buffer
+
+    :returns: A tuple of the array of the record and the offset of the next record
+    """
+    nbytes = int(np.frombuffer(buffer, dtype=MARKER, count=1, offset=offset)[0])
+    data = np.frombuffer(
+        buffer, dtype=dtype, count=nbytes // dtype.itemsize, offset=offset + 4
+    )
+    tail = np.frombuffer(buffer, dtype=MARKER, count=1, offset=offset + 4 + nbytes)
+    if int(tail[0]) != nbytes:
+        raise PdosbinError(f"Inconsistent record markers at byte {offset}")
+    return data, offset + nbytes + 8
+
+
+def _kpoint_block_dtype(num_popn_orb, num_eigenvalues):
+    """
+    Construct the structured dtype for the records of a single kpoint
+
+    :param num_popn_orb: Number of orbitals
+    :param num_eigenvalues: A sequence of the number of eigenvalues for each spin
+    """
+    band = np.dtype(
+        [("head", MARKER), ("weights", DOUBLE, (num_popn_orb,)), ("tail", MARKER)]
+    )
+    fields = [
+        ("head", MARKER),
+        ("index", INT),
+        ("kpoint", DOUBLE, (3,)),
+        ("tail", MARKER),
+    ]
+    for ispin, nbands in enumerate(num_eigenvalues):
+        fields.extend(
+            [
+                (f"spin{ispin}_head", MARKER),
+                (f"spin{ispin}", INT),
+                (f"spin{ispin}_tail", MARKER),
+                (f"nb{ispin}_head", MARKER),
+                (f"nb{ispin}", INT),
+                (f"nb{ispin}_tail", MARKER),
+                (f"bands{ispin}", band, (nbands,)),
+            ]
+        )
+    return np.dtype(fields)
+
+
+def read_pdos_bin(buffer):
+    """
+    Read the content of a pdos_bin file
+
+    :param buffer: A 1D uint8 array (or a memory map) of the file content.
+    :returns: A dictionary of the data read. The weights of the orbitals are stored
+      under the 'pdos_weights' key with shape (ns, nk, nb, norbitals).
+    """
+    offset = 0
+    fversion, offset = _read_record(buffer, offset, DOUBLE)
+    fheader, offset = _read_record(buffer, offset, HEADER)
+    scalars = []
+    for _ in range(4):
+        value, offset = _read_record(buffer, offset, INT)
+        scalars.append(int(value[0]))
+    num_kpoints, num_spins, num_popn_orb, max_eigenv = scalars
+
+    species, offset = _read_record(buffer, offset, INT)
+    ion, offset = _read_record(buffer, offset, INT)
+    am_channel, offset = _read_record(buffer, offset, INT)
+    body_offset = offset
+
+    # Walk through the first kpoint to find the number of bands for each spin
+    _, offset = _read_record(buffer, offset, INT)
+    num_eigenvalues = []
+    band_nbytes = num_popn_orb * DOUBLE.itemsize + 2 * MARKER.itemsize
+    for _ in range(num_spins):
+        _, offset = _read_record(buffer, offset, INT)
+        nbands, offset = _read_record(buffer, offset, INT)
+        num_eigenvalues.append(int(nbands[0]))
+        offset += num_eigenvalues[-1] * band_nbytes
+
+    block = _kpoint_block_dtype(num_popn_orb, num_eigenvalues)
+    if buffer.size - body_offset != block.itemsize * num_kpoints:
+        raise PdosbinError(
+            "Unexpected size of the file - the number of bands may vary between kpoints"
+        )
+    body = np.frombuffer(buffer, dtype=block, count=num_kpoints, offset=body_offset)
+
+    pdos_weights = np.zeros((num_spins, num_kpoints, max_eigenv, num_popn_orb))
+    for ispin, nbands in enumerate(num_eigenvalues):
+        bands = body[f"bands{ispin}"]
+        if np.any(bands["head"] != num_popn_orb * DOUBLE.itemsize):
+            raise PdosbinError(f"Corrupted weight records for spin {ispin + 1}")
+        pdos_weights[ispin, :, :nbands, :] = bands["weights"]
+
+    return {
+        "fversion": float(fversion[0]),
+        "fheader": fheader[0].decode().strip(),
+        "num_kpoints": num_kpoints,
+        "num_spins": num_spins,
+        "num_popn_orb": num_popn_orb,
+        "max_eigenv": max_eigenv,
+        "species": species.astype(int),
+        "ion": ion.astype(int),
+        "am_channel": am_channel.astype(int),
+        "pdos_weights": pdos_weights,
+        "kpoints": body["kpoint"].astype(float),
+        "kpoints_indices": body["index"].astype(int) - 1,
+        "num_eigenvalues": np.array(num_eigenvalues, dtype=int),
+    }
@@ -28,6 +28,26 @@ END_NOT_FOUND_ERROR = "ERROR_NO_END_OF_CALCULATION"
 INSUFFICENT_TIME_ERROR = "ERROR_TIMELIMIT_REACHED"
 STOP_REQUESTED_ERROR = "ERROR_STOP_REQUESTED"
 
+# For the warnings I use dictionary in the format of
+# format {<keywords in line>:<message to pass>}, the message to pass
+# is save in the dictionary and used to set the exit code
+CRITICAL_WARNINGS = {
+    "SCF cycles performed but system has not reached the groundstate": SCF_FAILURE_ERROR,
+    "STOP keyword detected in parameter file. Stop execution.": STOP_REQUESTED_ERROR,
+    "Insufficient time for another iteration": INSUFFICENT_TIME_ERROR,
+}
+
+# Warnings that won't result in a calculation in FAILED state
+MINOR_WARNINGS = {
+    "Warning": None,
+    "WARNING": None,
+    "Geometry optimization failed to converge": GEOM_FAILURE_MESSAGE,
+}
+
+# A dictionary witch keys we should check at each line
+ALL_WARNINGS = dict(CRITICAL_WARNINGS)
+ALL_WARNINGS.update(MINOR_WARNINGS)
+
 
 class RawParser:
     """An raw parser object to parse the output of CASTEP"""
@@ -182,9 +202,10 @@ unit_re = re.compile(r"^ output\s+(\w+) unit *: *([^\s]+)")
 time_re = re.compile(r"^(\w+) time += +([0-9.]+) s$")
 parallel_re = re.compile(r"^Overall parallel efficiency rating: [\w ]+ \(([0-9]+)%\)")
 version_re = re.compile(r"CASTEP version ([0-9.]+)")
+ionic_step_re = re.compile(r".*\bfinished (?:MD )?iteration +\d+")
 
 
-def parse_castep_text_output(out_lines, input_dict):
+def parse_castep_text_output(out_lines, input_dict, section_parsers=None):
     """
     Parse ouput of .castep
     :param out_lines: a list of lines from readlines function
@@ -192,6 +213,9 @@ def parse_castep_text_output(out_lines, input_dict):
     :param input_dict: Control some variables. Currently support
       'n_warning_lines'- number of the lines to include for a general warning.
 
+    :param section_parsers: A ``SectionRegistry`` for parsing the body of the file.
+      Defaults to ``SECTION_PARSERS``.
+
     :return: A list of parsed_data, trajectory_data and critical_messages:
 
      * parsed_data: dictionary with key values, referring to the last
@@ -219,26 +243,6 @@ def parse_castep_text_output(out_lines, input_dict):
     # Not all is needed. But we parse as much as we can here
     trajectory_data = defaultdict(list)
 
-    # For the warnings I use dictionary in the format of
-    # format {<keywords in line>:<message to pass>}, the message to pass
-    # is save in the dictionary and used to set the exit code
-    critical_warnings = {
-        "SCF cycles performed but system has not reached the groundstate": SCF_FAILURE_ERROR,
-        "STOP keyword detected in parameter file. Stop execution.": STOP_REQUESTED_ERROR,
-        "Insufficient time for another iteration": INSUFFICENT_TIME_ERROR,
-    }
-
-    # Warnings that won't result in a calculation in FAILED state
-    minor_warnings = {
-        "Warning": None,
-        "WARNING": None,
-        "Geometry optimization failed to converge": GEOM_FAILURE_MESSAGE,
-    }
-
-    # A dictionary witch keys we should check at each line
-    all_warnings = dict(critical_warnings)
-    all_warnings.update(minor_warnings)
-
     # Split header and body
     body_start = None
     version = None
@@ -295,79 +299,21 @@ def parse_castep_text_output(out_lines, input_dict):
     parsed_data.update(pseudo_pots=pseudo_files)
 
     # Parse repeating information
-    skip = 0
     body_lines = out_lines[body_start:]
 
-    iter_parser = get_iter_parser()
-    for count, line in enumerate(body_lines):
-
-        # Allow skipping certain number of lines
-        if skip > 0:
-            skip -= 1
-            continue
-
-        res_tmp = iter_parser.parse(line)
-        if res_tmp:
-            name, value = res_tmp[:2]
-            trajectory_data[name].append(value)
-            continue
-
-        if "Calculation parallelised over" in line:
-            num_cores = int(line.strip().split()[-2])
-            parsed_data["parallel_procs"] = num_cores
-            continue
-
-        if "Stress Tensor" in line:
-            i, stress, pressure = parse_stress_box(body_lines[count : count + 20])
-            assert len(stress) == 3
-            if "Symmetrised" in line:
-                prefix = "symm_"
-            else:
-                prefix = ""
-            trajectory_data[prefix + "pressure"].append(pressure)
-            trajectory_data[prefix + "stress"].append(stress)
-            skip = i
-
-        if "Forces *******" in line:
-            num_lines = parsed_data["num_ions"] + 10
-            box = body_lines[count : (count + num_lines)]
-            i, forces = parse_force_box(box)
-
-            # Resolve force names
-            # For backward compatibility symmetrised_forces are stored as forces
-            if "Constrained" in line:
-                force_name = "cons_forces"
-            else:
-                tmp = line.replace("*", " ").strip().lower().replace(" ", "_")
-                if tmp == "symmetrised_forces":
-                    force_name = "forces"
-                else:
-                    force_name = tmp
-
-            if not forces:
-                LOGGER.error(f"Cannot parse force lines {box}")
-            trajectory_data[force_name].append(forces)
-            skip = i
-            continue
-
-        if "Atomic Populations (Mulliken)" in line:
-            end_index = [
-                index for index, line in enumerate(body_lines) if "Bond" in line
-            ][0]
-            box = body_lines[count:end_index]
-            i, charges, spins = parse_popn_box(box)
-            parsed_data["charges"] = charges
-            parsed_data["spins"] = spins
-            skip = i
-            continue
-
-        for warn_key in all_warnings:
-            if warn_key in line:
-                message = all_warnings[warn_key]
-                if message is None:
-                    message = body_lines[count : count + n_warning_lines]
-                    message = "\n".join(message)
-                parsed_data["warnings"].append(message)
+    if section_parsers is None:
+        section_parsers = SECTION_PARSERS
+    context = {
+        "parsed_data": parsed_data,
+        "trajectory_data": trajectory_data,
+        "n_warning_lines": n_warning_lines,
+        # Number of SCF loops at the end of each ionic step and the timer at the start of first loop
+        "ionic_step_ends": [],
+        "scf_start_time": None,
+    }
+    section_parsers.scan(body_lines, context)
+    ionic_step_ends = context["ionic_step_ends"]
+    scf_start_time = context["scf_start_time"]
 
     # Parse the end a few lines
     for line in body_lines[-50:]:
@@ -385,6 +331,27 @@ def parse_castep_text_output(out_lines, input_dict):
 
     #### END OF LINE BY LINE PARSING ITERATION ####
 
+    # Timing of the ionic steps
+    if trajectory_data["scf_cycles"]:
+        # A single step if no ionic step is reported, e.g. for singlepoint calculations
+        if not ionic_step_ends:
+            ionic_step_ends = [len(trajectory_data["scf_cycles"])]
+        step_time, step_cycles = get_ionic_step_timing(
+            trajectory_data["scf_cycles"],
+            trajectory_data["scf_time"],
+            ionic_step_ends,
+            scf_start_time,
+        )
+        if step_time.size > 0:
+            trajectory_data["step_wall_time"] = step_time.tolist()
+            trajectory_data["step_scf_cycles"] = step_cycles.tolist()
+            parsed_data["mean_step_time"] = float(step_time.mean())
+            parsed_data["median_step_time"] = float(np.median(step_time))
+            parsed_data["scf_cycles_per_step"] = float(step_cycles.mean())
+    else:
+        # Do not leave empty entries in the trajectory
+        trajectory_data.pop("scf_cycles", None)
+
     # remove unrelated units
     units_to_delete = []
     for key in parsed_data:
@@ -416,7 +383,56 @@ def parse_castep_text_output(out_lines, input_dict):
     else:
         parsed_data["geom_unconverged"] = None
 
-    return parsed_data, trajectory_data, list(critical_warnings.values())
+    return parsed_data, trajectory_data, list(CRITICAL_WARNINGS.values())
+
+
+def parse_scf_line(line, trajectory_data):
+    """
+    Parse a line of the SCF loop box and record the telemetry of the SCF cycles.
+
+    Each electronic minimisation results in one entry of the 'scf_cycles',
+    'scf_energy_gain' and 'scf_time' arrays, which are the number of the SCF cycles,
+    the energy gain per atom of the last cycle and the cumulative time at the end of the
+    minimisation. The entries are updated in place as the cycles are read, so that
+    the data of an incomplete minimisation is also recorded.
+
+    :param line: A line ending with '<-- SCF'
+    :param trajectory_data: The dictionary of lists to be updated
+    """
+    tokens = line.split()[:-2]
+    if not tokens:
+        return
+    if tokens[0] == "Initial":
+        trajectory_data["scf_cycles"].append(0)
+        trajectory_data["scf_energy_gain"].append(0.0)
+        trajectory_data["scf_time"].append(float(tokens[-1]))
+    elif tokens[0].isdigit() and trajectory_data["scf_cycles"]:
+        trajectory_data["scf_cycles"][-1] = int(tokens[0])
+        trajectory_data["scf_energy_gain"][-1] = float(tokens[-2])
+        trajectory_data["scf_time"][-1] = float(tokens[-1])
+
+
+def get_ionic_step_timing(scf_cycles, scf_time, step_ends, start_time):
+    """
+    Compute the wall time and the number of SCF cycles of each ionic step.
+
+    :param scf_cycles: Number of cycles of each SCF loop.
+    :param scf_time: Cumulative time at the end of each SCF loop.
+    :param step_ends: Number of the SCF loops completed at the end of each ionic step.
+    :param start_time: Timer at the start of the first SCF loop.
+
+    :returns: A tuple of the arrays of wall time and the number of SCF cycles of each step.
+    """
+    ends = np.asarray(step_ends, dtype=int)
+    ends = ends[ends > 0]
+    if ends.size == 0:
+        return np.zeros(0), np.zeros(0, dtype=int)
+    end_times = np.asarray(scf_time, dtype=float)[ends - 1]
+    total_cycles = np.cumsum(scf_cycles)[ends - 1]
+    # The timer is printed with two decimal places
+    step_time = np.round(np.diff(end_times, prepend=start_time), 2)
+    step_cycles = np.diff(total_cycles, prepend=0)
+    return step_time, step_cycles
 
 
 class LineParser:
@@ -513,6 +529,228 @@ def get_iter_parser():
     return parser
 
 
+class SectionParser:
+    """
+    Parser for a section of the .castep file
+    """
+
+    def __init__(self, func, keywords, extent=1, end=None):
+        """
+        Instantiate a SectionParser object.
+
+        :param func: A function called with the lines of the box and the parsing context.
+          It may return the number of lines to be skipped after the triggering line.
+        :param keywords: A list of keywords triggering the parser.
+        :param extent: Number of lines of the box including the triggering line, or a callable
+          to compute it from the parsing context.
+        :param end: A keyword marking the line after the end of the box. Overrides ``extent``.
+        """
+        self.func = func
+        self.keywords = keywords
+        self.extent = extent
+        self.end = end
+
+    def get_box(self, lines, index, context):
+        """Return the lines of the box starting at the index"""
+        if self.end is not None:
+            for iend in range(index + 1, len(lines)):
+                if self.end in lines[iend]:
+                    return lines[index:iend]
+            return lines[index:]
+        extent = self.extent(context) if callable(self.extent) else self.extent
+        return lines[index : index + extent]
+
+    def parse(self, lines, index, context):
+        """
+        Parse the section starting at the index
+
+        :returns: Number of lines to be skipped
+        """
+        skip = self.func(self.get_box(lines, index, context), context)
+        return skip if skip else 0
+
+
+class SectionRegistry:
+    """
+    Registry of the parsers for the sections of the .castep file
+
+    Each parser declares the keywords triggering it and the extent of the box it reads.
+    All keywords are compiled into a single regular expression, so each line is scanned
+    only once no matter how many parsers are registered. For example::
+
+        @SECTION_PARSERS.register("Hirshfeld Analysis", end="Hirshfeld total")
+        def parse_hirshfeld(box, context):
+            ...
+
+    The context is a dictionary containing the ``parsed_data`` and ``trajectory_data``
+    to be updated.
+    """
+
+    def __init__(self):
+        self._parsers = {}
+        self._regex = None
+
+    def register(self, keywords, extent=1, end=None):
+        """
+        Decorator for registering a function as a section parser.
+        See ``SectionParser`` for the meaning of the arguments.
+        """
+        if isinstance(keywords, str):
+            keywords = [keywords]
+
+        def decorator(func):
+            parser = SectionParser(func, list(keywords), extent=extent, end=end)
+            for keyword in keywords:
+                self._parsers[keyword] = parser
+            self._regex = None
+            return func
+
+        return decorator
+
+    def copy(self):
+        """Return a copy of the registry, which can be extended without affecting this one"""
+        new = SectionRegistry()
+        new._parsers = dict(self._parsers)  # pylint: disable=protected-access
+        return new
+
+    @property
+    def keywords(self):
+        """All registered keywords"""
+        return list(self._parsers)
+
+    @property
+    def regex(self):
+        """The compiled regular expression of all keywords"""
+        if self._regex is None:
+            # Longer keywords first, so that they take precedence over their prefixes
+            keywords = sorted(self._parsers, key=len, reverse=True)
+            self._regex = re.compile("|".join(map(re.escape, keywords)))
+        return self._regex
+
+    def scan(self, lines, context):
+        """
+        Scan through the lines and dispatch the sections to the registered parsers
+        """
+        search = self.regex.search
+        nlines = len(lines)
+        index = 0
+        while index < nlines:
+            match = search(lines[index])
+            if match:
+                parser = self._parsers[match.group(0)]
+                index += parser.parse(lines, index, context)
+            index += 1
+
+
+SECTION_PARSERS = SectionRegistry()
+ITER_PARSER = get_iter_parser()
+
+
+@SECTION_PARSERS.register(
+    [
+        "Final free energy",
+        "Final energy",
+        "NB est. 0K energy",
+        "Integrated Spin Density",
+        "Integrated |Spin Density|",
+        "finished iteration",
+        "finished MD iteration",
+    ]
+)
+def _parse_iteration_line(box, context):
+    """Parse the quantities reported for each iteration and the end of the ionic steps"""
+    line = box[0]
+    trajectory_data = context["trajectory_data"]
+    if ionic_step_re.match(line):
+        context["ionic_step_ends"].append(len(trajectory_data["scf_cycles"]))
+
+    res_tmp = ITER_PARSER.parse(line)
+    if res_tmp:
+        name, value = res_tmp[:2]
+        trajectory_data[name].append(value)
+
+
+@SECTION_PARSERS.register("<-- SCF")
+def _parse_scf_line(box, context):
+    """Parse a line of the SCF loop box"""
+    line = box[0]
+    if not line.rstrip().endswith("<-- SCF"):
+        return
+    trajectory_data = context["trajectory_data"]
+    parse_scf_line(line, trajectory_data)
+    if context["scf_start_time"] is None and trajectory_data["scf_time"]:
+        context["scf_start_time"] = trajectory_data["scf_time"][0]
+
+
+@SECTION_PARSERS.register("Calculation parallelised over")
+def _parse_parallel_line(box, context):
+    """Parse the number of processes used"""
+    num_cores = int(box[0].strip().split()[-2])
+    context["parsed_data"]["parallel_procs"] = num_cores
+
+
+@SECTION_PARSERS.register("Stress Tensor", extent=20)
+def _parse_stress_section(box, context):
+    """Parse the stress box"""
+    i, stress, pressure = parse_stress_box(box)
+    assert len(stress) == 3
+    if "Symmetrised" in box[0]:
+        prefix = "symm_"
+    else:
+        prefix = ""
+    trajectory_data = context["trajectory_data"]
+    trajectory_data[prefix + "pressure"].append(pressure)
+    trajectory_data[prefix + "stress"].append(stress)
+    return i
+
+
+@SECTION_PARSERS.register(
+    "Forces *******", extent=lambda context: context["parsed_data"]["num_ions"] + 10
+)
+def _parse_force_section(box, context):
+    """Parse the force box"""
+    line = box[0]
+    i, forces = parse_force_box(box)
+
+    # Resolve force names
+    # For backward compatibility symmetrised_forces are stored as forces
+    if "Constrained" in line:
+        force_name = "cons_forces"
+    else:
+        tmp = line.replace("*", " ").strip().lower().replace(" ", "_")
+        if tmp == "symmetrised_forces":
+            force_name = "forces"
+        else:
+            force_name = tmp
+
+    if not forces:
+        LOGGER.error(f"Cannot parse force lines {box}")
+    context["trajectory_data"][force_name].append(forces)
+    return i
+
+
+@SECTION_PARSERS.register("Atomic Populations (Mulliken)", end="Bond")
+def _parse_popn_section(box, context):
+    """Parse the Mulliken population box"""
+    i, charges, spins = parse_popn_box(box)
+    context["parsed_data"]["charges"] = charges
+    context["parsed_data"]["spins"] = spins
+    return i
+
+
+@SECTION_PARSERS.register(
+    list(ALL_WARNINGS), extent=lambda context: context["n_warning_lines"]
+)
+def _parse_warning_line(box, context):
+    """Record the warnings"""
+    line = box[0]
+    for warn_key, message in ALL_WARNINGS.items():
+        if warn_key in line:
+            if message is None:
+                message = "\n".join(box)
+            context["parsed_data"]["warnings"].append(message)
+
+
 def parse_geom_text_output(out_lines, input_dict) -> dict:
     """
     Parse output of .geom file
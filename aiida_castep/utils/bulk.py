@@ -0,0 +1,258 @@
+"""
+Module for building and submitting a large number of calculations
+
+The input nodes shared by the calculations, such as the parameters, kpoints
+and options, are stored once and reused by all the builders. Pseudopotentials
+are resolved once for each unique set of kinds.
+"""
+import time
+
+import numpy as np
+from aiida import orm
+
+from aiida_castep.common import INPUT_LINKNAMES
+
+# pylint: disable=import-outside-toplevel, too-many-arguments, too-many-instance-attributes
+
+
+def _store_shared(value, node_class):
+    """Convert a value to a node if needed, and store it"""
+    if value is None:
+        return None
+    if not isinstance(value, orm.Data):
+        value = node_class(value)
+    if not value.is_stored:
+        value.store()
+    return value
+
+
+def get_kinds_key(structure):
+    """
+    Get a hashable key of the kinds of a structure for looking up the pseudopotentials
+    """
+    return tuple(sorted((kind.name, kind.symbols) for kind in structure.kinds))
+
+
+class BulkBuilderFactory:
+    """
+    Factory of builders for ``CastepCalculation`` or ``CastepBaseWorkChain``
+    (and their subclasses) sharing the same input nodes.
+
+    Example::
+
+        factory = BulkBuilderFactory(
+            CastepBaseWorkChain, code, {"task": "singlepoint", "cut_off_energy": 500},
+            pseudos_family="C19", kpoints_spacing=0.05,
+            options={"resources": {"num_machines": 1}},
+        )
+        nodes = factory.submit_all(structures, max_active=100)
+    """
+
+    def __init__(
+        self,
+        process_class,
+        code,
+        parameters,
+        pseudos_family=None,
+        pseudos=None,
+        kpoints=None,
+        kpoints_spacing=None,
+        settings=None,
+        options=None,
+        extra_inputs=None,
+    ):
+        """
+        Instantiate the factory
+
+        :param process_class: ``CastepCalculation``, ``CastepBaseWorkChain`` or their subclasses
+        :param code: The code to be used
+        :param parameters: A ``Dict`` or a dictionary of the input parameters. The flat format
+          is only allowed for the workchains.
+        :param pseudos_family: Name of the pseudopotential family
+        :param pseudos: A dictionary of the pseudopotentials for each kind, used for the
+          structures if ``pseudos_family`` is not given
+        :param kpoints: A ``KpointsData`` to be shared by all calculations
+        :param kpoints_spacing: Kpoint spacing in the unit of 2pi/Angstrom, used if
+          ``kpoints`` is not given
+        :param settings: A ``Dict`` or a dictionary of the settings
+        :param options: A dictionary of the ``metadata.options`` of the calculations
+        :param extra_inputs: A dictionary of other inputs shared by all builders, the keys
+          can be nested with dots, e.g. ``calc.bs_kpoints``
+        """
+        if pseudos_family is None and pseudos is None:
+            raise ValueError("Either pseudos_family or pseudos must be given")
+        if kpoints is None and kpoints_spacing is None:
+            raise ValueError("Either kpoints or kpoints_spacing must be given")
+
+        self.process_class = process_class
+        self.is_workchain = "calc" in process_class.spec().inputs
+        self.code = code
+        self.parameters = _store_shared(parameters, orm.Dict)
+        self.settings = _store_shared(settings, orm.Dict)
+        self.kpoints = _store_shared(kpoints, orm.KpointsData)
+        self.kpoints_spacing = kpoints_spacing
+        self.pseudos_family = pseudos_family
+        self.pseudos = pseudos
+        self.options = dict(options or {})
+        self.extra_inputs = dict(extra_inputs or {})
+
+        # Shared nodes of the workchains
+        self._options_node = None
+        self._spacing_node = None
+        if self.is_workchain:
+            if self.options:
+                self._options_node = _store_shared(self.options, orm.Dict)
+            if self.kpoints is None:
+                self._spacing_node = _store_shared(kpoints_spacing, orm.Float)
+
+        self._pseudo_cache = {}
+        self._mesh_cache = {}
+
+    def get_pseudos(self, structure):
+        """
+        Get the pseudopotentials for a structure
+
+        The family is only looked up once for each unique set of kinds.
+        With explicit pseudopotentials, each kind is looked up by its name, or by its symbol
+        if it is not a mixture or has vacancies.
+
+        :raise NotExistent: if no pseudopotential is found for a kind
+        """
+        if self.pseudos_family is None:
+            from aiida.common.exceptions import NotExistent
+
+            pseudos = {}
+            missing = []
+            for kind in structure.kinds:
+                pseudo = self.pseudos.get(kind.name)
+                if pseudo is None and not kind.is_alloy and not kind.has_vacancies:
+                    pseudo = self.pseudos.get(kind.symbol)
+                if pseudo is None:
+                    missing.append(kind.name)
+                pseudos[kind.name] = pseudo
+            if missing:
+                raise NotExistent(
+                    "No pseudopotential is given for kind(s): {}".format(
+                        ", ".join(missing)
+                    )
+                )
+            return pseudos
+
+        from aiida_castep.data import get_pseudos_from_structure
+
+        key = get_kinds_key(structure)
+        pseudos = self._pseudo_cache.get(key)
+        if pseudos is None:
+            pseudos = get_pseudos_from_structure(structure, self.pseudos_family)
+            self._pseudo_cache[key] = pseudos
+        return pseudos
+
+    def get_kpoints(self, structure):
+        """
+        Get the kpoints for a structure
+
+        Structures with the same kpoint mesh share the same stored ``KpointsData``.
+        """
+        if self.kpoints is not None:
+            return self.kpoints
+
+        kpoints = orm.KpointsData()
+        kpoints.set_cell_from_structure(structure)
+        kpoints.set_kpoints_mesh_from_density(np.pi * 2 * self.kpoints_spacing)
+        mesh, _ = kpoints.get_kpoints_mesh()
+        key = tuple(mesh)
+        shared = self._mesh_cache.get(key)
+        if shared is None:
+            shared = orm.KpointsData()
+            shared.set_kpoints_mesh(mesh)
+            shared.store()
+            self._mesh_cache[key] = shared
+        return shared
+
+    def get_builder(self, structure, label=None):
+        """
+        Get the builder for a single structure
+
+        :param structure: The input ``StructureData``
+        :param label: Label of the process, default to the label of the structure
+        """
+        builder = self.process_class.get_builder()
+        label = label if label is not None else structure.label
+        if label:
+            builder.metadata.label = label
+
+        if self.is_workchain:
+            calc = builder.calc
+            if self._options_node is not None:
+                builder.calc_options = self._options_node
+            if self.kpoints is None:
+                builder.kpoints_spacing = self._spacing_node
+            else:
+                calc.kpoints = self.kpoints
+        else:
+            calc = builder
+            if self.options:
+                builder.metadata.options = self.options
+            calc.kpoints = self.get_kpoints(structure)
+
+        calc[INPUT_LINKNAMES["structure"]] = structure
+        calc[INPUT_LINKNAMES["parameters"]] = self.parameters
+        calc.code = self.code
+        calc.pseudos = self.get_pseudos(structure)
+        if self.settings is not None:
+            calc[INPUT_LINKNAMES["settings"]] = self.settings
+
+        for key, value in self.extra_inputs.items():
+            namespace = builder
+            *parents, name = key.split(".")
+            for parent in parents:
+                namespace = namespace[parent]
+            namespace[name] = value
+        return builder
+
+    def iter_builders(self, structures):
+        """
+        Generate the builders for the structures lazily
+
+        :param structures: An iterable of ``StructureData`` or (label, ``StructureData``) pairs
+        """
+        for item in structures:
+            if isinstance(item, orm.StructureData):
+                yield self.get_builder(item)
+            else:
+                label, structure = item
+                yield self.get_builder(structure, label=label)
+
+    def submit_all(
+        self, structures, max_active=None, poll_interval=10, group=None, submit_fn=None
+    ):
+        """
+        Submit the processes for the structures
+
+        :param structures: An iterable of ``StructureData`` or (label, ``StructureData``) pairs
+        :param max_active: Maximum number of the submitted processes that have not terminated
+          at any time. The submission waits for existing processes to finish if the limit
+          is reached.
+        :param poll_interval: Interval in seconds for checking the submitted processes
+        :param group: A ``Group`` to which the submitted process nodes are added
+        :param submit_fn: The function for submitting a builder, default to ``aiida.engine.submit``
+
+        :returns: A list of the submitted process nodes
+        """
+        if submit_fn is None:
+            from aiida.engine import submit as submit_fn
+
+        submitted = []
+        active = []
+        for builder in self.iter_builders(structures):
+            if max_active is not None:
+                active = [node for node in active if not node.is_terminated]
+                while len(active) >= max_active:
+                    time.sleep(poll_interval)
+                    active = [node for node in active if not node.is_terminated]
+            node = submit_fn(builder)
+            if group is not None:
+                group.add_nodes(node)
+            submitted.append(node)
+            active.append(node)
+        return submitted
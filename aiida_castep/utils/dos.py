@@ -102,6 +102,53 @@ class DOSProcessor:
             interp_dos = np.squeeze(interp_dos, axis=0)
         return out_energies, interp_dos
 
+    def get_pdos(self, orbital_weights, npoints=2000):
+        """
+        Process the projected density of states by Gaussian smearing
+
+        The states of all orbitals are counted into the fine grid in a single pass,
+        before being smeared and resampled in the same way as in ``get_dos``.
+
+        :param orbital_weights: An array of the weights of the states projected onto each orbital,
+            with shape (Nspin, Nkpoints, Nbands, Norbitals), e.g. the ``weights`` array of
+            the ``output_pdos`` node.
+        :param npoints: Number of the points for the output PDOS array.
+        :returns: A tuple of the energies and the PDOS array with shape (Nspin, Norbitals, npoints).
+        """
+
+        nspin, _, nbands = self.bands_data.shape
+        norb = orbital_weights.shape[-1]
+        nbins = len(self.energies)
+
+        # Index of the fine grid bin for each state, states outside the range are dropped
+        ibin = np.digitize(self.bands_data, self.bins) - 1
+        valid = (ibin >= 0) & (ibin < nbins)
+        ispin = np.broadcast_to(np.arange(nspin)[:, None, None], ibin.shape)
+        state_idx = (ispin * nbins + ibin)[valid]
+
+        # Weights of each state and orbital, including those of the kpoints
+        state_weights = (
+            orbital_weights[:, :, :nbands, :] * self.weights[None, :, None, None]
+        )
+        flat_idx = (state_idx[:, None] * norb + np.arange(norb)).ravel()
+        counts = np.bincount(
+            flat_idx,
+            weights=state_weights[valid].ravel(),
+            minlength=nspin * nbins * norb,
+        )
+        counts = counts.reshape(nspin, nbins, norb).transpose(0, 2, 1)
+        counts = counts.reshape(nspin * norb, nbins)
+
+        # Apply smearing by convoluting with a gaussian kernel
+        kernel = gaussian_kernel(self.smearing, self.bin_width)
+        out_energies = np.linspace(self.min_eng, self.max_eng, npoints)
+        interp_pdos = np.zeros((nspin * norb,) + out_energies.shape)
+        for irow, row in enumerate(counts):
+            broadened = np.convolve(row, kernel, mode="same")
+            interp_pdos[irow, :] = np.interp(out_energies, self.energies, broadened)
+
+        return out_energies, interp_pdos.reshape(nspin, norb, npoints)
+
     @property
     def min_eigen_value(self):
         """Minimum eigenvalue"""
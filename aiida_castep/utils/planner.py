@@ -0,0 +1,247 @@
+"""
+Module for planning the MPI resources of CASTEP calculations
+
+The parallel efficiency is modelled following Amdahl's law for the G-vector
+parallelisation, while the distribution over kpoints is assumed to be perfect
+when the number of kpoint groups divides the number of kpoints.
+The serial fraction of the model can be calibrated with the parallel efficiencies
+reported by the previous calculations.
+"""
+from math import ceil, floor, gcd
+from statistics import median
+
+# pylint: disable=import-outside-toplevel, too-many-arguments, too-many-locals, invalid-name
+
+DEFAULT_SERIAL_FRACTION = 0.02
+
+
+def get_data_distribution(num_kpoint_groups, num_gvector_procs):
+    """Get the value of the ``data_distribution`` keyword"""
+    if num_gvector_procs == 1:
+        return "kpoint"
+    if num_kpoint_groups == 1:
+        return "gvector"
+    return "mixed"
+
+
+def split_procs(num_procs, num_kpoints):
+    """
+    Split the processes into kpoint groups and G-vector processes
+
+    :returns: A tuple of the number of kpoint groups and the number of processes
+      in each group
+    """
+    num_kpoint_groups = gcd(num_procs, num_kpoints) if num_kpoints else 1
+    return num_kpoint_groups, num_procs // num_kpoint_groups
+
+
+def estimate_serial_fraction(history, default=DEFAULT_SERIAL_FRACTION):
+    """
+    Estimate the serial fraction of the G-vector parallelisation
+
+    :param history: A list of dictionaries with the ``parallel_procs``,
+      ``parallel_efficiency`` (in percentage) and optionally ``n_kpoints``
+      of previous calculations
+    :param default: The value used if there is no usable record
+
+    :returns: The median of the serial fractions inferred from the records
+    """
+    fractions = []
+    for record in history:
+        procs = record.get("parallel_procs")
+        efficiency = record.get("parallel_efficiency")
+        if not procs or not efficiency:
+            continue
+        _, gvector_procs = split_procs(int(procs), int(record.get("n_kpoints") or 0))
+        if gvector_procs < 2:
+            continue
+        fraction = (100.0 / float(efficiency) - 1) / (gvector_procs - 1)
+        fractions.append(min(max(fraction, 0.0), 1.0))
+    if not fractions:
+        return default
+    return median(fractions)
+
+
+def estimate_wall_time(history, num_procs, efficiency):
+    """
+    Estimate the wall time using the total time of the previous calculations
+
+    :returns: The estimated time in seconds, or None if there is no usable record
+    """
+    estimates = []
+    for record in history:
+        procs = record.get("parallel_procs")
+        efficiency_hist = record.get("parallel_efficiency")
+        total_time = record.get("total_time")
+        if not (procs and efficiency_hist and total_time):
+            continue
+        # Scale with the effective number of processes
+        speed_hist = procs * efficiency_hist / 100.0
+        estimates.append(total_time * speed_hist / (num_procs * efficiency))
+    if not estimates:
+        return None
+    return median(estimates)
+
+
+def plan_mpi_resources(
+    num_kpoints,
+    cores_per_node,
+    max_nodes=1,
+    memory_MB=None,
+    memory_per_node_MB=None,
+    min_efficiency=0.7,
+    history=None,
+    serial_fraction=None,
+):
+    """
+    Choose the number of nodes and MPI processes for a calculation
+
+    The layout with the highest throughput is selected among those fitting
+    in the memory and with the efficiency, including the cost of any idle cores
+    on the nodes allocated, no less than ``min_efficiency``.
+
+    :param num_kpoints: Number of the irreducible kpoints, e.g. from a dryrun
+    :param cores_per_node: Number of cores on each node
+    :param max_nodes: Maximum number of nodes to be used
+    :param memory_MB: Memory needed by a serial run, e.g. from a dryrun. The memory
+      per process is assumed to be reduced by the G-vector parallelisation only.
+    :param memory_per_node_MB: Memory available on each node
+    :param min_efficiency: The minimum efficiency accepted
+    :param history: A list of records of the previous calculations, see
+      ``estimate_serial_fraction``
+    :param serial_fraction: The serial fraction of the model, estimated from
+      the history if not given
+
+    :returns: A dictionary of the plan, or None if no layout is acceptable
+    """
+    history = history or []
+    if serial_fraction is None:
+        serial_fraction = estimate_serial_fraction(history)
+
+    best = None
+    for num_nodes in range(1, max_nodes + 1):
+        # Under subscribing the nodes may be needed to fit in the memory
+        for procs_per_node in range(cores_per_node, 0, -1):
+            num_procs = num_nodes * procs_per_node
+            num_groups, gvector_procs = split_procs(num_procs, num_kpoints)
+            memory_per_proc = memory_MB / gvector_procs if memory_MB else None
+            if (
+                memory_per_proc
+                and memory_per_node_MB
+                and memory_per_proc * procs_per_node > memory_per_node_MB
+            ):
+                continue
+            efficiency = 1.0 / (1.0 + serial_fraction * (gvector_procs - 1))
+            speed = num_procs * efficiency
+            # The efficiency with respect to the cores allocated
+            allocated_efficiency = speed / (num_nodes * cores_per_node)
+            if allocated_efficiency < min_efficiency:
+                continue
+            if best is None or speed > best[0] + 1e-8:
+                best = (
+                    speed,
+                    {
+                        "num_machines": num_nodes,
+                        "num_mpiprocs_per_machine": procs_per_node,
+                        "num_kpoint_groups": num_groups,
+                        "num_gvector_procs": gvector_procs,
+                        "data_distribution": get_data_distribution(
+                            num_groups, gvector_procs
+                        ),
+                        "efficiency": allocated_efficiency,
+                        "memory_per_proc_MB": memory_per_proc,
+                        "serial_fraction": serial_fraction,
+                        "estimated_time": estimate_wall_time(
+                            history, num_procs, efficiency
+                        ),
+                    },
+                )
+    if best is None:
+        return None
+    return best[1]
+
+
+def get_parallel_history(
+    code=None, limit=50, task=None, num_atoms=None, size_ratio=2.0
+):
+    """
+    Get the records of parallelisation from the previous calculations
+
+    :param code: Only include the calculations using this code
+    :param limit: Maximum number of the most recent calculations to be included
+    :param task: Only include the calculations of this task, compared case-insensitively
+    :param num_atoms: Only include the calculations of similar system sizes, with the
+      number of atoms differing by no more than a factor of ``size_ratio``
+
+    :returns: A list of dictionaries with ``parallel_procs``, ``parallel_efficiency``,
+      ``total_time`` and ``n_kpoints``
+    """
+    from aiida.orm import (
+        AbstractCode,
+        CalcJobNode,
+        Dict,
+        QueryBuilder,
+        StructureData,
+    )
+
+    from aiida_castep.common import INPUT_LINKNAMES, OUTPUT_LINKNAMES
+
+    qbd = QueryBuilder()
+    if code is not None:
+        qbd.append(AbstractCode, filters={"id": code.pk}, tag="code")
+        qbd.append(
+            CalcJobNode,
+            with_incoming="code",
+            tag="calc",
+            filters={"attributes.exit_status": 0},
+        )
+    else:
+        qbd.append(
+            CalcJobNode,
+            tag="calc",
+            filters={
+                "attributes.exit_status": 0,
+                "process_type": {"like": "aiida.calculations:castep.%"},
+            },
+        )
+    if num_atoms is not None:
+        qbd.append(
+            StructureData,
+            with_outgoing="calc",
+            edge_filters={"label": INPUT_LINKNAMES["structure"]},
+            filters={
+                "attributes.sites": {
+                    "longer": ceil(num_atoms / size_ratio) - 1,
+                    "shorter": floor(num_atoms * size_ratio) + 1,
+                }
+            },
+        )
+    keys = ["parallel_procs", "parallel_efficiency", "total_time", "n_kpoints"]
+    qbd.append(
+        Dict,
+        with_incoming="calc",
+        edge_filters={"label": OUTPUT_LINKNAMES["results"]},
+        filters={"attributes": {"has_key": "parallel_efficiency"}},
+        project=[f"attributes.{key}" for key in keys],
+    )
+    if task is not None:
+        qbd.append(
+            Dict,
+            with_outgoing="calc",
+            edge_filters={"label": INPUT_LINKNAMES["parameters"]},
+            project=["attributes.PARAM"],
+        )
+    qbd.order_by({"calc": {"ctime": "desc"}})
+    if task is None:
+        qbd.limit(limit)
+
+    history = []
+    for row in qbd.iterall():
+        if task is not None:
+            param = {str(key).lower(): value for key, value in (row[-1] or {}).items()}
+            if str(param.get("task", "singlepoint")).lower() != task.lower():
+                continue
+        history.append(dict(zip(keys, row)))
+        if len(history) == limit:
+            break
+    return history
@@ -252,8 +252,8 @@ class CastepBandsWorkChain(WorkChain):
             self.report("SCF workchain finished with Error")
             return self.exit_codes.ERROR_SUB_PROC_SCF_FAILED
 
-        # NOTE: the plugin does not support restarting from local files for now,
-        # This should be added later - restart from a `retrieved` local folder
+        # NOTE: CastepCalculation can restart from a local checkpoint with the
+        # `parent_checkpoint` input, but it is not used by this workchain yet
         self.ctx.restart_folder = scf_workchain.outputs.remote_folder
         self.report(f"SCF calculation {scf_workchain} completed")
         return None
@@ -21,10 +21,18 @@ from aiida.orm.nodes.data.base import to_aiida_type
 from aiida.plugins import DataFactory
 
 from aiida_castep.calculations import CastepCalculation
-from aiida_castep.calculations.helper import CastepHelper
-from aiida_castep.calculations.tools import flat_input_param_validator
+from aiida_castep.calculations.dryrun import get_dryrun_results
+from aiida_castep.calculations.helper import get_helper
+from aiida_castep.calculations.tools import (
+    flat_input_param_validator,
+    select_auto_restart_suffix,
+)
 from aiida_castep.common import INPUT_LINKNAMES, OUTPUT_LINKNAMES
 from aiida_castep.data import get_pseudos_from_structure
+from aiida_castep.utils.planner import (
+    get_parallel_history,
+    plan_mpi_resources,
+)
 
 from .common import (
     ErrorHandlerReport,
@@ -112,7 +120,9 @@ class CastepBaseWorkChain(WorkChain):
             required=False,
             help=(
                 "Options specific to the workchain."
-                "Avaliable options: queue_wallclock_limit, use_castep_bin"
+                "Avaliable options: queue_wallclock_limit, use_castep_bin, "
+                "plan_resources. If use_castep_bin is 'auto', the restart file is "
+                "selected from those in the reuse_folder."
             ),
         )
         spec.input(
@@ -148,6 +158,7 @@ class CastepBaseWorkChain(WorkChain):
         )
 
         spec.output("output_array", valid_type=orm.ArrayData, required=False)
+        spec.output("output_pdos", valid_type=orm.ArrayData, required=False)
         spec.output("output_trajectory", valid_type=orm.ArrayData, required=False)
         spec.output("output_bands", valid_type=orm.BandsData, required=True)
         spec.output("output_structure", valid_type=orm.StructureData, required=False)
@@ -187,6 +198,11 @@ class CastepBaseWorkChain(WorkChain):
             "ERROR_ITERATION_RETURNED_NO_CALCULATION",
             "Completed one iteration but found not calculation returned",
         )
+        spec.exit_code(
+            902,
+            "ERROR_DRYRUN_FAILED",
+            "The dryrun did not report the number of kpoints",
+        )
 
         # Outline of the calculation
         spec.outline(
@@ -197,6 +213,7 @@ class CastepBaseWorkChain(WorkChain):
                 cls.run_dry_run,
                 cls.inspect_dryrun,
             ),
+            if_(cls.should_plan_resources)(cls.plan_resources),
             while_(cls.should_run_calculation)(
                 cls.prepare_calculation,
                 cls.run_calculation,
@@ -262,18 +279,28 @@ class CastepBaseWorkChain(WorkChain):
             options = {}
         self.ctx.options = options
 
+        # Set the seed name
+        seedname = self.inputs.calc.metadata.options.seedname
+
         # Deal with the continuations
         use_bin = options.get("use_castep_bin", False)
-        if use_bin:
+        if use_bin == "auto":
+            # The transport is requested from the queue of the runner
+            restart_suffix = select_auto_restart_suffix(
+                "continuation" if self.inputs.get("continuation_folder") else "reuse",
+                parent_folder=self.inputs.get("reuse_folder"),
+                seedname=seedname,
+                transport_queue=self.runner.transport,
+            )
+            if self.inputs.get("reuse_folder"):
+                self.report(f"Selected the {restart_suffix} file for reuse")
+        elif use_bin:
             restart_suffix = "castep_bin"
         else:
             restart_suffix = "check"
 
-        # Set the seed name
-        seedname = self.inputs.calc.metadata.options.seedname
-
         # In case we are dealing with a plain inputs, extend any plain inputs
-        helper = CastepHelper()
+        helper = get_helper()
         param_dict = helper.check_dict(input_parameters)
         self.ctx.inputs["parameters"] = param_dict
 
@@ -349,21 +376,133 @@ class CastepBaseWorkChain(WorkChain):
             return self.exit_codes.ERROR_INVALID_INPUTS
         return None
 
-    def should_dry_run(self):  # pylint: disable=no-self-use
+    def should_plan_resources(self):
+        """Should the MPI resources be selected automatically?"""
+        return bool(self.ctx.options.get("plan_resources"))
+
+    def plan_resources(self):
         """
-        Do a dryrun to validate the inputs
+        Select the number of nodes, MPI processes and the data distribution scheme
+
+        The ``plan_resources`` option is a dictionary with the following keys:
+
+        - ``cores_per_node`` (required): Number of cores of each node
+        - ``max_nodes``: Maximum number of nodes to be used, default to 1
+        - ``min_efficiency``: The minimum parallel efficiency accepted, default to 0.7
+        - ``memory_per_node_MB``: Memory available on each node
+        - ``num_kpoints`` and ``memory_MB``: The number of irreducible kpoints and
+          the memory needed by a serial run. A dryrun is launched to obtain them
+          unless ``num_kpoints`` is given.
+        - ``use_history``: Calibrate the model with the parallel efficiencies of
+          previous calculations using the same code and task with similar numbers
+          of atoms, default to True
         """
-        return False  # We do not implement this for now
-        # return 'do_dryrun' in self.inputs
+        plan_options = self.ctx.options["plan_resources"]
+        if "cores_per_node" not in plan_options:
+            self.report("The plan_resources option requires the cores_per_node key")
+            return self.exit_codes.ERROR_INVALID_INPUTS
+
+        dryrun_results = self.ctx.get("dryrun_results", {})
+        num_kpoints = plan_options.get("num_kpoints", dryrun_results.get("num_kpoints"))
+        memory_MB = plan_options.get("memory_MB", dryrun_results.get("memory_MB"))
+
+        history = []
+        if plan_options.get("use_history", True):
+            history = get_parallel_history(
+                code=self.ctx.inputs.code,
+                task=self.ctx.inputs.parameters["PARAM"].get("task", "singlepoint"),
+                num_atoms=len(self.ctx.inputs.structure.sites),
+            )
+
+        plan = plan_mpi_resources(
+            num_kpoints,
+            plan_options["cores_per_node"],
+            max_nodes=plan_options.get("max_nodes", 1),
+            memory_MB=memory_MB,
+            memory_per_node_MB=plan_options.get("memory_per_node_MB"),
+            min_efficiency=plan_options.get("min_efficiency", 0.7),
+            history=history,
+        )
+        if plan is None:
+            self.report("No layout of the MPI processes satisfies the constraints")
+            return self.exit_codes.ERROR_INVALID_INPUTS
+
+        self.ctx.inputs.metadata.options["resources"] = {
+            "num_machines": plan["num_machines"],
+            "num_mpiprocs_per_machine": plan["num_mpiprocs_per_machine"],
+        }
+        param = self.ctx.inputs.parameters["PARAM"]
+        if "data_distribution" not in param:
+            param["data_distribution"] = plan["data_distribution"]
+        self.report(
+            "Planned resources: {} node(s) x {} process(es), {} kpoint group(s), "
+            "estimated efficiency {:.2f} with {} previous record(s)".format(
+                plan["num_machines"],
+                plan["num_mpiprocs_per_machine"],
+                plan["num_kpoint_groups"],
+                plan["efficiency"],
+                len(history),
+            )
+        )
+        return None
+
+    def should_dry_run(self):
+        """
+        Do a dryrun to obtain the number of kpoints and the memory needed,
+        which are required for planning the resources
+        """
+        plan_options = self.ctx.options.get("plan_resources")
+        return bool(plan_options) and "num_kpoints" not in plan_options
 
     def validate_dryrun_inputs(self):
-        pass
+        """Check the options for planning the resources before running the dryrun"""
+        if "cores_per_node" not in self.ctx.options["plan_resources"]:
+            self.report("The plan_resources option requires the cores_per_node key")
+            return self.exit_codes.ERROR_INVALID_INPUTS
+        return None
 
     def run_dry_run(self):
-        pass
+        """
+        Submit a dryrun of the calculation using a single process
+        """
+        inputs = AttributeDict(self.ctx.inputs)
+        inputs.settings = dict(self.ctx.inputs.settings)
+        inputs.settings["CMDLINE"] = list(inputs.settings.get("CMDLINE", [])) + [
+            "--dryrun"
+        ]
+        inputs.metadata = AttributeDict(self.ctx.inputs.metadata)
+        inputs.metadata["options"] = AttributeDict(self.ctx.inputs.metadata.options)
+        inputs.metadata.options["resources"] = {
+            "num_machines": 1,
+            "num_mpiprocs_per_machine": 1,
+        }
+        inputs.metadata["call_link_label"] = "dryrun"
+
+        calculation = self.submit(
+            self._calculation_class, **self._prepare_process_inputs(inputs)
+        )
+        self.report(f"launching dryrun {self.ctx.calc_name}<{calculation.pk}>")
+        return ToContext(dryrun_calc=calculation)
 
     def inspect_dryrun(self):
-        pass
+        """
+        Read the number of kpoints and the memory needed from the dryrun
+        """
+        calculation = self.ctx.dryrun_calc
+        results = get_dryrun_results(calculation)
+        if results.get("num_kpoints") is None:
+            self.report(f"Dryrun {self.ctx.calc_name}<{calculation.pk}> failed")
+            return self.exit_codes.ERROR_DRYRUN_FAILED
+        self.report(
+            "Dryrun {}<{}>: {} kpoint(s), {} MB per process".format(
+                self.ctx.calc_name,
+                calculation.pk,
+                results["num_kpoints"],
+                results.get("memory_MB"),
+            )
+        )
+        self.ctx.dryrun_results = results
+        return None
 
     def should_run_calculation(self):
         """Should we start the calculation (again)?"""
@@ -14,7 +14,7 @@ from aiida.common.exceptions import MultipleObjectsError, NotExistent
 from aiida.engine import ToContext, WorkChain, append_, while_
 from aiida.orm.nodes.data.base import to_aiida_type
 
-from aiida_castep.calculations.helper import CastepHelper
+from aiida_castep.calculations.helper import get_helper
 from aiida_castep.calculations.tools import flat_input_param_validator
 from aiida_castep.common import INPUT_LINKNAMES as IN_LINKS
 from aiida_castep.common import OUTPUT_LINKNAMES as OUT_LINKS
@@ -349,7 +349,7 @@ class CastepRelaxWorkChain(WorkChain):
             return self.exit_codes.ERROR_SUB_PROCESS_FAILED_RELAX
 
         # Compare with the input parameters of this one
-        helper = CastepHelper()
+        helper = get_helper()
         orig_in_param = self.inputs.calc[IN_LINKS["parameters"]].get_dict()
         orig_in_param, _ = helper._from_flat_dict(orig_in_param)
 
@@ -0,0 +1,68 @@
+"""
+Benchmark the overhead of preparing a CastepCalculation for submission
+
+Each submission is done as a dry run, hence no calculation is actually launched.
+Usage:
+
+    verdi run benchmark_submission.py --code castep@localhost --supercell 4 --repeat 10
+"""
+import argparse
+import time
+from statistics import mean, median
+
+from aiida.orm import Dict, KpointsData, StructureData, load_code
+from ase.build import bulk
+
+from aiida_castep.calculations.castep import (
+    CastepCalculation,
+    submit_test,
+)
+from aiida_castep.data.otfg import OTFGData
+
+
+def get_builder(code, supercell, nkpts):
+    """Construct the builder to be benchmarked"""
+    atoms = bulk("Si", "diamond", 5.43) * (supercell, supercell, supercell)
+    builder = CastepCalculation.get_builder()
+    builder.structure = StructureData(ase=atoms)
+    builder.parameters = Dict(
+        dict={"PARAM": {"task": "singlepoint", "cut_off_energy": 300}, "CELL": {}}
+    )
+    kpoints = KpointsData()
+    if nkpts:
+        kpoints.set_kpoints([[i / nkpts, 0.0, 0.0] for i in range(nkpts)])
+    else:
+        kpoints.set_kpoints_mesh((2, 2, 2))
+    builder.kpoints = kpoints
+    builder.pseudos = {"Si": OTFGData.get_or_create("C19")[0]}
+    builder.code = load_code(code)
+    builder.metadata.options.resources = {"num_machines": 1, "tot_num_mpiprocs": 1}
+    return builder
+
+
+def main():
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--code", required=True, help="Label of the CASTEP code")
+    parser.add_argument("--supercell", type=int, default=2)
+    parser.add_argument("--nkpts", type=int, default=0, help="Explicit kpoints")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    builder = get_builder(args.code, args.supercell, args.nkpts)
+    natoms = len(builder.structure.sites)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        submit_test(builder)
+        timings.append(time.perf_counter() - start)
+
+    print(f"Number of atoms: {natoms}")
+    print(f"Number of submissions: {args.repeat}")
+    print(f"Mean time per submission: {mean(timings) * 1000:.1f} ms")
+    print(f"Median time per submission: {median(timings) * 1000:.1f} ms")
+    print(f"Fastest submission: {min(timings) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -357,7 +357,9 @@ def generate_calc_job_node(db_test_app):
                 if content is None:
                     retrieved.delete_object(key)
                     continue
-                buf = BytesIO(content.encode())
+                if isinstance(content, str):
+                    content = content.encode()
+                buf = BytesIO(content)
                 retrieved.put_object_from_filelike(buf, key)
 
         retrieved.add_incoming(node, link_type=LinkType.CREATE, link_label="retrieved")
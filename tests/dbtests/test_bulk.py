@@ -0,0 +1,141 @@
+"""
+Tests for building and submitting calculations in bulk
+"""
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from aiida_castep.utils.bulk import BulkBuilderFactory
+
+from ..utils import get_sto_structure
+
+
+@pytest.fixture
+def sto_structures():
+    """A few STO structures with different lattice constants"""
+    structures = []
+    for scale in (1.0, 1.01, 2.0):
+        structure = get_sto_structure()
+        structure.reset_cell([[x * scale for x in row] for row in structure.cell])
+        structure.label = f"STO-{scale}"
+        structures.append(structure)
+    return structures
+
+
+def test_bulk_calculations(db_test_app, create_otfg_group, sto_structures, monkeypatch):
+    """Test building CastepCalculations sharing the same input nodes"""
+    from aiida_castep.calculations.castep import (
+        CastepCalculation,
+        submit_test,
+    )
+    from aiida_castep.data import get_pseudos_from_structure
+
+    create_otfg_group(["C9"], "C9")
+    calls = []
+
+    def _get_pseudos(structure, family):
+        calls.append(structure.label)
+        return get_pseudos_from_structure(structure, family)
+
+    monkeypatch.setattr("aiida_castep.data.get_pseudos_from_structure", _get_pseudos)
+
+    factory = BulkBuilderFactory(
+        CastepCalculation,
+        db_test_app.code_echo,
+        {"PARAM": {"task": "singlepoint"}, "CELL": {}},
+        pseudos_family="C9",
+        kpoints_spacing=0.05,
+        options={"resources": {"num_machines": 1, "num_mpiprocs_per_machine": 1}},
+    )
+    builders = list(factory.iter_builders(sto_structures))
+    assert [builder.metadata.label for builder in builders] == [
+        "STO-1.0",
+        "STO-1.01",
+        "STO-2.0",
+    ]
+    # The family is only looked up once for the same kinds
+    assert calls == ["STO-1.0"]
+    assert all(builder.parameters.pk == factory.parameters.pk for builder in builders)
+    # Structures with the same mesh share the kpoints node
+    assert builders[0].kpoints.pk == builders[1].kpoints.pk
+    assert builders[0].kpoints.pk != builders[2].kpoints.pk
+    assert builders[2].kpoints.get_kpoints_mesh()[0] == [3, 3, 3]
+
+    _, folder = submit_test(builders[0])
+    assert (Path(folder) / "aiida.cell").is_file()
+
+
+def test_bulk_workchains(db_test_app, create_otfg_group, sto_structures):
+    """Test building and submitting workchains sharing the same input nodes"""
+    from aiida_castep.workflows.base import CastepBaseWorkChain
+
+    create_otfg_group(["C9"], "C9")
+    factory = BulkBuilderFactory(
+        CastepBaseWorkChain,
+        db_test_app.code_echo,
+        {"task": "singlepoint", "cut_off_energy": 300},
+        pseudos_family="C9",
+        kpoints_spacing=0.05,
+        options={"resources": {"num_machines": 1}},
+        extra_inputs={"max_iterations": 3},
+    )
+    submitted = []
+
+    def _submit(builder):
+        submitted.append(builder)
+        return SimpleNamespace(is_terminated=True)
+
+    nodes = factory.submit_all(
+        [("first", sto_structures[0]), ("second", sto_structures[1])],
+        max_active=1,
+        poll_interval=0,
+        submit_fn=_submit,
+    )
+    assert len(nodes) == 2
+    first, second = submitted
+    assert first.metadata.label == "first"
+    assert first.calc.parameters.pk == second.calc.parameters.pk
+    assert first.calc_options.pk == second.calc_options.pk
+    assert first.kpoints_spacing.pk == second.kpoints_spacing.pk
+    assert first.calc.pseudos["Sr"].pk == second.calc.pseudos["Sr"].pk
+    assert first.max_iterations == 3
+
+    with pytest.raises(ValueError):
+        BulkBuilderFactory(CastepBaseWorkChain, db_test_app.code_echo, {}, kpoints=None)
+
+
+def test_explicit_pseudos(db_test_app):
+    """Test looking up explicitly given pseudopotentials for each kind"""
+    from aiida.common.exceptions import NotExistent
+    from aiida.orm import StructureData
+
+    from aiida_castep.calculations.castep import CastepCalculation
+
+    structure = StructureData(cell=[[3, 0, 0], [0, 3, 0], [0, 0, 3]])
+    structure.append_atom(position=(0, 0, 0), symbols="Sr")
+    structure.append_atom(position=(1, 1, 1), symbols="Ti", name="Ti1")
+    structure.append_atom(
+        position=(2, 2, 2), symbols=["Ti", "Zr"], weights=[0.5, 0.5], name="TiZr"
+    )
+
+    factory = BulkBuilderFactory(
+        CastepCalculation,
+        db_test_app.code_echo,
+        {"task": "singlepoint"},
+        pseudos={"Sr": "Sr_00", "Ti": "Ti_00", "TiZr": "TiZr_00"},
+        kpoints_spacing=0.05,
+    )
+    assert factory.get_pseudos(structure) == {
+        "Sr": "Sr_00",
+        "Ti1": "Ti_00",
+        "TiZr": "TiZr_00",
+    }
+
+    # Mixtures are only looked up by their names
+    factory.pseudos = {"Sr": "Sr_00", "Ti": "Ti_00"}
+    with pytest.raises(NotExistent, match="TiZr"):
+        factory.get_pseudos(structure)
+    factory.pseudos = {"Sr": "Sr_00", "TiZr": "TiZr_00"}
+    with pytest.raises(NotExistent, match="kind\\(s\\): Ti1$"):
+        factory.get_pseudos(structure)
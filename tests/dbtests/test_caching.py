@@ -0,0 +1,127 @@
+"""
+Tests for the normalised hashing of CastepCalculation
+"""
+from tempfile import mkdtemp
+
+import pytest
+from aiida.orm import Dict
+
+from aiida_castep.calculations.caching import (
+    get_cache_report,
+    get_caching,
+    rehash_calculations,
+)
+from aiida_castep.common import INPUT_LINKNAMES
+
+
+@pytest.fixture
+def generate_finished_calc(sto_calc_inputs, generate_calc_job_node):
+    """Generate a finished calculation with the parameters given"""
+    from aiida.engine import ProcessState
+
+    def _generate(param_dict):
+        inputs = dict(sto_calc_inputs)
+        inputs[INPUT_LINKNAMES["parameters"]] = Dict(dict=param_dict)
+        node = generate_calc_job_node(
+            "castep.castep", results_folder=mkdtemp(), inputs=inputs
+        )
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(0)
+        node.seal()
+        rehash_calculations([node])
+        return node
+
+    return _generate
+
+
+def test_normalised_hash(generate_finished_calc):
+    """Test the trivial differences are ignored by the hash"""
+    cell = {"symmetry_generate": True}
+    node = generate_finished_calc({"PARAM": {"task": "singlepoint"}, "CELL": cell})
+    # The run_time is the one derived from the max_wallclock_seconds of 1800
+    same = generate_finished_calc(
+        {
+            "PARAM": {"TASK": "SinglePoint", "comment": "label", "run_time": 1680},
+            "CELL": cell,
+        },
+    )
+    explicit = generate_finished_calc(
+        {"PARAM": {"task": "singlepoint", "run_time": 1700}, "CELL": cell}
+    )
+    different = generate_finished_calc(
+        {"PARAM": {"task": "singlepoint", "cut_off_energy": 500}, "CELL": cell}
+    )
+    assert node.base.caching.get_hash() == same.base.caching.get_hash()
+    assert node.base.caching.get_hash() != different.base.caching.get_hash()
+    assert node.base.caching.get_hash() != explicit.base.caching.get_hash()
+
+    # The case of the file names is significant
+    reuse = generate_finished_calc(
+        {"PARAM": {"task": "singlepoint", "reuse": "Parent.check"}, "CELL": cell}
+    )
+    reuse_lower = generate_finished_calc(
+        {"PARAM": {"task": "singlepoint", "reuse": "parent.check"}, "CELL": cell}
+    )
+    assert reuse.base.caching.get_hash() != reuse_lower.base.caching.get_hash()
+
+    report = get_cache_report(node)
+    assert report["hash"] == node.base.caching.get_hash()
+    assert report["cached_from"] is None
+    assert report["hits"] == [same.pk]
+    assert report["misses"] == {
+        other.pk: ["inputs.parameters"]
+        for other in (explicit, different, reuse, reuse_lower)
+    }
+
+
+def test_launched_node(clear_database_before_test, sto_calc_inputs):
+    """Test that a launched calculation stores the normalised hash in a CalcJobNode"""
+    from aiida.engine import run_get_node
+    from aiida.orm import CalcJobNode, QueryBuilder, load_node
+
+    from aiida_castep.calculations.castep import CastepCalculation
+
+    _, node = run_get_node(CastepCalculation, **sto_calc_inputs)
+    node = load_node(node.pk)
+    assert type(node) is CalcJobNode  # pylint: disable=unidiomatic-typecheck
+    assert node.base.caching.get_hash() == get_caching(node).compute_hash()
+    assert node.base.caching.get_hash() != node.base.caching.compute_hash()
+
+    qbd = QueryBuilder().append(CalcJobNode, filters={"id": node.pk}, subclassing=False)
+    assert qbd.count() == 1
+
+    # The options not affecting the results are not hashed
+    sto_calc_inputs.metadata.options.header_verbosity = "none"
+    _, other = run_get_node(CastepCalculation, **sto_calc_inputs)
+    assert other.base.caching.get_hash() == node.base.caching.get_hash()
+
+
+def test_cache_report_cmd(generate_finished_calc):
+    """Test the commandline interface of the cache report"""
+    from click.testing import CliRunner
+
+    from aiida_castep.cmdline.cache_cmd import cache_report_cmd
+
+    node = generate_finished_calc({"PARAM": {"task": "singlepoint"}, "CELL": {}})
+    other = generate_finished_calc(
+        {"PARAM": {"task": "geometryoptimisation"}, "CELL": {}}
+    )
+    result = CliRunner().invoke(cache_report_cmd, [str(node.pk)])
+    assert result.exit_code == 0, result.output
+    assert f"{other.pk}  inputs.parameters" in result.output
+
+
+def test_cache_rehash_cmd(generate_finished_calc):
+    """Test rehashing the calculations stored with the hash of CalcJobNode"""
+    from click.testing import CliRunner
+
+    from aiida_castep.cmdline.cache_cmd import cache_rehash_cmd
+
+    node = generate_finished_calc({"PARAM": {"task": "singlepoint"}, "CELL": {}})
+    node.base.caching.rehash()
+    assert node.base.caching.get_hash() != get_caching(node).compute_hash()
+
+    result = CliRunner().invoke(cache_rehash_cmd, [str(node.pk)])
+    assert result.exit_code == 0, result.output
+    assert "Rehashed 1 calculations" in result.output
+    assert node.base.caching.get_hash() == get_caching(node).compute_hash()
@@ -1,6 +1,8 @@
 """
 Test input generation
 """
+from pathlib import Path
+
 import pytest
 from aiida.engine.processes.ports import PortNamespace
 
@@ -208,6 +210,25 @@ def test_submit_test(clear_database_before_test, sto_calc_inputs):
     assert "aiida.param" in fcontent
 
 
+def test_unknown_parser_options(clear_database_before_test, sto_calc_inputs):
+    """
+    Test that the options not understood by the parser are rejected
+    """
+    from aiida import orm
+    from aiida.common import InputValidationError
+
+    from aiida_castep.calculations.castep import CastepCalculation
+
+    builder = CastepCalculation.get_builder()
+    builder._update(sto_calc_inputs)
+    builder.settings = orm.Dict(dict={"PARSER_OPTIONS": {"parse_pdos_bin": True}})
+    CastepCalculation.submit_test(builder)
+
+    builder.settings = orm.Dict(dict={"PARSER_OPTIONS": {"parse_pdos": True}})
+    with pytest.raises(InputValidationError, match="parse_pdos"):
+        CastepCalculation.submit_test(builder)
+
+
 def test_submit_test_function(clear_database_before_test, sto_calc_inputs):
     """
     Test the ``submit_test`` method
@@ -241,6 +262,215 @@ def test_submit_test_function(clear_database_before_test, sto_calc_inputs):
     assert builder.metadata.get("store_provenance") is not False
 
 
+def test_single_pass_preparation(
+    clear_database_before_test, sto_calc_inputs, monkeypatch
+):
+    """
+    The input files should only be generated once per submission
+    """
+    from aiida.common.folders import Folder
+
+    from aiida_castep.calculations.castep import (
+        CastepCalculation,
+        submit_test,
+    )
+
+    ncalls = []
+    prepare_inputs = CastepCalculation.prepare_inputs
+
+    def _prepare_inputs(self, *args, **kwargs):
+        ncalls.append(1)
+        return prepare_inputs(self, *args, **kwargs)
+
+    monkeypatch.setattr(CastepCalculation, "prepare_inputs", _prepare_inputs)
+    res = submit_test(CastepCalculation, **sto_calc_inputs)
+    assert len(ncalls) == 1
+    folder = Folder(res[1])
+    with folder.open("aiida.cell") as fhandle:
+        content = fhandle.read()
+    assert content.count("%BLOCK POSITIONS_ABS") == 1
+    assert content.count("%BLOCK SPECIES_POT") == 1
+
+
+@pytest.mark.parametrize("verbosity", ["full", "minimal", "none"])
+def test_header_verbosity(clear_database_before_test, sto_calc_inputs, verbosity):
+    """
+    Test controlling the headers of the input files
+    """
+    from aiida.common.folders import Folder
+
+    from aiida_castep.calculations import castep
+
+    sto_calc_inputs.metadata.options.header_verbosity = verbosity
+    res = castep.submit_test(castep.CastepCalculation, **sto_calc_inputs)
+    with Folder(res[1]).open("aiida.cell") as fhandle:
+        content = fhandle.read()
+    assert ("AiiDA profile" in content) is (verbosity == "full")
+    assert ("END OF HEADER" in content) is (verbosity != "none")
+    if verbosity == "minimal":
+        assert f"# structure: {sto_calc_inputs.structure.uuid}" in content
+    else:
+        assert "# structure:" not in content
+    if verbosity == "full":
+        assert castep._PROFILE_HEADER_CACHE
+
+    sto_calc_inputs.metadata.options.header_verbosity = "foo"
+    with pytest.raises(ValueError):
+        castep.submit_test(castep.CastepCalculation, **sto_calc_inputs)
+
+
+def test_rendered_input_cache(clear_database_before_test, sto_calc_inputs, monkeypatch):
+    """
+    Test reusing the rendered inputs for identical stored input nodes
+    """
+    from aiida import orm
+    from aiida.common.folders import Folder
+
+    from aiida_castep.calculations.castep import (
+        CastepCalculation,
+        submit_test,
+    )
+    from aiida_castep.calculations.inpgen import (
+        clear_rendered_input_cache,
+    )
+
+    ncalls = []
+    render_inputs = CastepCalculation._render_inputs
+
+    def _render_inputs(self, *args, **kwargs):
+        ncalls.append(1)
+        return render_inputs(self, *args, **kwargs)
+
+    monkeypatch.setattr(CastepCalculation, "_render_inputs", _render_inputs)
+
+    def get_content():
+        res = submit_test(CastepCalculation, **sto_calc_inputs)
+        folder = Folder(res[1])
+        with folder.open("aiida.cell") as fhandle:
+            cell = fhandle.read()
+        with folder.open("aiida.param") as fhandle:
+            param = fhandle.read()
+        return cell, param
+
+    clear_rendered_input_cache()
+    sto_calc_inputs.metadata.options.header_verbosity = "none"
+    sto_calc_inputs.metadata.options.use_input_cache = True
+    # Unstored nodes are not cached
+    get_content()
+    get_content()
+    assert len(ncalls) == 2
+
+    for value in sto_calc_inputs.values():
+        if isinstance(value, orm.Node):
+            value.store()
+    for node in sto_calc_inputs.pseudos.values():
+        node.store()
+    first = get_content()
+    assert len(ncalls) == 3
+    assert get_content() == first
+    assert len(ncalls) == 3
+
+    # Different options are not reused
+    sto_calc_inputs.metadata.label = "foo"
+    assert get_content() != first
+    assert len(ncalls) == 4
+    sto_calc_inputs.metadata.options.parent_folder_name = "other"
+    get_content()
+    assert len(ncalls) == 5
+    clear_rendered_input_cache()
+
+
+def test_pseudo_cache_folder(gen_instance, sto_calc_inputs, tmp_path):
+    """
+    Test linking file based pseudopotentials from the remote cache folder
+    """
+    from aiida_castep.data.usp import UspData
+
+    usp_path = tmp_path / "Sr_00.usp"
+    usp_path.write_text("Bla Sr_00.usp")
+    usp = UspData.get_or_create(usp_path)[0]
+    sto_calc_inputs.pseudos.Sr = usp
+    gen_instance.inputs = sto_calc_inputs
+    gen_instance.prepare_inputs()
+    copied = (usp.uuid, "Sr_00.usp", "Sr_00.usp")
+    assert copied in gen_instance.local_copy_list_to_append
+    assert not gen_instance.remote_symlink_list_to_append
+
+    sto_calc_inputs.metadata.options.pseudo_cache_folder = "/scratch/pseudos"
+    gen_instance.prepare_inputs()
+    assert not gen_instance.local_copy_list_to_append
+    assert gen_instance.remote_symlink_list_to_append == {
+        (
+            sto_calc_inputs.code.computer.uuid,
+            f"/scratch/pseudos/{usp.md5sum}/Sr_00.usp",
+            "Sr_00.usp",
+        )
+    }
+    assert "Sr    Sr_00.usp" in gen_instance.cell_file["SPECIES_POT"]
+    assert gen_instance.get_linked_pseudos() == [usp]
+
+
+def test_pseudo_cache_staging(clear_database_before_test, sto_calc_inputs, tmp_path):
+    """
+    Test uploading the pseudopotentials missing in the cache folder on submission
+    """
+    from aiida.engine import run_get_node
+
+    from aiida_castep.calculations.castep import CastepCalculation
+    from aiida_castep.data.remote_cache import get_remote_pseudo_path
+    from aiida_castep.data.usp import UspData
+
+    usp_path = tmp_path / "Sr_00.usp"
+    usp_path.write_text("Bla Sr_00.usp")
+    usp = UspData.get_or_create(usp_path)[0]
+    sto_calc_inputs.pseudos.Sr = usp
+    cache_folder = str(tmp_path / "pseudo_cache")
+    sto_calc_inputs.metadata.options.pseudo_cache_folder = cache_folder
+
+    _, node = run_get_node(CastepCalculation, **sto_calc_inputs)
+    assert node.exit_status == 106  # No castep output found
+    remote_path = Path(get_remote_pseudo_path(cache_folder, usp))
+    assert remote_path.read_text() == "Bla Sr_00.usp"
+    workdir = Path(node.outputs.remote_folder.get_remote_path())
+    assert (workdir / "Sr_00.usp").resolve() == remote_path
+
+
+def test_batch_dryrun(clear_database_before_test, sto_calc_inputs, db_test_app):
+    """
+    Test running the dryruns concurrently with the mock CASTEP executable
+    """
+    import shutil
+    from pathlib import Path
+
+    from aiida_castep.calculations.castep import CastepCalculation
+
+    builders = []
+    for mesh in [(1, 1, 1), (2, 2, 2), (3, 3, 3)]:
+        builder = CastepCalculation.get_builder()
+        builder._update(sto_calc_inputs)
+        builder.kpoints = db_test_app.get_kpoints_mesh(mesh)
+        builder.metadata.label = "mesh-{}".format(mesh[0])
+        builders.append(builder)
+
+    table = CastepCalculation.batch_dryrun_test(
+        builders, castep_exe="castep.mock", max_workers=2, keep_folders=True
+    )
+    assert [row["label"] for row in table] == ["mesh-1", "mesh-2", "mesh-3"]
+    assert [row["num_kpoints"] for row in table] == [1, 8, 27]
+    assert all(row["error"] is None for row in table)
+    assert table[2]["memory_MB"] == 10.0 + 0.5 * 5 * 27
+    for row in table:
+        assert Path(row["folder"]).is_dir()
+        shutil.rmtree(row["folder"])
+
+    table = CastepCalculation.batch_dryrun_test(
+        builders[:1], castep_exe="castep.not_exist"
+    )
+    assert table[0]["num_kpoints"] is None
+    assert "not found" in table[0]["error"]
+    assert "folder" not in table[0]
+
+
 def test_param_validation(db_test_app):
     """Test input validations"""
     from aiida_castep.calculations.castep import CastepCalculation
@@ -324,3 +554,165 @@ def test_using_aiida_pseudo(gen_instance, sto_calc_inputs, dojo_pseudo):
     sto_calc_inputs.pseudos = pps
     gen_instance.inputs = sto_calc_inputs
     gen_instance.prepare_inputs()
+
+
+def test_farm_submission(clear_database_before_test, sto_calc_inputs, db_test_app):
+    """
+    Test preparing a farm of calculations in a single job
+    """
+    import subprocess
+    from pathlib import Path
+
+    from aiida.orm import InstalledCode
+
+    from aiida_castep.calculations.castep import submit_test
+    from aiida_castep.calculations.farm import CastepFarmCalculation
+
+    members = {}
+    for mesh in (1, 2, 3):
+        members[f"mesh_{mesh}"] = {
+            "structure": sto_calc_inputs.structure,
+            "parameters": sto_calc_inputs.parameters,
+            "pseudos": sto_calc_inputs.pseudos,
+            "kpoints": db_test_app.get_kpoints_mesh((mesh, mesh, mesh)),
+        }
+    builder = CastepFarmCalculation.get_builder()
+    builder.code = sto_calc_inputs.code
+    builder.driver_code = InstalledCode(
+        computer=db_test_app.localhost, filepath_executable="/bin/bash"
+    ).store()
+    builder.members = members
+    builder.metadata.options.resources = {
+        "num_machines": 1,
+        "num_mpiprocs_per_machine": 4,
+    }
+    builder.metadata.options.farm_withmpi = False
+    builder.metadata.options.farm_max_concurrent = 2
+    builder.metadata.options.append_text = "echo finished"
+
+    node, folder = submit_test(builder)
+    folder = Path(folder)
+    for mesh in (1, 2, 3):
+        cell = (folder / f"mesh_{mesh}" / "aiida.cell").read_text()
+        assert f": {mesh} {mesh} {mesh}" in cell
+        assert (folder / f"mesh_{mesh}" / "aiida.param").is_file()
+
+    driver = (folder / "farm.sh").read_text()
+    assert "MAX_CONCURRENT=2" in driver
+    # The driver runs before the append text
+    script = (folder / "_aiidasubmit.sh").read_text()
+    assert "'/bin/bash' 'farm.sh'" in script
+    assert script.index("farm.sh") < script.index("echo finished")
+    retrieve_list = node.get_retrieve_list()
+    assert ("mesh_1/aiida.castep", ".", 2) in [tuple(item) for item in retrieve_list]
+
+    # The echo code stands in for CASTEP
+    subprocess.run(["bash", "farm.sh"], cwd=str(folder), check=True)
+    log = sorted((folder / "farm.log").read_text().splitlines())
+    assert log == ["mesh_1 0", "mesh_2 0", "mesh_3 0"]
+
+    # Missing inputs are caught by the validator
+    with pytest.raises(ValueError, match="Missing input"):
+        builder.members = {"bad": {"structure": sto_calc_inputs.structure}}
+
+
+def test_farm_mpi_cmdline(clear_database_before_test, sto_calc_inputs, db_test_app):
+    """
+    Test the placeholders of the mpirun command for the runs of a farm
+    """
+    from pathlib import Path
+
+    from aiida.orm import InstalledCode
+
+    from aiida_castep.calculations.castep import submit_test
+    from aiida_castep.calculations.farm import CastepFarmCalculation
+
+    builder = CastepFarmCalculation.get_builder()
+    builder.code = sto_calc_inputs.code
+    builder.driver_code = InstalledCode(
+        computer=db_test_app.localhost, filepath_executable="/bin/bash"
+    ).store()
+    builder.members = {
+        "run": {
+            "structure": sto_calc_inputs.structure,
+            "parameters": sto_calc_inputs.parameters,
+            "pseudos": sto_calc_inputs.pseudos,
+            "kpoints": sto_calc_inputs.kpoints,
+        }
+    }
+    builder.metadata.options.resources = {
+        "num_machines": 1,
+        "num_mpiprocs_per_machine": 4,
+    }
+    builder.metadata.options.farm_max_concurrent = 2
+
+    computer = db_test_app.localhost
+    mpirun_command = computer.get_mpirun_command()
+    computer.set_mpirun_command(
+        [
+            "mpirun",
+            "-np",
+            "{tot_num_mpiprocs}",
+            "--machines",
+            "{num_machines}",
+            "--per-machine",
+            "{num_mpiprocs_per_machine}",
+            "--cores",
+            "{num_cores_per_mpiproc}",
+        ]
+    )
+    try:
+        _, folder = submit_test(builder)
+    finally:
+        computer.set_mpirun_command(mpirun_command)
+    driver = (Path(folder) / "farm.sh").read_text()
+    assert "(mpirun -np 2 --machines 1 --per-machine 4 --cores None " in driver
+
+
+def test_parent_checkpoint(clear_database_before_test, sto_calc_inputs, db_test_app):
+    """
+    Test restarting from a local checkpoint instead of the remote folder
+    """
+    import io
+    from pathlib import Path
+
+    from aiida.common import InputValidationError
+    from aiida.orm import FolderData, SinglefileData
+
+    from aiida_castep.calculations.castep import submit_test
+    from aiida_castep.calculations.tools import create_restart
+
+    retrieved = FolderData()
+    retrieved.put_object_from_filelike(io.BytesIO(b"density"), "aiida.castep_bin")
+    retrieved.put_object_from_filelike(io.BytesIO(b"wavefunctions"), "aiida.check")
+    retrieved.store()
+
+    builder = create_restart(
+        sto_calc_inputs, reuse=True, parent_checkpoint=retrieved, use_castep_bin="auto"
+    )
+    assert builder.parameters.get_dict()["PARAM"]["reuse"] == "parent/aiida.castep_bin"
+    builder.metadata.options.retrieve_checkpoint = "castep_bin"
+    node, folder = submit_test(builder)
+    assert (Path(folder) / "parent" / "aiida.castep_bin").read_text() == "density"
+    assert "aiida.castep_bin" in node.get_retrieve_list()
+
+    builder = create_restart(
+        sto_calc_inputs, restart_mode="continuation", parent_checkpoint=retrieved
+    )
+    assert (
+        builder.parameters.get_dict()["PARAM"]["continuation"] == "parent/aiida.check"
+    )
+    _, folder = submit_test(builder)
+    assert (Path(folder) / "parent" / "aiida.check").read_text() == "wavefunctions"
+
+    # A castep_bin file cannot be used in place of a check file
+    builder.parent_checkpoint = SinglefileData(
+        io.BytesIO(b"density"), filename="aiida.castep_bin"
+    )
+    with pytest.raises(InputValidationError, match="not a check file"):
+        submit_test(builder)
+
+    builder.parent_checkpoint = retrieved
+    builder.parent_calc_folder = db_test_app.remotedata
+    with pytest.raises(InputValidationError, match="cannot be used together"):
+        submit_test(builder)
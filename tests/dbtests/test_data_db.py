@@ -283,3 +283,30 @@ def test_usp_element_validation(clear_database_before_test, usp_folder):
     pp, _ = usp.UspData.get_or_create(fpath, store_usp=False)
     pp.set_element("Ti")
     pp.store()
+
+
+def test_stage_pseudos(clear_database_before_test, db_test_app, usp_folder, tmp_path):
+    """Test staging pseudopotentials to the remote cache folder"""
+    from aiida_castep.data.remote_cache import (
+        get_remote_pseudo_path,
+        stage_pseudos,
+    )
+    from aiida_castep.data.usp import UspData
+
+    nodes = [
+        UspData.get_or_create(usp_folder / name)[0]
+        for name in ["Sr_00.usp", "Ti-00.usp"]
+    ]
+    cache_folder = str(tmp_path / "pseudo_cache")
+    uploaded = stage_pseudos(db_test_app.localhost, nodes + nodes, cache_folder)
+    assert len(uploaded) == 2
+    for node in nodes:
+        path = get_remote_pseudo_path(cache_folder, node)
+        assert path.startswith(cache_folder + "/" + node.md5sum)
+        with open(path) as fhandle:
+            assert fhandle.read() == node.get_content()
+
+    # Files are only uploaded once
+    assert stage_pseudos(db_test_app.localhost, nodes, cache_folder) == []
+    with pytest.raises(ValueError):
+        stage_pseudos(db_test_app.localhost, nodes, "pseudo_cache")
@@ -4,6 +4,7 @@ Check if various AiiDA types are created correctly.
 """
 from io import BytesIO, StringIO
 
+import numpy as np
 import pytest
 from aiida.orm import StructureData
 from ase.build import bulk
@@ -255,6 +256,64 @@ def test_bands_from_castepbin(
     )
 
 
+def test_pdos_from_pdosbin(
+    db_test_app, generate_parser, generate_calc_job_node, sto_calc_inputs, tmp_path
+):
+    """
+    Test that the orbital weights are parsed from the pdos_bin file when requested
+    """
+    import numpy as np
+    from aiida.orm import Dict
+    from scipy.io import FortranFile
+
+    nk, ns, nb, norb = 2, 1, 8, 4
+    weights = np.random.default_rng(0).random((ns, nk, nb, norb))
+    fname = tmp_path / "aiida.pdos_bin"
+    with FortranFile(fname, mode="w", header_dtype=np.dtype(">u4")) as fhandle:
+        fhandle.write_record(np.array([1.0], dtype=">f8"))
+        fhandle.write_record(np.array(["CASTEP pdos_bin".ljust(80)], dtype="S80"))
+        for value in (nk, ns, norb, nb):
+            fhandle.write_record(np.array([value], dtype=">i4"))
+        fhandle.write_record(np.array([1, 1, 1, 1], dtype=">i4"))
+        fhandle.write_record(np.array([1, 1, 1, 1], dtype=">i4"))
+        fhandle.write_record(np.array([0, 1, 1, 1], dtype=">i4"))
+        # Write the kpoints in the reversed order
+        for ik in (1, 0):
+            fhandle.write_record(
+                np.array([ik + 1], dtype=">i4"), np.full(3, ik * 0.25, dtype=">f8")
+            )
+            fhandle.write_record(np.array([1], dtype=">i4"))
+            fhandle.write_record(np.array([nb], dtype=">i4"))
+            for ib in range(nb):
+                fhandle.write_record(weights[0, ik, ib].astype(">f8"))
+
+    inputs = sto_calc_inputs
+    inputs.structure = StructureData(ase=bulk("Si2", "zincblende", a=4.0)).store()
+    override = {"aiida.pdos_bin": fname.read_bytes()}
+    parser = generate_parser("castep.castep")
+
+    # Not parsed unless requested
+    node = generate_calc_job_node(
+        "castep.castep", "Si2-castepbin", inputs, outfile_override=override
+    )
+    out, calcfunc = parser.parse_from_node(node, store_provenance=False)
+    assert calcfunc.exit_status == 0
+    assert ln_name["pdos"] not in out
+
+    inputs.settings = Dict(dict={"PARSER_OPTIONS": {"parse_pdos_bin": True}})
+    node = generate_calc_job_node(
+        "castep.castep", "Si2-castepbin", inputs, outfile_override=override
+    )
+    out, calcfunc = parser.parse_from_node(node, store_provenance=False)
+    assert calcfunc.exit_status == 0
+
+    pdos = out[ln_name["pdos"]]
+    assert pdos.get_array("weights").shape == (ns, nk, nb, norb)
+    np.testing.assert_allclose(pdos.get_array("weights"), weights)
+    np.testing.assert_allclose(pdos.get_array("kpoints")[:, 0], [0.0, 0.25])
+    assert list(pdos.get_array("am_channel")) == [0, 1, 1, 1]
+
+
 def test_check_occ(
     db_test_app, generate_parser, data_path, generate_calc_job_node, sto_calc_inputs
 ):
@@ -274,5 +333,73 @@ def test_check_occ(
     parser = generate_parser("castep.castep")
     node = generate_calc_job_node("castep.castep", output_folder, inputs)
 
-    _, parsed = parser.parse_from_node(node, store_provenance=False)
+    results, parsed = parser.parse_from_node(node, store_provenance=False)
     assert parsed.exit_status == 501
+    out_params = results["output_parameters"].get_dict()
+    # Highest band occupations are 0.249, 0.0278, 0.00846 and 0.000418
+    assert out_params["no_empty_bands_kpoints"] == [0, 1, 2]
+
+    # Same as checking each spin and kpoint in turn
+    _, occ = results["output_bands"].get_bands(also_occupations=True)
+    occ = np.reshape(occ, (-1,) + occ.shape[-2:])
+    expected = set()
+    for ispin in range(occ.shape[0]):
+        for ikpt in range(occ.shape[1]):
+            if occ[ispin, ikpt, -1] >= 0.005:
+                expected.add(ikpt)
+    assert out_params["no_empty_bands_kpoints"] == sorted(expected)
+
+
+def test_parsing_farm(
+    clear_database_before_test,
+    db_test_app,
+    generate_parser,
+    h2_calc_inputs,
+):
+    """
+    Test parsing the runs of a farm, one of which has failed
+    """
+    from pathlib import Path
+
+    from aiida.common.links import LinkType
+    from aiida.orm import CalcJobNode, FolderData
+
+    node = CalcJobNode(
+        computer=db_test_app.localhost, process_type="aiida.calculations:castep.farm"
+    )
+    for label in ("h2", "h2_failed"):
+        for name in ("structure", "parameters", "kpoints"):
+            value = h2_calc_inputs[name]
+            if not value.is_stored:
+                value.store()
+            node.base.links.add_incoming(
+                value,
+                link_type=LinkType.INPUT_CALC,
+                link_label=f"members__{label}__{name}",
+            )
+    node.set_option("resources", {"num_machines": 1, "num_mpiprocs_per_machine": 1})
+    node.set_option("seedname", "aiida")
+    node.store()
+
+    retrieved = FolderData()
+    data_folder = Path(__file__).parent.parent / "data" / "H2-geom"
+    with open(data_folder / "aiida.castep", "rb") as fhandle:
+        retrieved.put_object_from_filelike(fhandle, "h2/aiida.castep")
+    retrieved.put_object_from_filelike(BytesIO(b"h2 0\nh2_failed 1\n"), "farm.log")
+    retrieved.base.links.add_incoming(
+        node, link_type=LinkType.CREATE, link_label="retrieved"
+    )
+    retrieved.store()
+
+    parser = generate_parser("castep.farm")
+    results, return_node = parser.parse_from_node(node, store_provenance=False)
+    assert return_node.exit_status == 110
+    summary = results["output_parameters"].get_dict()
+    assert summary["failed"] == ["h2_failed"]
+    assert summary["exit_status"]["h2"] == 0
+    assert summary["exit_status"]["h2_failed"] == CODES["ERROR_NO_OUTPUT_FILE"][0]
+    assert summary["return_codes"] == {"h2": 0, "h2_failed": 1}
+
+    member_outputs = results["members"]["h2"]
+    assert member_outputs["output_parameters"]["total_energy"] == -31.69654969917
+    assert "output_array" in member_outputs
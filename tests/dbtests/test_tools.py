@@ -1,6 +1,7 @@
 """
 Tests for calculation module
 """
+
 import pytest
 
 from aiida_castep.common import INPUT_LINKNAMES, OUTPUT_LINKNAMES
@@ -145,3 +146,279 @@ def test_create_restart_node(calcjobnode):
         new_builder[INPUT_LINKNAMES["structure"]].uuid
         == calcjobnode.outputs.__getattr__(OUTPUT_LINKNAMES["structure"]).uuid
     )
+
+
+def test_parallel_history(h2_calc_inputs, generate_calc_job_node):
+    """Test querying the parallel efficiencies of the previous calculations"""
+    from aiida.orm import Dict, InstalledCode
+
+    from aiida_castep.utils.planner import get_parallel_history
+
+    results = {
+        "parallel_procs": 8,
+        "parallel_efficiency": 80.0,
+        "total_time": 100.0,
+        "n_kpoints": "2",
+    }
+    node = generate_calc_job_node(
+        "castep.castep",
+        "H2-geom",
+        inputs=h2_calc_inputs,
+        outputs={OUTPUT_LINKNAMES["results"]: Dict(dict=results)},
+    )
+    node.set_exit_status(0)
+
+    history = get_parallel_history(code=h2_calc_inputs["code"])
+    assert history == [results]
+    assert get_parallel_history()[0] == results
+
+    # Filter by the task and the number of atoms
+    code = h2_calc_inputs["code"]
+    history = get_parallel_history(code, task="GeometryOptimisation", num_atoms=3)
+    assert history == [results]
+    assert get_parallel_history(code, task="singlepoint") == []
+    assert get_parallel_history(code, num_atoms=8) == []
+
+    # Calculations using the new code classes are also found
+    installed = InstalledCode(
+        computer=code.computer, filepath_executable="/bin/castep.mpi"
+    ).store()
+    node = generate_calc_job_node(
+        "castep.castep",
+        "H2-geom",
+        inputs={**h2_calc_inputs, "code": installed},
+        outputs={OUTPUT_LINKNAMES["results"]: Dict(dict=results)},
+    )
+    node.set_exit_status(0)
+    assert get_parallel_history(installed) == [results]
+
+
+def test_dryrun_results(h2_calc_inputs, generate_calc_job_node):
+    """Test reading the results of a dryrun from the retrieved folder"""
+    from aiida_castep.calculations.dryrun import get_dryrun_results
+
+    output = (
+        "                       k-Points For SCF Sampling:         4\n"
+        "| Approx. total storage required per process      42.5 MB       1.2 MB    |\n"
+    )
+    node = generate_calc_job_node(
+        "castep.castep",
+        "H2-geom",
+        inputs=h2_calc_inputs,
+        outfile_override={"aiida.castep": output},
+    )
+    assert get_dryrun_results(node) == {
+        "num_kpoints": 4,
+        "memory_MB": 42.5,
+        "disk_MB": 1.2,
+    }
+
+    node = generate_calc_job_node(
+        "castep.castep",
+        "H2-geom",
+        inputs=h2_calc_inputs,
+        outfile_override={"aiida.castep": None},
+    )
+    assert get_dryrun_results(node) == {}
+
+
+def test_input_fingerprint(sto_calc_inputs, generate_calc_job_node):
+    """Test the canonical fingerprint of the inputs"""
+    from tempfile import mkdtemp
+
+    from aiida.orm import Dict
+
+    from aiida_castep.calculations.tools import (
+        FINGERPRINT_EXTRA,
+        canonical_inputs,
+        diff_canonical_inputs,
+        find_by_fingerprint,
+        get_input_fingerprint,
+        group_by_fingerprint,
+    )
+
+    reference = get_input_fingerprint(sto_calc_inputs)
+    param = sto_calc_inputs[INPUT_LINKNAMES["parameters"]].get_dict()
+
+    # Key case and comments do not matter
+    inputs = dict(sto_calc_inputs)
+    inputs[INPUT_LINKNAMES["parameters"]] = Dict(
+        dict={
+            "PARAM": dict(
+                {key.upper(): value for key, value in param["PARAM"].items()},
+                comment="some comment",
+            ),
+            "CELL": param["CELL"],
+        }
+    )
+    assert get_input_fingerprint(inputs) == reference
+
+    # Small displacements within the tolerance do not matter
+    structure = sto_calc_inputs[INPUT_LINKNAMES["structure"]].clone()
+    structure.reset_cell([[x + 1e-8 for x in row] for row in structure.cell])
+    inputs = dict(sto_calc_inputs)
+    inputs[INPUT_LINKNAMES["structure"]] = structure
+    assert get_input_fingerprint(inputs) == reference
+
+    # But the parameters do
+    inputs = dict(sto_calc_inputs)
+    inputs[INPUT_LINKNAMES["parameters"]] = Dict(
+        dict={"PARAM": dict(param["PARAM"], cut_off_energy=800), "CELL": param["CELL"]}
+    )
+    changed = get_input_fingerprint(inputs)
+    assert changed != reference
+    diff = diff_canonical_inputs(
+        canonical_inputs(sto_calc_inputs), canonical_inputs(inputs)
+    )
+    assert list(diff) == ["parameters.PARAM.cut_off_energy"]
+
+    nodes = [
+        generate_calc_job_node(
+            entry_point_name="castep.castep",
+            results_folder=mkdtemp(),
+            inputs=calc_inputs,
+        )
+        for calc_inputs in (sto_calc_inputs, sto_calc_inputs, inputs)
+    ]
+    groups = group_by_fingerprint(nodes)
+    assert [len(value) for value in groups.values()] == [2, 1]
+    # The fingerprints are saved as extras
+    fingerprint = nodes[0].base.extras.get(FINGERPRINT_EXTRA)
+    assert fingerprint in groups
+    assert {node.pk for node in find_by_fingerprint(fingerprint)} == {
+        nodes[0].pk,
+        nodes[1].pk,
+    }
+
+    assert nodes[0].tools.compare_with(nodes[1], canonical=True) == {}
+    diff = nodes[0].tools.compare_with(nodes[2], canonical=True)
+    assert list(diff) == ["parameters.PARAM.cut_off_energy"]
+
+
+def test_check_restarts(sto_calc_inputs, db_test_app, tmp_path, monkeypatch):
+    """Test checking the restart files of many builders with a single transport"""
+    from aiida.orm import AuthInfo, Dict, RemoteData
+
+    from aiida_castep.calculations.tools import check_restarts
+
+    remote_folders = []
+    for name in ("with_check", "without_check"):
+        folder = tmp_path / name
+        folder.mkdir()
+        remote = RemoteData(computer=db_test_app.localhost, remote_path=str(folder))
+        remote_folders.append(remote.store())
+    (tmp_path / "with_check" / "aiida.check").write_text("check")
+    missing = RemoteData(
+        computer=db_test_app.localhost, remote_path=str(tmp_path / "missing")
+    ).store()
+
+    def _get_builder(parent_folder, **kwargs):
+        param = sto_calc_inputs[INPUT_LINKNAMES["parameters"]].get_dict()
+        builder = dict(sto_calc_inputs)
+        builder[INPUT_LINKNAMES["parameters"]] = Dict(
+            dict={"PARAM": dict(param["PARAM"], **kwargs), "CELL": param["CELL"]}
+        )
+        if parent_folder is not None:
+            builder[INPUT_LINKNAMES["parent_calc_folder"]] = parent_folder
+        return builder
+
+    builders = [
+        _get_builder(remote, continuation="parent/aiida.check")
+        for remote in remote_folders + [missing, None]
+    ]
+    builders.append(_get_builder(None))
+
+    transports = []
+    get_transport = AuthInfo.get_transport
+
+    def _get_transport(self):
+        transports.append(self)
+        return get_transport(self)
+
+    monkeypatch.setattr(AuthInfo, "get_transport", _get_transport)
+    results = check_restarts(builders)
+    assert len(transports) == 1
+    assert [passed for passed, _ in results] == [True, False, False, False, True]
+    assert "not in the remote folder" in results[1][1]
+    assert "missing" in results[2][1]
+
+
+def test_restart_artifacts(sto_calc_inputs, db_test_app, tmp_path, monkeypatch):
+    """Test selecting the restart file from the parent folder"""
+    from aiida.orm import RemoteData
+
+    from aiida_castep.calculations.tools import (
+        create_restart,
+        get_restart_artifacts,
+        select_restart_suffix,
+    )
+
+    (tmp_path / "aiida.check").write_bytes(b"0" * 1000)
+    (tmp_path / "aiida.castep_bin").write_bytes(b"0" * 10)
+    remote = RemoteData(computer=db_test_app.localhost, remote_path=str(tmp_path))
+    remote.store()
+
+    artifacts = get_restart_artifacts(remote)
+    assert artifacts == {"check": 1000, "castep_bin": 10}
+    assert select_restart_suffix(artifacts, "reuse") == "castep_bin"
+    assert select_restart_suffix(artifacts, "continuation") == "check"
+    assert select_restart_suffix({"castep_bin": 10}, "continuation") is None
+
+    def _get_param(builder):
+        return builder[INPUT_LINKNAMES["parameters"]].get_dict()["PARAM"]
+
+    builder = create_restart(
+        sto_calc_inputs, reuse=True, parent_folder=remote, use_castep_bin="auto"
+    )
+    assert _get_param(builder)["reuse"] == "parent/aiida.castep_bin"
+    assert builder[INPUT_LINKNAMES["parent_calc_folder"]] == remote
+
+    # The check file is used by default
+    builder = create_restart(sto_calc_inputs, reuse=True, parent_folder=remote)
+    assert _get_param(builder)["reuse"] == "parent/aiida.check"
+
+    builder = create_restart(
+        sto_calc_inputs,
+        restart_mode="continuation",
+        parent_folder=remote,
+        use_castep_bin="auto",
+    )
+    assert _get_param(builder)["continuation"] == "parent/aiida.check"
+
+    # Fall back to the check file if the folder cannot be inspected
+    def _raise(*args, **kwargs):
+        raise ConnectionError("Computer unreachable")
+
+    monkeypatch.setattr(RemoteData, "get_authinfo", _raise)
+    builder = create_restart(
+        sto_calc_inputs, reuse=True, parent_folder=remote, use_castep_bin="auto"
+    )
+    assert _get_param(builder)["reuse"] == "parent/aiida.check"
+
+    # Other errors are not hidden by the fallback
+    def _raise_bug(*args, **kwargs):
+        raise TypeError("A bug")
+
+    monkeypatch.setattr(RemoteData, "get_authinfo", _raise_bug)
+    with pytest.raises(TypeError):
+        create_restart(
+            sto_calc_inputs, reuse=True, parent_folder=remote, use_castep_bin="auto"
+        )
+
+
+def test_restart_artifacts_async(db_test_app, tmp_path):
+    """Test listing the restart files through a transport queue"""
+    from aiida.engine.transports import TransportQueue
+    from aiida.orm import RemoteData
+
+    from aiida_castep.calculations.tools import get_restart_artifacts_async
+
+    (tmp_path / "aiida.check").write_bytes(b"0" * 1000)
+    remote = RemoteData(computer=db_test_app.localhost, remote_path=str(tmp_path))
+    remote.store()
+
+    queue = TransportQueue()
+    artifacts = queue.loop.run_until_complete(
+        get_restart_artifacts_async(remote, queue)
+    )
+    assert artifacts == {"check": 1000}
@@ -0,0 +1,27 @@
+"""
+Tests for the workchains
+"""
+from aiida.engine import run_get_node
+from aiida.orm import Dict, Int, RemoteData
+
+from aiida_castep.common import INPUT_LINKNAMES
+from aiida_castep.workflows.base import CastepBaseWorkChain
+
+
+def test_base_auto_restart_file(sto_calc_inputs, db_test_app, tmp_path):
+    """Test selecting the restart file in the reuse_folder by the base workchain"""
+    (tmp_path / "aiida.check").write_bytes(b"0" * 1000)
+    (tmp_path / "aiida.castep_bin").write_bytes(b"0" * 10)
+    remote = RemoteData(computer=db_test_app.localhost, remote_path=str(tmp_path))
+    remote.store()
+
+    inputs = {
+        "calc": dict(sto_calc_inputs),
+        "reuse_folder": remote,
+        "options": Dict(dict={"use_castep_bin": "auto"}),
+        "max_iterations": Int(1),
+    }
+    _, node = run_get_node(CastepBaseWorkChain, **inputs)
+    calc = node.called[0]
+    param = calc.inputs[INPUT_LINKNAMES["parameters"]].get_dict()["PARAM"]
+    assert param["reuse"] == "parent/aiida.castep_bin"
@@ -1,8 +1,23 @@
+import json
+import os
 import unittest
 
+import numpy as np
+import pytest
+
 from aiida_castep.calculations.helper import (
     CastepHelper,
     HelperCheckError,
+    HelpIndex,
+    LRUCache,
+    SuggestionIndex,
+    check_incompatible,
+    clear_helper_cache,
+    get_dict_hash,
+    get_helper,
+    incompatible_keys,
+    load_help_index,
+    save_help_index,
 )
 
 helper = CastepHelper()
@@ -110,5 +125,193 @@ class TestHelper(unittest.TestCase):
             self.helper.check_dict(flat, auto_fix=False, allow_flat=True)
 
 
+def test_shared_helper(tmp_path, monkeypatch):
+    """Test the helper shared in the process and its revalidation"""
+    clear_helper_cache()
+    helper = get_helper()
+    assert get_helper() is helper
+    if not no_info:
+        with pytest.raises(TypeError):
+            helper.help_dict["cut_off_energy"] = {}
+
+    # Use a help info file in the home folder
+    monkeypatch.setenv("HOME", str(tmp_path))
+    info = {
+        "foo_key": dict(
+            key_type="PARAM", key_level="Basic", value_type="String", help_short=""
+        ),
+        "_CASTEP_VERSION": "99.1",
+    }
+    path = tmp_path / ".castep_help_info_99.1.json"
+    path.write_text(json.dumps(info))
+    helper_99 = get_helper(99.1)
+    assert get_helper(99.1) is helper_99
+    assert "foo_key" in helper_99.help_dict
+
+    # Unrelated changes in the home folder do not invalidate the helper
+    (tmp_path / "other_file").write_text("foo")
+    os.utime(tmp_path, ns=(0, 0))
+    assert not helper_99.is_outdated()
+    assert get_helper(99.1) is helper_99
+
+    # Modification of the file should be picked up
+    info["bar_key"] = info.pop("foo_key")
+    path.write_text(json.dumps(info))
+    os.utime(path, ns=(0, 0))
+    new_helper = get_helper(99.1)
+    assert new_helper is not helper_99
+    assert "bar_key" in new_helper.help_dict
+    clear_helper_cache()
+
+
+def test_help_index(tmp_path):
+    """Test the compact index of the keywords"""
+    helper = get_helper()
+    if no_info:
+        pytest.skip("No helper info found")
+    index = helper.index
+    help_dict = helper.help_dict
+    assert len(index) == len(help_dict) - 1
+    for key, value in help_dict.items():
+        if key.startswith("_"):
+            continue
+        assert index.get_key_type(key) == value["key_type"]
+        assert index.get_value_type(key) == value["value_type"]
+        assert index.get_key_level(key) == value["key_level"]
+    assert index.get_key_type("foo_key") is None
+
+    # Round trip
+    assert HelpIndex(index.to_dict()).keys() == index.keys()
+
+    # A stale index file is ignored
+    path = tmp_path / "castep_help_info_1.0.json"
+    info = {
+        "foo_key": dict(key_type="CELL", key_level="Basic", value_type="String"),
+        "_CASTEP_VERSION": "1.0",
+    }
+    path.write_text(json.dumps(info))
+    index_path = save_help_index(str(path))
+    assert index_path.endswith("castep_help_index_1.0.json")
+    assert load_help_index(str(path)).get_key_type("foo_key") == "CELL"
+    # Edits keeping the size of the file are also detected
+    path.write_text(json.dumps(info).replace("CELL", "CEL2"))
+    os.utime(path, ns=(0, 0))
+    assert load_help_index(str(path)).get_key_type("foo_key") == "CEL2"
+
+
+def test_help_index_stat(tmp_path, monkeypatch):
+    """Test that the help info is only hashed if its size or modification time changed"""
+    from aiida_castep.calculations import helper as helper_module
+
+    path = tmp_path / "castep_help_info_1.0.json"
+    info = {
+        "foo_key": dict(key_type="CELL", key_level="Basic", value_type="String"),
+        "_CASTEP_VERSION": "1.0",
+    }
+    path.write_text(json.dumps(info))
+    index_path = save_help_index(str(path))
+    assert json.loads(open(index_path).read())["source_size"] == path.stat().st_size
+
+    hashed = []
+
+    def get_file_md5(fpath):
+        hashed.append(fpath)
+        return md5(fpath)
+
+    md5 = helper_module.get_file_md5
+    monkeypatch.setattr(helper_module, "get_file_md5", get_file_md5)
+    assert load_help_index(str(path)).get_key_type("foo_key") == "CELL"
+    assert not hashed
+
+    # Touching the file requires hashing, after which the index file is updated
+    os.utime(path, ns=(0, 0))
+    assert load_help_index(str(path)).get_key_type("foo_key") == "CELL"
+    assert hashed == [str(path)]
+    assert json.loads(open(index_path).read())["source_mtime"] == 0
+    clear_helper_cache()
+    assert load_help_index(str(path)).get_key_type("foo_key") == "CELL"
+    assert hashed == [str(path)]
+
+
+def test_check_incompatible():
+    """Test checking incompatible keys"""
+    assert check_incompatible({"cut_off_energy": 1}, incompatible_keys) is None
+    assert check_incompatible(
+        {"charge": 1, "nup": 1, "spin": 1}, incompatible_keys
+    ) == ("charge", "nup")
+    assert check_incompatible({"spin": 1, "ndown": 1, "nup": 1}, incompatible_keys) == (
+        "spin",
+        "nup",
+    )
+
+
+def test_suggestion_index():
+    """The suggestions should be the same as those from difflib"""
+    from difflib import get_close_matches
+
+    helper = get_helper()
+    if no_info:
+        pytest.skip("No helper info found")
+    keys = helper.index.keys()
+    index = SuggestionIndex(keys)
+    for word in [
+        "cut_of_energy",
+        "kpoints_mp_grdi",
+        "spin_polarized",
+        "xc_functionl",
+        "fix_al_cell",
+        "foo",
+        "",
+        "a" * 70,
+    ]:
+        assert index.get_close_matches(word) == get_close_matches(word, keys)
+    assert "cut_off_energy" in helper.get_suggestion("cut_of_energy")
+
+
+def test_check_dict_cache(caplog):
+    """Test caching the outcomes of check_dict"""
+    helper = get_helper()
+    if no_info:
+        pytest.skip("No helper info found")
+    clear_helper_cache()
+    helper = get_helper()
+    in_dict = {"PARAM": {"cut_off_energy": 300}, "kpoints_mp_grid": "1 1 1"}
+    out1 = helper.check_dict(in_dict)
+    out1["PARAM"]["task"] = "singlepoint"
+    out2 = helper.check_dict(in_dict)
+    assert out2 == {
+        "PARAM": {"cut_off_energy": 300},
+        "CELL": {"kpoints_mp_grid": "1 1 1"},
+    }
+    assert in_dict == {"PARAM": {"cut_off_energy": 300}, "kpoints_mp_grid": "1 1 1"}
+
+    # Errors are also cached
+    for _ in range(2):
+        with pytest.raises(HelperCheckError, match="not recognized"):
+            helper.check_dict({"cut_of_energy": 300})
+
+    # The warnings of the automatic fixes are emitted again
+    for _ in range(2):
+        caplog.clear()
+        helper.check_dict({"PARAM": {"kpoints_mp_grid": "1 1 1"}, "CELL": {}})
+        assert "Key kpoints_mp_grid moved to CELL" in caplog.text
+
+    # Dictionaries that cannot be serialised unambiguously are not cached
+    assert get_dict_hash({"PARAM": {"cut_off_energy": np.arange(2000)}}) is None
+    assert get_dict_hash({"PARAM": {"kpoints": (1, 1, 1)}}) is None
+    assert get_dict_hash({1: {}}) is None
+    assert get_dict_hash({"PARAM": {"spin": 1}}) != get_dict_hash(
+        {"PARAM": {"spin": 1.0}}
+    )
+
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -9,7 +9,9 @@ import pytest
 
 from aiida_castep.parsers.castep_bin import CastepbinFile
 from aiida_castep.parsers.constants import units
+from aiida_castep.parsers.pdos_bin import PdosbinFile
 from aiida_castep.parsers.raw_parser import (
+    SECTION_PARSERS,
     RawParser,
     parse_castep_text_output,
     parse_dot_bands,
@@ -132,6 +134,64 @@ class TestParsers(unittest.TestCase):
         self.assertTrue(trajectory_data["symm_pressure"])
         self.assertTrue(len(trajectory_data["symm_pressure"]) > 10)
 
+    def test_parser_scf_telemetry(self):
+        """Test parsing the SCF cycles from the output"""
+        with open(self.data_abs_str + "/Si-geom-stress/aiida.castep") as clines:
+            lines = clines.readlines()
+        _, trajectory_data, _ = parse_castep_text_output(lines, None)
+
+        nscf = len(trajectory_data["scf_cycles"])
+        self.assertEqual(nscf, 93)
+        self.assertEqual(len(trajectory_data["scf_energy_gain"]), nscf)
+        self.assertEqual(len(trajectory_data["scf_time"]), nscf)
+        self.assertEqual(trajectory_data["scf_cycles"][:2], [9, 5])
+        self.assertEqual(trajectory_data["scf_energy_gain"][0], -5.65404715e-07)
+        self.assertEqual(trajectory_data["scf_time"][:2], [0.42, 0.53])
+
+        # No SCF cycles
+        _, trajectory_data, _ = parse_castep_text_output(self.castep_lines[:50], None)
+        self.assertNotIn("scf_cycles", trajectory_data)
+
+    def test_parser_step_timing(self):
+        """Test the timing of the ionic steps"""
+        parsed_data, trajectory_data, _ = parse_castep_text_output(
+            self.castep_lines, None
+        )
+        self.assertEqual(
+            trajectory_data["step_wall_time"], [2.07, 3.54, 4.53, 1.57, 1.2]
+        )
+        self.assertEqual(trajectory_data["step_scf_cycles"], [6, 7, 9, 3, 2])
+        self.assertAlmostEqual(parsed_data["mean_step_time"], 2.582)
+        self.assertAlmostEqual(parsed_data["median_step_time"], 2.07)
+        self.assertAlmostEqual(parsed_data["scf_cycles_per_step"], 5.4)
+
+        with open(self.data_abs_str + "/N2-md/aiida.castep") as clines:
+            lines = clines.readlines()
+        parsed_data, trajectory_data, _ = parse_castep_text_output(lines, None)
+        self.assertEqual(len(trajectory_data["step_wall_time"]), 20)
+        self.assertEqual(
+            sum(trajectory_data["step_scf_cycles"]), sum(trajectory_data["scf_cycles"])
+        )
+
+    def test_section_registry(self):
+        """Test registering additional section parsers"""
+        registry = SECTION_PARSERS.copy()
+
+        @registry.register("Pseudo atomic calculation performed for", extent=3)
+        def _parse_pseudo_atom(box, context):
+            context["trajectory_data"]["pseudo_atom"].append(box[0].split()[-2])
+            return 2
+
+        parsed_data, trajectory_data, _ = parse_castep_text_output(
+            self.castep_lines, None, section_parsers=registry
+        )
+        self.assertNotIn(
+            "Pseudo atomic calculation performed for", SECTION_PARSERS.keywords
+        )
+        self.assertEqual(trajectory_data["pseudo_atom"], ["H"])
+        self.assertTrue(trajectory_data["cons_forces"])
+        self.assertEqual(parsed_data["total_time"], 14.53)
+
     def test_parser_popn(self):
         """Test parsing the population box from the output"""
         with open(self.data_abs_str + "/O2-geom-spin/aiida.castep") as clines:
@@ -165,3 +225,57 @@ def test_castep_bin_parser(data_abs_path):
 
     assert binfile.occupancies[0, 0, 0] == 1.0
     assert binfile.occupancies[0, 0, -1] == 0.0
+
+
+@pytest.fixture
+def pdos_bin_file(tmp_path):
+    """Write a synthetic pdos_bin file with the kpoints out of order"""
+    from scipy.io import FortranFile
+
+    rng = np.random.default_rng(42)
+    nk, ns, nb, norb = 3, 2, 5, 4
+    weights = rng.random((ns, nk, nb, norb))
+    kpoints = rng.random((nk, 3))
+    kidx = [1, 3, 2]
+    fname = tmp_path / "aiida.pdos_bin"
+    with FortranFile(fname, mode="w", header_dtype=np.dtype(">u4")) as fhandle:
+        fhandle.write_record(np.array([1.0], dtype=">f8"))
+        fhandle.write_record(np.array(["CASTEP pdos_bin".ljust(80)], dtype="S80"))
+        for value in (nk, ns, norb, nb):
+            fhandle.write_record(np.array([value], dtype=">i4"))
+        fhandle.write_record(np.array([1, 1, 2, 2], dtype=">i4"))
+        fhandle.write_record(np.array([1, 1, 1, 1], dtype=">i4"))
+        fhandle.write_record(np.array([0, 1, 0, 1], dtype=">i4"))
+        for ik in range(nk):
+            fhandle.write_record(
+                np.array([kidx[ik]], dtype=">i4"), kpoints[ik].astype(">f8")
+            )
+            for ispin in range(ns):
+                fhandle.write_record(np.array([ispin + 1], dtype=">i4"))
+                fhandle.write_record(np.array([nb], dtype=">i4"))
+                for ib in range(nb):
+                    fhandle.write_record(weights[ispin, ik, ib].astype(">f8"))
+    return fname, weights, kpoints
+
+
+def test_pdos_bin_parser(pdos_bin_file):
+    """Test the pdos_bin parser against the record-by-record reader"""
+    from castepxbin import read_pdos_bin
+
+    fname, weights, kpoints = pdos_bin_file
+    binfile = PdosbinFile(filename=str(fname))
+    assert binfile.weights.shape == (2, 3, 5, 4)
+    assert np.all(binfile.kpoints_indices == [0, 2, 1])
+    assert np.all(binfile.species == [1, 1, 2, 2])
+    assert np.all(binfile.am_channel == [0, 1, 0, 1])
+    np.testing.assert_allclose(binfile.weights, weights)
+    np.testing.assert_allclose(binfile.kpoints, kpoints)
+
+    reference = read_pdos_bin(str(fname))
+    np.testing.assert_allclose(
+        binfile.weights, reference["pdos_weights"].transpose(3, 2, 1, 0)
+    )
+
+    with open(fname, "rb") as fhandle:
+        binfile = PdosbinFile(fileobj=fhandle)
+    np.testing.assert_allclose(binfile.weights, weights)
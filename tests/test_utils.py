@@ -13,6 +13,10 @@ from aiida_castep.utils import (
     sort_atoms_castep,
 )
 from aiida_castep.utils.dos import DOSProcessor
+from aiida_castep.utils.planner import (
+    estimate_serial_fraction,
+    plan_mpi_resources,
+)
 
 try:
     import ase
@@ -104,3 +108,143 @@ def test_dos_compute(bands_data):
 
     total_bands = values.sum() * (energy[1] - energy[0])
     np.testing.assert_approx_equal(total_bands, 5.0)
+
+
+def test_pdos_compute(bands_data):
+    """Test calculation for the projected density of states"""
+
+    bands, weights = bands_data
+    # Three orbitals with weights summing to one for each state
+    orbital_weights = np.stack(
+        [
+            np.full(bands.shape, 0.5),
+            np.full(bands.shape, 0.3),
+            np.full(bands.shape, 0.2),
+        ],
+        axis=-1,
+    )
+
+    dos = DOSProcessor(bands, weights, min_eng=-10, max_eng=100)
+    energy, pdos = dos.get_pdos(orbital_weights, npoints=2000)
+    _, total = dos.get_dos(npoints=2000)
+
+    assert pdos.shape == (2, 3, 2000)
+    np.testing.assert_allclose(pdos.sum(axis=1), total, atol=1e-8)
+    np.testing.assert_allclose(
+        pdos[0, 0].sum() * (energy[1] - energy[0]), 2.5, rtol=1e-3
+    )
+
+
+def test_castep_ion_lines():
+    """Test generating the lines of positions in bulk"""
+    from aiida_castep.calculations.utils import (
+        get_castep_ion_line,
+        get_castep_ion_lines,
+    )
+
+    rng = np.random.default_rng(0)
+    positions = (rng.random((20, 3)) - 0.5) * 100
+    positions[0] = [-0.0, 1e-12, 123456.0]
+    names = ["O", "Ti:Ti1", "Sr:a_very_long_kind_name"] * 6 + ["O", "O"]
+    lines = get_castep_ion_lines(names, positions)
+    assert lines == [
+        get_castep_ion_line(name, pos) for name, pos in zip(names, positions.tolist())
+    ]
+    assert get_castep_ion_lines([], np.zeros((0, 3))) == []
+    with pytest.raises(ValueError):
+        get_castep_ion_lines(names[:-1], positions)
+
+
+def test_castep_kpoint_lines():
+    """Test generating the lines of kpoints in bulk"""
+    from aiida_castep.calculations.utils import get_castep_kpoint_lines
+
+    rng = np.random.default_rng(0)
+    kpoints = rng.random((10, 3)) - 0.5
+    weights = rng.random(10)
+    lines = get_castep_kpoint_lines(kpoints, weights)
+    assert lines == [
+        "{:18.10f} {:18.10f} {:18.10f} {:18.10f}".format(*kpt, weight)
+        for kpt, weight in zip(kpoints, weights)
+    ]
+    lines = get_castep_kpoint_lines(kpoints, weights, weight_format="%18.14f")
+    assert lines[0].endswith(f"{weights[0]:18.14f}")
+    lines = get_castep_kpoint_lines(kpoints)
+    assert lines == [
+        f"{kpt[0]:18.10f} {kpt[1]:18.10f} {kpt[2]:18.10f}" for kpt in kpoints
+    ]
+    assert get_castep_kpoint_lines(np.zeros((0, 3))) == []
+    with pytest.raises(ValueError):
+        get_castep_kpoint_lines(kpoints, weights[:-1])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 4096])
+def test_write_input_file(chunk_size):
+    """Test streaming the input files"""
+    from io import StringIO
+
+    from castepinput import Block
+    from castepinput.inputs import CellInput
+
+    from aiida_castep.calculations.utils import write_input_file
+
+    cell = CellInput()
+    write_input_file(cell, StringIO())
+    cell.header = ["# comment", "another comment"]
+    cell["lattice_cart"] = Block(["1 0 0", "0 1 0", "0 0 1"])
+    cell.units["lattice_cart"] = "ang"
+    cell["kpoints_mp_grid"] = [2, 2, 2]
+    cell["symmetry_generate"] = None
+    cell["fix_com"] = ""
+    cell["fix_all_cell"] = True
+    cell["symmetry_tol"] = 0.01
+    cell.units["symmetry_tol"] = "ang"
+    cell["positions_abs"] = Block([f"O {i} 0 0" for i in range(10)])
+    cell["empty_block"] = Block([])
+    stream = StringIO()
+    write_input_file(cell, stream, chunk_size=chunk_size)
+    assert stream.getvalue() == cell.get_string()
+
+
+def test_plan_mpi_resources():
+    """Test selecting the MPI resources"""
+    # Kpoint parallelisation is preferred
+    plan = plan_mpi_resources(16, 16, serial_fraction=0.02)
+    assert plan["num_mpiprocs_per_machine"] == 16
+    assert plan["num_kpoint_groups"] == 16
+    assert plan["data_distribution"] == "kpoint"
+
+    # Idle cores are accepted when the kpoints do not divide the cores
+    plan = plan_mpi_resources(10, 16, min_efficiency=0.9, serial_fraction=0.02)
+    assert plan["num_mpiprocs_per_machine"] == 15
+    assert plan["data_distribution"] == "mixed"
+
+    # More nodes are used if more throughput can be gained
+    plan = plan_mpi_resources(64, 16, max_nodes=4, serial_fraction=0.02)
+    assert plan["num_machines"] == 4
+
+    # Memory limits the number of processes per node
+    plan = plan_mpi_resources(
+        1,
+        16,
+        max_nodes=4,
+        memory_MB=32000,
+        memory_per_node_MB=10000,
+        min_efficiency=0.0,
+        serial_fraction=0.02,
+    )
+    assert plan["num_machines"] == 4
+    assert plan["memory_per_proc_MB"] * plan["num_mpiprocs_per_machine"] <= 10000
+
+    assert plan_mpi_resources(1, 16, memory_MB=1e6, memory_per_node_MB=100) is None
+
+
+def test_estimate_serial_fraction():
+    """Test calibrating the serial fraction from the history"""
+    assert estimate_serial_fraction([], default=0.05) == 0.05
+    history = [
+        {"parallel_procs": 11, "parallel_efficiency": 50.0, "n_kpoints": "1"},
+        # Pure kpoint parallelisation is not informative
+        {"parallel_procs": 4, "parallel_efficiency": 90.0, "n_kpoints": "4"},
+    ]
+    assert estimate_serial_fraction(history) == pytest.approx(0.1)